@@ -33,6 +33,7 @@ import os
 import re
 import csv
 import json
+import pickle
 import base64
 import hashlib
 import unicodedata
@@ -41,6 +42,13 @@ from typing import Dict, Any, List, Optional, Tuple
 import pandas as pd
 from openai import OpenAI
 
+# Preparación de imágenes para Vision (reducción + JPEG, caché por hash).
+# Opcional: sin image_prep.py / cv2 se envía el archivo tal cual.
+try:
+    from image_prep import ImagePrep
+except ImportError:
+    ImagePrep = None
+
 # ============================================================
 # CONFIGURACIÓN GENERAL
 # ============================================================
@@ -60,6 +68,10 @@ LOG_DIR = os.path.join(BASE_DIR, "LOGS")
 os.makedirs(LOG_DIR, exist_ok=True)
 LOG_CSV = os.path.join(LOG_DIR, "log_renombrado_seo_v10.csv")
 
+# Índice de códigos de todas las bases (se reconstruye si cambia alguna)
+INDEX_CACHE = os.path.join(LOG_DIR, "indice_codigos_v10.pkl")
+INDEX_VERSION = 2  # subir al cambiar la normalización de códigos
+
 # Parámetros de heurística
 # Mínimo de tokens (palabras / códigos separados) para considerar un nombre "rico".
 MIN_RICH_TOKENS = 5
@@ -76,6 +88,8 @@ client: Optional[OpenAI] = None
 if OPENAI_API_KEY:
     client = OpenAI(api_key=OPENAI_API_KEY)
 
+IMAGE_PREP = ImagePrep() if ImagePrep is not None else None
+
 
 # ============================================================
 # UTILIDADES BÁSICAS
@@ -99,6 +113,12 @@ def slugify(text: str) -> str:
 
 
 def encode_image(path: str) -> str:
+    if IMAGE_PREP is not None:
+        try:
+            return IMAGE_PREP.encode(path)
+        except Exception as e:
+            # Imagen que OpenCV no decodifica: se envía tal cual, como antes
+            print(f"[PREP WARN] {os.path.basename(path)} -> {e}")
     with open(path, "rb") as f:
         return base64.b64encode(f.read()).decode("utf-8")
 
@@ -361,50 +381,150 @@ def cargar_csv_generico(path: str, source_name: str) -> Dict[str, Record]:
 # BUSQUEDA DE MATCH POR CÓDIGO EN ARCHIVOS
 # ============================================================
 
+# Orden de prioridad de las fuentes: (nombre, ruta, cargador)
+FUENTES = [
+    ("INV", INVENTARIO_CSV, cargar_inventario),
+    ("JC", JC_XLSX, lambda: cargar_excel_generico(JC_XLSX, "JC")),
+    ("YOKO", YOKO_XLSX, lambda: cargar_excel_generico(YOKO_XLSX, "YOKO")),
+    ("STORE", STORE_CSV, lambda: cargar_csv_generico(STORE_CSV, "STORE")),
+    ("LEO", LEO_CSV, lambda: cargar_csv_generico(LEO_CSV, "LEO")),
+    ("JAPAN", JAPAN_CSV, lambda: cargar_csv_generico(JAPAN_CSV, "JAPAN")),
+    ("VAISAND", VAISAND_CSV, lambda: cargar_csv_generico(VAISAND_CSV, "VAISAND")),
+]
+
+# Nivel de coincidencia (menor = mejor)
+MATCH_EXACTO = 0      # mismo código en minúsculas
+MATCH_NORMAL = 1      # sin guiones/espacios/puntos ni ceros a la izquierda
+MATCH_VARIANTE = 2    # además sin letra de sufijo (12345A -> 12345)
+
+# Sufijos de unidad: "125v", "150w" son medidas, no variantes de código
+SUFIJOS_UNIDAD = {"v", "w", "l", "m"}
+
+
+def normalizar_codigo(codigo: str) -> str:
+    """Forma normalizada: minúsculas, solo alfanuméricos, sin ceros a la izquierda.
+    "00-1234-a" -> "1234a"
+    Los ceros solo se quitan si quedan al menos 4 caracteres, para que
+    "0150" no se confunda con un cilindraje "150".
+    """
+    cod = re.sub(r"[^a-z0-9]", "", str(codigo or "").lower())
+    sin_ceros = cod.lstrip("0")
+    return sin_ceros if len(sin_ceros) >= 4 else cod
+
+
+def clave_codigo(codigo: str) -> str:
+    """Clave canónica del índice: normalizado y sin UNA letra de sufijo,
+    solo si antes hay al menos 4 dígitos y la letra no es una unidad
+    ("12345a" -> "12345"; "150cc", "125v" y palabras quedan igual).
+    """
+    cod = normalizar_codigo(codigo)
+    m = re.fullmatch(r"(.*\d{4})([a-z])", cod)
+    if m and m.group(2) not in SUFIJOS_UNIDAD:
+        return m.group(1)
+    return cod
+
+
+def firma_fuentes() -> List[Tuple[str, float, int]]:
+    """(ruta, mtime, tamaño) de cada fuente; si cambia, el índice se reconstruye."""
+    firma = []
+    for _, path, _ in FUENTES:
+        try:
+            st = os.stat(path)
+            firma.append((path, st.st_mtime, st.st_size))
+        except OSError:
+            firma.append((path, 0.0, -1))
+    return firma
+
+
 class Catalogos:
-    def __init__(self) -> None:
-        self.inv = cargar_inventario()
-        self.jc = cargar_excel_generico(JC_XLSX, "JC")
-        self.yoko = cargar_excel_generico(YOKO_XLSX, "YOKO")
-        self.store = cargar_csv_generico(STORE_CSV, "STORE")
-        self.leo = cargar_csv_generico(LEO_CSV, "LEO")
-        self.japan = cargar_csv_generico(JAPAN_CSV, "JAPAN")
-        self.vaisand = cargar_csv_generico(VAISAND_CSV, "VAISAND")
+    """Índice único de códigos sobre todas las bases locales.
+
+    clave canónica -> [(prioridad, codigo_minúsculas, codigo_normalizado, record)]
+    ordenado por prioridad de fuente. Cada token se resuelve con UNA
+    búsqueda; el nivel de coincidencia (exacto / normalizado / variante)
+    se decide comparando el token con los códigos de la entrada.
+
+    El índice se guarda en INDEX_CACHE junto con la firma de las fuentes;
+    mientras ningún archivo cambie, el arranque solo lee ese archivo en
+    lugar de volver a cargar los siete Excel/CSV.
+    """
+
+    def __init__(self, cache_path: Optional[str] = INDEX_CACHE) -> None:
+        self.cache_path = cache_path
+        self.index: Dict[str, List[Tuple[int, str, str, Record]]] = {}
+
+        firma = firma_fuentes()
+        if not self.cargar_cache(firma):
+            self.construir()
+            self.guardar_cache(firma)
+
+    def construir(self) -> None:
+        index: Dict[str, List[Tuple[int, str, str, Record]]] = {}
+        for prioridad, (_, _, cargador) in enumerate(FUENTES):
+            for cod_l, rec in cargador().items():
+                cod_n = normalizar_codigo(cod_l)
+                index.setdefault(clave_codigo(cod_l), []).append((prioridad, cod_l, cod_n, rec))
+        # Las fuentes se recorren en orden, cada lista ya queda por prioridad
+        self.index = index
+        print(f"Índice de códigos: {len(self.index)} claves.")
+
+    def cargar_cache(self, firma: List[Tuple[str, float, int]]) -> bool:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, "rb") as f:
+                data = pickle.load(f)
+        except Exception as e:
+            print(f"⚠ Índice en caché ilegible, se reconstruye: {e}")
+            return False
+        if data.get("version") != INDEX_VERSION or data.get("firma") != firma:
+            return False
+        self.index = data["index"]
+        print(f"Índice de códigos desde caché: {len(self.index)} claves.")
+        return True
+
+    def guardar_cache(self, firma: List[Tuple[str, float, int]]) -> None:
+        if not self.cache_path:
+            return
+        tmp = self.cache_path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump({"version": INDEX_VERSION, "firma": firma, "index": self.index},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.cache_path)
+        except Exception as e:
+            print(f"⚠ No se pudo guardar el índice de códigos: {e}")
 
     def buscar_por_tokens(self, tokens: List[str]) -> Optional[Record]:
         """Busca en todos los catálogos si algún token coincide con un código.
-        Prioridad: INV > JC > YOKO > STORE > LEO > JAPAN > VAISAND
+        Prioridad: exacto > normalizado > variante y, dentro de cada nivel,
+        INV > JC > YOKO > STORE > LEO > JAPAN > VAISAND (a igualdad gana
+        el primer token).
         """
-        cand = [t for t in tokens if len(t) >= 3]
-        for t in cand:
-            t_l = t.lower()
-            if t_l in self.inv:
-                return self.inv[t_l]
-        for t in cand:
-            t_l = t.lower()
-            if t_l in self.jc:
-                return self.jc[t_l]
-        for t in cand:
-            t_l = t.lower()
-            if t_l in self.yoko:
-                return self.yoko[t_l]
-        for t in cand:
+        mejor: Optional[Tuple[int, int]] = None
+        mejor_rec: Optional[Record] = None
+        for t in tokens:
+            if len(t) < 3:
+                continue
             t_l = t.lower()
-            if t_l in self.store:
-                return self.store[t_l]
-        for t in cand:
-            t_l = t.lower()
-            if t_l in self.leo:
-                return self.leo[t_l]
-        for t in cand:
-            t_l = t.lower()
-            if t_l in self.japan:
-                return self.japan[t_l]
-        for t in cand:
-            t_l = t.lower()
-            if t_l in self.vaisand:
-                return self.vaisand[t_l]
-        return None
+            entradas = self.index.get(clave_codigo(t_l))
+            if not entradas:
+                continue
+            t_n = normalizar_codigo(t_l)
+            for prioridad, cod_l, cod_n, rec in entradas:
+                if cod_l == t_l:
+                    nivel = MATCH_EXACTO
+                elif cod_n == t_n:
+                    nivel = MATCH_NORMAL
+                else:
+                    nivel = MATCH_VARIANTE
+                rango = (nivel, prioridad)
+                if mejor is None or rango < mejor:
+                    mejor, mejor_rec = rango, rec
+                if nivel == MATCH_EXACTO:
+                    # la lista va por prioridad: nada posterior le gana
+                    break
+        return mejor_rec
 
 
 # ============================================================
@@ -449,8 +569,8 @@ def analizar_con_vision(path: str, nombre_sin_ext: str) -> Dict[str, Any]:
             "numeros_molde": "",
         }
 
-    img64 = encode_image(path)
     try:
+        img64 = encode_image(path)
         resp = client.chat.completions.create(
             model="gpt-4o",
             temperature=0.0,
@@ -743,6 +863,8 @@ def main() -> None:
 
     print("\n✅ Renombrado SEO v10 finalizado.")
     print(f"   → Log: {LOG_CSV}")
+    if IMAGE_PREP is not None and IMAGE_PREP.stats["images"]:
+        print(f"   → Imágenes IA: {IMAGE_PREP.report()}")
 
 
 if __name__ == "__main__":
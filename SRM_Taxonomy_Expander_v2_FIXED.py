@@ -8,6 +8,8 @@ import json
 import pandas as pd
 from datetime import datetime
 
+from aho_corasick import AhoCorasick
+
 # ---------------------------------------------------------------
 # LOG SEGURO (COLORES AUTOMÁTICOS)
 # ---------------------------------------------------------------
@@ -501,6 +503,123 @@ def match_mechanical_structure(text: str, struct):
     return hits
 
 
+# ---------------------------------------------------------------
+# ÍNDICE COMPILADO DE PATRONES (Aho-Corasick)
+# ---------------------------------------------------------------
+class PatternIndex:
+    """
+    Todos los patrones del expansor, normalizados UNA vez y compilados
+    en un solo autómata Aho-Corasick (aho_corasick.AhoCorasick) con
+    etiqueta de categoría:
+
+        ("patron", categoria)  → generate_patterns (match_patterns)
+        "oem"                  → match_oem
+        "modelo"               → match_models
+        "familia"              → match_families
+        "estructura"           → match_mechanical_structure
+        "taxo"                 → keywords de la taxonomía base
+
+    scan() recorre el texto una sola vez y devuelve lo mismo que las
+    funciones match_* (mismo orden, mismos duplicados, mismas
+    coincidencias por subcadena), así compute_score recibe los mismos
+    conteos.
+    """
+
+    def __init__(self, patterns, modelos_df, oem_df, struct, taxo_df=None):
+        self.ac = AhoCorasick()
+        self.entries = []   # por patrón: [(grupo, orden, valor original)]
+        self.ids = {}       # texto normalizado → id de patrón
+        self.always = []    # patrones vacíos: `"" in texto` siempre es True
+
+        # 1. Patrones técnicos (ya normalizados por generate_patterns)
+        for ci, (category, plist) in enumerate(patterns.items()):
+            for pi, p in enumerate(plist):
+                self.add(p, ("patron", category), (ci, pi), p)
+
+        # 2. OEM (len > 1, valor original en la salida)
+        if "oem" in oem_df.columns:
+            for i, o in enumerate(oem_df["oem"].astype(str)):
+                oo = normalize_text(o)
+                if len(oo) > 1:
+                    self.add(oo, "oem", i, o)
+
+        # 3. Modelos SRM (len > 2)
+        for i, m in enumerate(modelos_df["modelo_srm"].astype(str).unique()):
+            mm = normalize_text(m)
+            if len(mm) > 2:
+                self.add(mm, "modelo", i, m)
+
+        # 4. Familias
+        if "familia" in modelos_df.columns:
+            for i, f in enumerate(modelos_df["familia"].dropna().astype(str).unique()):
+                self.add(normalize_text(f), "familia", i, f)
+
+        # 5. Estructura mecánica
+        i = 0
+        for key, values in struct.items():
+            if isinstance(values, list):
+                for v in values:
+                    self.add(normalize_text(v), "estructura", i, v)
+                    i += 1
+
+        # 6. Keywords de la taxonomía base (valor = posición de la fila)
+        if taxo_df is not None:
+            for i, kw in enumerate(taxo_df["keyword"].astype(str)):
+                kw = normalize_text(kw)
+                if kw:
+                    self.add(kw, "taxo", i, (i, kw))
+
+        self.ac.build()
+
+    def add(self, pattern, group, order, value):
+        entry = (group, order, value)
+
+        if not pattern:
+            self.always.append(entry)
+            return
+
+        pid = self.ids.get(pattern)
+        if pid is None:
+            pid = len(self.entries)
+            self.ids[pattern] = pid
+            self.entries.append([])
+            self.ac.add(pattern, pid)
+
+        self.entries[pid].append(entry)
+
+    def scan(self, text):
+        """
+        Devuelve {"scores", "matched", "oem", "models", "familias",
+        "estructura", "taxo"} para un texto ya normalizado.
+        """
+        hits = list(self.always)
+        for pid in self.ac.found(text):
+            hits.extend(self.entries[pid])
+        hits.sort(key=lambda e: (e[0] if isinstance(e[0], str) else "", e[1]))
+
+        scores = defaultdict(int)
+        matched = defaultdict(list)
+        groups = {"oem": [], "modelo": [], "familia": [], "estructura": [], "taxo": []}
+
+        for group, order, value in hits:
+            if isinstance(group, tuple):
+                category = group[1]
+                scores[category] += 1
+                matched[category].append(value)
+            else:
+                groups[group].append(value)
+
+        return {
+            "scores": scores,
+            "matched": matched,
+            "oem": groups["oem"],
+            "models": groups["modelo"],
+            "familias": groups["familia"],
+            "estructura": groups["estructura"],
+            "taxo": groups["taxo"],
+        }
+
+
 # ---------------------------------------------------------------
 # SISTEMA DE PUNTUACIÓN INDUSTRIAL SRM PRO
 # ---------------------------------------------------------------
@@ -529,40 +648,39 @@ def compute_score(scores, models, oem, fams, mech):
 # ---------------------------------------------------------------
 # CLASIFICADOR TAXONÓMICO INDUSTRIAL SRM PRO
 # ---------------------------------------------------------------
-def classify_item(text, taxo_df, patterns, modelos_df, oem_df, struct):
+def classify_item(text, taxo_df, patterns, modelos_df, oem_df, struct, index=None):
+    """
+    index: PatternIndex ya compilado (classify_catalog lo arma una vez);
+    sin él se compila aquí, lo que solo conviene para llamadas sueltas.
+    """
+    if index is None:
+        index = PatternIndex(patterns, modelos_df, oem_df, struct, taxo_df)
 
     desc = normalize_text(text)
 
-    # 1. Patrones técnicos
-    scores, hits = match_patterns(desc, patterns)
-
-    # 2. OEM
-    oem_found = match_oem(desc, oem_df)
-
-    # 3. Modelos SRM
-    models_found = match_models(desc, modelos_df)
-
-    # 4. Familias SRM
-    families_found = match_families(desc, modelos_df)
-
-    # 5. Estructura mecánica
-    mech_found = match_mechanical_structure(desc, struct)
+    # 1–5. Patrones técnicos, OEM, modelos, familias y estructura
+    #      en una sola pasada del autómata
+    found = index.scan(desc)
+    scores, hits = found["scores"], found["matched"]
+    oem_found = found["oem"]
+    models_found = found["models"]
+    families_found = found["familias"]
+    mech_found = found["estructura"]
 
     # 6. Puntuación industrial
     score = compute_score(scores, models_found, oem_found, families_found, mech_found)
 
     # 7. Determinar entrada mejor ajustada en la taxonomía base
+    #    (solo las filas cuyo keyword apareció en el texto)
     best_row = None
     best_hits = -1
 
-    for idx, row in taxo_df.iterrows():
-        row_kw = normalize_text(str(row["keyword"]))
-        if row_kw and row_kw in desc:
-            # Cuenta coincidencias fuertes
-            local_hits = desc.count(row_kw)
-            if local_hits > best_hits:
-                best_hits = local_hits
-                best_row = row
+    for i, row_kw in found["taxo"]:
+        # Cuenta coincidencias fuertes
+        local_hits = desc.count(row_kw)
+        if local_hits > best_hits:
+            best_hits = local_hits
+            best_row = taxo_df.iloc[i]
 
     # Si no hubo coincidencias con taxonomía base → fallback inteligente
     if best_row is None:
@@ -599,9 +717,14 @@ def classify_item(text, taxo_df, patterns, modelos_df, oem_df, struct):
 #   Motor de Clasificación Masiva Industrial SRM v28
 # ================================================================
 
-def classify_catalog(df_catalogo, taxo, patterns, modelos_df, oem_df, struct, syns, vocab, emp):
+def classify_catalog(df_catalogo, taxo, patterns, modelos_df, oem_df, struct, syns, vocab, emp,
+                     index=None):
     log("=== MÓDULO 9/12 — Motor de Clasificación Masiva SRM ===", "blue")
 
+    # Índice de patrones compilado una sola vez para todo el catálogo
+    if index is None:
+        index = PatternIndex(patterns, modelos_df, oem_df, struct, taxo)
+
     # Columnas obligatorias
     COLUMNAS_VALIDAS = ["descripcion", "producto", "detalle", "nombre"]
 
@@ -650,7 +773,8 @@ def classify_catalog(df_catalogo, taxo, patterns, modelos_df, oem_df, struct, sy
             patterns,
             modelos_df,
             oem_df,
-            struct
+            struct,
+            index
         )
 
         # Guardar campos resultantes
@@ -765,6 +889,7 @@ def run():
     # ------------------------------------------------------------
     ling_terms = list(vocab.keys()) + list(emp.keys()) + list(syn.keys())
     patterns = generate_patterns(ling_terms, modelos, oem, struct)
+    index = PatternIndex(patterns, modelos, oem, struct, taxo)
 
     # ------------------------------------------------------------
     # 3. Preparar catálogo unificado para clasificación
@@ -791,7 +916,8 @@ def run():
         struct,
         syn,
         vocab,
-        emp
+        emp,
+        index
     )
 
     # ------------------------------------------------------------
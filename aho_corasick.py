@@ -0,0 +1,88 @@
+class AhoCorasick:
+    """
+    Autómata Aho-Corasick genérico: muchos patrones, una sola pasada
+    por el texto, carácter por carácter.
+
+    Cada patrón se registra con un payload libre (categoría, clave, id...)
+    que el llamador interpreta. Los patrones vacíos no entran al trie:
+    quedan en `always` porque `"" in texto` siempre es True.
+
+        ac = AhoCorasick()
+        ac.add("cb110", ("modelo", 3))
+        ac.build()
+        ac.matches(texto)  → [(fin, payload), ...]
+        ac.found(texto)    → {payload, ...}
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        self.always = []
+
+    def add(self, pattern, payload):
+        if not pattern:
+            self.always.append(payload)
+            return
+
+        s = 0
+        for ch in pattern:
+            nxt = self.goto[s].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[s][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            s = nxt
+        self.out[s].append(payload)
+
+    def build(self):
+        """
+        Enlaces de fallo por BFS; cada estado hereda las salidas de su
+        enlace de fallo.
+        """
+        queue = list(self.goto[0].values())
+        for s in queue:
+            for ch, nxt in self.goto[s].items():
+                queue.append(nxt)
+                f = self.fail[s]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+        return self
+
+    def matches(self, text):
+        """
+        Todas las ocurrencias: [(índice del último carácter, payload)].
+        """
+        goto, fail, out = self.goto, self.fail, self.out
+        hits = []
+        s = 0
+
+        for i, ch in enumerate(text):
+            while s and ch not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(ch, 0)
+            for payload in out[s]:
+                hits.append((i, payload))
+
+        return hits
+
+    def found(self, text):
+        """
+        Payloads de los patrones que aparecen al menos una vez.
+        """
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set()
+        s = 0
+
+        for ch in text:
+            while s and ch not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(ch, 0)
+            if out[s]:
+                found.update(out[s])
+
+        return found
@@ -0,0 +1,143 @@
+from collections import defaultdict
+
+
+# ------------------------------------------------------------
+# Utilidades de bounding boxes
+#
+# Todas las funciones trabajan con celdas en formato dict:
+#     {x, y, w, h}
+# que es el formato de los detectores y del GridBuilder.
+# ------------------------------------------------------------
+
+
+def to_xyxy(box):
+    return box["x"], box["y"], box["x"] + box["w"], box["y"] + box["h"]
+
+
+def area(box):
+    return max(0, box["w"]) * max(0, box["h"])
+
+
+def intersection(a, b):
+    ax1, ay1, ax2, ay2 = to_xyxy(a)
+    bx1, by1, bx2, by2 = to_xyxy(b)
+
+    iw = min(ax2, bx2) - max(ax1, bx1)
+    ih = min(ay2, by2) - max(ay1, by1)
+    if iw <= 0 or ih <= 0:
+        return 0
+    return iw * ih
+
+
+def iou(a, b):
+    inter = intersection(a, b)
+    if inter == 0:
+        return 0.0
+    return inter / float(area(a) + area(b) - inter)
+
+
+def center(box):
+    return box["x"] + box["w"] / 2.0, box["y"] + box["h"] / 2.0
+
+
+def contains_point(box, px, py):
+    x1, y1, x2, y2 = to_xyxy(box)
+    return x1 <= px < x2 and y1 <= py < y2
+
+
+def weighted_merge(boxes, weights=None):
+    """
+    Promedia coordenadas de varias cajas (Weighted Box Fusion simple).
+    weights: peso por caja (p.ej. score del detector). Por defecto 1.0.
+    """
+    if weights is None:
+        weights = [float(b.get("score", 1.0)) for b in boxes]
+
+    total = sum(weights) or 1.0
+    x1 = sum(w * b["x"] for b, w in zip(boxes, weights)) / total
+    y1 = sum(w * b["y"] for b, w in zip(boxes, weights)) / total
+    x2 = sum(w * (b["x"] + b["w"]) for b, w in zip(boxes, weights)) / total
+    y2 = sum(w * (b["y"] + b["h"]) for b, w in zip(boxes, weights)) / total
+
+    x1, y1 = max(0.0, x1), max(0.0, y1)
+
+    return {
+        "x": int(round(x1)),
+        "y": int(round(y1)),
+        "w": int(round(x2 - x1)),
+        "h": int(round(y2 - y1))
+    }
+
+
+class GridIndex:
+    """
+    Índice espacial por cubetas de una cuadrícula uniforme.
+
+    Cada caja se registra en todas las cubetas que toca; una consulta
+    solo revisa las cajas de las cubetas que toca la caja buscada.
+    Con cajas de tamaño parecido al de la cubeta, insertar y consultar
+    es O(1) amortizado → fusión casi lineal.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = max(1, int(cell_size))
+        self.buckets = defaultdict(list)
+        self.items = []
+
+    def _cells(self, box):
+        x1, y1, x2, y2 = to_xyxy(box)
+        s = self.cell_size
+        for gx in range(int(x1) // s, int(x2) // s + 1):
+            for gy in range(int(y1) // s, int(y2) // s + 1):
+                yield gx, gy
+
+    def insert(self, box, payload=None):
+        """
+        Registra la caja y devuelve su índice.
+        """
+        idx = len(self.items)
+        self.items.append((box, payload))
+        for key in self._cells(box):
+            self.buckets[key].append(idx)
+        return idx
+
+    def update(self, idx, box):
+        """
+        Reemplaza la caja idx (p.ej. tras una fusión ponderada).
+        """
+        _, payload = self.items[idx]
+        self.items[idx] = (box, payload)
+        for key in self._cells(box):
+            bucket = self.buckets[key]
+            if idx not in bucket:
+                bucket.append(idx)
+
+    def candidates(self, box):
+        """
+        Índices de cajas que pueden solaparse con box (sin repetir).
+        """
+        seen = set()
+        for key in self._cells(box):
+            for idx in self.buckets.get(key, ()):
+                if idx not in seen:
+                    seen.add(idx)
+                    yield idx
+
+    def query(self, box):
+        """
+        Índices de cajas que realmente se intersecan con box.
+        """
+        return [
+            idx for idx in self.candidates(box)
+            if intersection(box, self.items[idx][0]) > 0
+        ]
+
+
+def median_size(boxes, default=64):
+    """
+    Tamaño típico de caja: sirve para elegir el cell_size del índice.
+    """
+    if not boxes:
+        return default
+    sizes = sorted(max(b["w"], b["h"]) for b in boxes)
+    return max(1, sizes[len(sizes) // 2])
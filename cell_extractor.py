@@ -1,32 +1,46 @@
 import os
 import cv2
 
+from modules.image_utils import PageImage
+
 
 class CellExtractor:
     """
-    Recorta cada celda/bloque detectado por PageSegmenter
-    y la guarda como imagen PNG individual.
+    Recorta cada celda/bloque detectado por PageSegmenter.
+
+    El recorte queda en la celda como vista NumPy de la página
+    (cell["image"], sin copia) para pasarlo en memoria a VisionExtractor.
+    La vista mantiene vivo el buffer de la página: quien acumule celdas
+    más allá de la página debe copiarla o descartarla (PageProcessor).
+    Guardarlo en disco es opcional: síncrono con output_dir, o en
+    segundo plano con un CropWriter.
 
     Nombre de archivo recomendado:
         page_10_row_3_col_2.png
     """
 
-    def __init__(self, margin=4):
+    def __init__(self, margin=4, writer=None):
         self.margin = margin
+        self.writer = writer
 
-    def extract_cells(self, image_path, cells, output_dir):
+    def extract_cells(self, image, cells, output_dir=None):
         """
-        Recorta y guarda todas las celdas detectadas.
+        Recorta todas las celdas detectadas.
 
-        image_path: imagen de la página
-        cells: lista de dicts con {row, col, x, y, w, h}
-        output_dir: carpeta donde guardar los PNG
+        image: PageImage de la página (o ruta, por compatibilidad)
+        cells: lista de dicts con {row, col, x, y, w, h}; se les agrega
+               "name", "image" y, si se guardan, "file"
+        output_dir: carpeta donde guardar los recortes (None = solo memoria)
+
+        Devuelve las rutas guardadas (vacío si no se persiste).
         """
-        os.makedirs(output_dir, exist_ok=True)
+        persist = output_dir is not None
+        if persist and self.writer is None:
+            os.makedirs(output_dir, exist_ok=True)
 
-        img = cv2.imread(image_path)
+        page = PageImage.ensure(image)
+        img = page.bgr
         if img is None:
-            print("[ERROR] No se pudo cargar la imagen:", image_path)
             return []
 
         extracted_files = []
@@ -43,11 +57,18 @@ class CellExtractor:
             crop = img[y0:y1, x0:x1]
 
             # Nombre de archivo
-            page = os.path.splitext(os.path.basename(image_path))[0]
-            fname = f"{page}_row{cell['row']}_col{cell['col']}.png"
-            out_path = os.path.join(output_dir, fname)
+            fname = f"{page.stem}_row{cell['row']}_col{cell['col']}.png"
+            cell["name"] = fname
+            cell["image"] = crop
+
+            if not persist:
+                continue
 
-            cv2.imwrite(out_path, crop)
+            if self.writer is not None:
+                out_path = self.writer.submit(crop, fname, output_dir)
+            else:
+                out_path = os.path.join(output_dir, fname)
+                cv2.imwrite(out_path, crop)
 
             cell["file"] = out_path
             extracted_files.append(out_path)
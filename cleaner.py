@@ -1,15 +1,64 @@
+import re
+
+import pandas as pd
+
+# Patrones compilados una sola vez (antes: import re + findall por producto)
+EMPAQUE_TOKEN_RE = re.compile(r"(?:^|\s)(X\S{0,3})(?=\s|$)")
+NUMERO_RE = re.compile(r"\b\d{3,7}\b")
+HERRAMIENTA_RE = re.compile(r"TOOL|HERR")
+
+
 class Cleaner:
+    """
+    Corrige errores comunes basados en el reporte del validador.
+
+    Las descripciones de todo el catálogo se analizan como una columna
+    en una sola pasada (patrones compilados); después solo se asignan
+    los campos a los productos marcados por el validador.
+    """
 
     def __init__(self):
         pass
 
+    def infer_fields(self, descripciones):
+        """
+        Candidatos de empaque, precio y familia para cada descripción.
+        """
+        desc = pd.Series(descripciones, dtype="string").fillna("")
+        upper = desc.str.upper().tolist()
+        desc = desc.tolist()
+
+        # findall + último/máximo no tienen equivalente vectorizado en
+        # pandas (.str.findall igual itera en Python): pasada única con
+        # los patrones ya compilados
+
+        # Empaque: último token "X.." de hasta 4 caracteres
+        empaque = [toks[-1] if toks else None for toks in map(EMPAQUE_TOKEN_RE.findall, upper)]
+
+        # Precio: el mayor número de 3–7 cifras (comparado como texto, como antes)
+        precio = [max(nums) if nums else None for nums in map(NUMERO_RE.findall, desc)]
+
+        # Familia por palabras clave
+        familia = [
+            "CAUCHOS" if "CAUCHO" in u else "HERRAMIENTAS" if HERRAMIENTA_RE.search(u) else "OTROS"
+            for u in upper
+        ]
+
+        return pd.DataFrame({"empaque": empaque, "precio": precio, "familia": familia})
+
     def fix(self, report):
         """
         Corrige errores comunes basados en el reporte del validador.
         """
+        if not report:
+            return []
+
+        campos = self.infer_fields([entry["producto"].descripcion for entry in report])
+
         productos_limpios = []
 
-        for entry in report:
+        for entry, empaque, precio, familia in zip(
+                report, campos["empaque"], campos["precio"], campos["familia"]):
 
             p = entry["producto"]
             errores = entry["errores"]
@@ -18,27 +67,16 @@ class Cleaner:
             # --- Correcciones automáticas ---
 
             # si no detectó empaque, intentar extraerlo de descripción
-            if "EMPAQUE_NO_DETECTADO" in advertencias:
-                if "X" in p.descripcion.upper():
-                    for tok in p.descripcion.upper().split():
-                        if tok.startswith("X") and len(tok) <= 4:
-                            p.empaque = tok
+            if "EMPAQUE_NO_DETECTADO" in advertencias and empaque:
+                p.empaque = empaque
 
             # si no detectó precio, intentar extraer números grandes
-            if "PRECIO_NO_DETECTADO" in advertencias:
-                import re
-                nums = re.findall(r"\b\d{3,7}\b", p.descripcion)
-                if nums:
-                    p.precio = max(nums)
+            if "PRECIO_NO_DETECTADO" in advertencias and precio:
+                p.precio = precio
 
             # si no detectó familia, inferirla por claves
             if "FAMILIA_NO_DETECTADA" in advertencias:
-                if "CAUCHO" in p.descripcion.upper():
-                    p.familia = "CAUCHOS"
-                elif "TOOL" in p.descripcion.upper() or "HERR" in p.descripcion.upper():
-                    p.familia = "HERRAMIENTAS"
-                else:
-                    p.familia = "OTROS"
+                p.familia = familia
 
             # si no hay imagen, marcar producto como "IMAGEN_PENDIENTE"
             if "SIN_IMAGEN" in errores:
@@ -0,0 +1,114 @@
+import os
+import queue
+import threading
+
+import cv2
+
+
+class CropWriter:
+    """
+    Persistencia asíncrona de recortes.
+
+    ImageCropper y CellExtractor entregan los recortes como vistas
+    NumPy de la página (sin copia) y los pasan en memoria a las etapas
+    siguientes. Si además hay que dejarlos en disco, se encolan aquí y
+    un hilo aparte los codifica y escribe, sin frenar el pipeline.
+
+    Formatos:
+        - "png":  compresión sin pérdida, level 0–9 (0 = sin comprimir, rápido)
+        - "jpg":  quality 0–100
+        - "webp": quality 0–100
+
+    La cola es acotada (max_queue): submit() bloquea si el disco no da
+    abasto, así las páginas referenciadas por las vistas no se acumulan.
+    flush() espera a que todo lo encolado esté escrito.
+    """
+
+    def __init__(self, out_dir="output/images/crops/", fmt="png", level=1,
+                 quality=90, workers=1, max_queue=256):
+        if fmt not in ("png", "jpg", "webp"):
+            raise ValueError(f"Formato no soportado: {fmt}")
+
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.level = level
+        self.quality = quality
+
+        if fmt == "png":
+            self.params = [cv2.IMWRITE_PNG_COMPRESSION, level]
+        elif fmt == "jpg":
+            self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        else:
+            self.params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+
+        os.makedirs(out_dir, exist_ok=True)
+
+        self.tasks = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker_loop, name=f"crop-writer-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _worker_loop(self):
+        while True:
+            item = self.tasks.get()
+            if item is None:
+                self.tasks.task_done()
+                break
+
+            crop, path = item
+            try:
+                ok = cv2.imwrite(path, crop, self.params)
+            except cv2.error:
+                ok = False
+
+            with self._lock:
+                if ok:
+                    self.written += 1
+                else:
+                    self.failed += 1
+                    print("[ERROR] No se pudo guardar el recorte:", path)
+
+            self.tasks.task_done()
+
+    # --------------------------------------------------------
+    # API pública
+    # --------------------------------------------------------
+    def path_for(self, name, out_dir=None):
+        stem = os.path.splitext(name)[0]
+        return os.path.join(out_dir or self.out_dir, f"{stem}.{self.fmt}")
+
+    def submit(self, crop, name, out_dir=None):
+        """
+        Encola el recorte y devuelve la ruta donde quedará escrito.
+        """
+        path = self.path_for(name, out_dir)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        self.tasks.put((crop, path))
+        return path
+
+    def flush(self):
+        self.tasks.join()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "format": self.fmt,
+                "written": self.written,
+                "failed": self.failed,
+                "queue_depth": self.tasks.qsize()
+            }
+
+    def close(self):
+        self.flush()
+        for _ in self._threads:
+            self.tasks.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
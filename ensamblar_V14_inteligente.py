@@ -3,8 +3,10 @@ import os
 import re
 import shutil
 import random
-from thefuzz import fuzz
 from PIL import Image
+import numpy as np
+
+from fuzzy_matcher import FuzzyMatcher
 
 # --- CONFIGURACIÓN ---
 PROJECT_DIR = r'C:\KAIQI_PROYECTO_FINAL'
@@ -14,6 +16,10 @@ DIR_IMAGENES_ORIGEN = os.path.join(PROJECT_DIR, 'FOTOS_COMPETENCIA')
 OUTPUT_SHOPIFY = os.path.join(PROJECT_DIR, 'Shopify_Import_Definitivo_V14.csv')
 OUTPUT_DIR_IMAGENES = os.path.join(PROJECT_DIR, 'IMAGENES_PARA_SHOPIFY')
 
+UMBRAL_COMPONENTE = 80      # el detalle solo suma si el componente coincide
+UMBRAL_ACEPTACION = 85
+ASIGNACION_UNICA = False    # True → cada foto se usa para un solo SKU
+
 # Limpieza inicial
 if os.path.exists(OUTPUT_DIR_IMAGENES):
     shutil.rmtree(OUTPUT_DIR_IMAGENES)
@@ -45,75 +51,88 @@ def limpiar(text):
     text = text.replace('ñ', 'n').replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')
     return re.sub(r'[^a-z0-9\s]', '', text).strip()
 
-def get_score(row_inv, row_ia):
-    # Puntuación basada en coincidencia de palabras clave
-    texto_inv = limpiar(f"{row_inv['Componente']} {row_inv['Descripcion']}")
-    texto_ia = limpiar(f"{row_ia['Nombre_Comercial_Catalogo']} {row_ia['Compatibilidad_Probable_Texto']}")
-    
-    # 1. Coincidencia del Componente (Es lo mas importante)
-    comp_inv = limpiar(row_inv['Componente'])
-    comp_ia = limpiar(row_ia['Componente_Taxonomia']) # O 'Identificacion_Repuesto'
-    
-    base_score = fuzz.token_set_ratio(comp_inv, comp_ia)
-    
-    # 2. Bonus por Marca/Modelo
-    bonus = 0
-    if base_score > 80: # Solo si el componente parece ser el mismo
-        match_score = fuzz.token_set_ratio(texto_inv, texto_ia)
-        bonus = match_score / 2 # Le damos peso al detalle
-        
-    return base_score + bonus
+# Helper para handle
+def cleaning_handle(s):
+    return re.sub(r'[^a-z0-9-]', '', str(s).lower().replace(' ', '-'))
 
 # --- 3. AGRUPAR IMÁGENES POR SISTEMA (Para búsqueda rápida) ---
 print("2. Indexando imágenes por Sistema...")
+
+def sistema_bucket(sistema):
+    # Mapeo manual de sistemas si difieren (Ej: MOTOR, ELECTRICO)
+    if 'MOTOR' in sistema: return 'MOTOR'
+    elif 'FREN' in sistema or 'CHASIS' in sistema: return 'CHASIS Y FRENOS'
+    elif 'ELEC' in sistema or 'LUZ' in sistema: return 'SISTEMA ELECTRICO'
+    elif 'TRANS' in sistema: return 'TRANSMISION'
+    return 'ACCESORIOS Y OTROS'
+
 imagenes_por_sistema = {}
-for idx, row in df_ia.iterrows():
-    sistema = row['Sistema'] # Ej: MOTOR, ELECTRICO
-    # Mapeo manual de sistemas si difieren
-    if 'MOTOR' in sistema: sistema = 'MOTOR'
-    elif 'FREN' in sistema or 'CHASIS' in sistema: sistema = 'CHASIS Y FRENOS'
-    elif 'ELEC' in sistema or 'LUZ' in sistema: sistema = 'SISTEMA ELECTRICO'
-    elif 'TRANS' in sistema: sistema = 'TRANSMISION'
-    else: sistema = 'ACCESORIOS Y OTROS'
-    
-    if sistema not in imagenes_por_sistema:
-        imagenes_por_sistema[sistema] = []
-    imagenes_por_sistema[sistema].append(row)
+for pos, sistema in enumerate(df_ia['Sistema'].map(sistema_bucket)):
+    imagenes_por_sistema.setdefault(sistema, []).append(pos)
+
+# Fallback: todas las imágenes, sistema por sistema
+todas_las_imagenes = [pos for grupo in imagenes_por_sistema.values() for pos in grupo]
 
 # --- 4. PROCESAMIENTO ---
 print("3. Ejecutando 'El Francotirador' (Matching)...")
+
+# Textos limpios UNA vez por fila (antes: limpiar() en cada comparación)
+texto_inv = (df_inv['Componente'].map(str) + " " + df_inv['Descripcion'].map(str)).map(limpiar).tolist()
+texto_ia = (df_ia['Nombre_Comercial_Catalogo'].map(str) + " " + df_ia['Compatibilidad_Probable_Texto'].map(str)).map(limpiar).tolist()
+comp_inv = df_inv['Componente'].map(limpiar).tolist()
+comp_ia = df_ia['Componente_Taxonomia'].map(limpiar).tolist()
+
+# 1. Componente contra componente: solo entre componentes distintos
+comps_inv = sorted(set(comp_inv))
+comps_ia = sorted(set(comp_ia))
+comp_inv_id = {c: i for i, c in enumerate(comps_inv)}
+comp_ia_id = {c: i for i, c in enumerate(comps_ia)}
+comp_ia_ids = np.array([comp_ia_id[c] for c in comp_ia], dtype=int)
+base_scores = FuzzyMatcher(comps_ia).score_block(comps_inv, range(len(comps_ia))) if comps_ia and comps_inv else None
+
+# 2. Bloqueo (sistema, componente): solo las fotos cuyo componente supera
+#    UMBRAL_COMPONENTE pueden pasar el umbral de aceptación; el orden del
+#    grupo se conserva para que los empates se resuelvan como antes
+grupos = {}
+for pos, (sistema_prod, comp) in enumerate(zip(df_inv['Sistema Principal'], comp_inv)):
+    grupos.setdefault((sistema_prod, comp), []).append(pos)
+
+bloques = []
+for (sistema_prod, comp), filas in grupos.items():
+    grupo_busqueda = imagenes_por_sistema.get(sistema_prod, todas_las_imagenes)
+    if base_scores is None or not grupo_busqueda:
+        continue
+    base = base_scores[comp_inv_id[comp]]
+    cand = np.array(grupo_busqueda)
+    cand = cand[base[comp_ia_ids[cand]] > UMBRAL_COMPONENTE]
+    bloques.append((np.array(filas), cand))
+
+def sumar_componente(filas, cand, match_scores):
+    # score = componente + detalle / 2 (el componente es lo más importante)
+    base = base_scores[comp_inv_id[comp_inv[filas[0]]]][comp_ia_ids[cand]]
+    return base[None, :] + match_scores / 2
+
+# 3. Detalle (marca/modelo) con cdist sobre cada bloque; los puntajes
+#    van de 0.5 en 0.5, así que "> 85" equivale a ">= 85.5"
+matcher = FuzzyMatcher(texto_ia)
+matches = matcher.best(
+    texto_inv, groups=bloques, score_cutoff=UMBRAL_ACEPTACION + 0.5,
+    one_to_one=ASIGNACION_UNICA, combine=sumar_componente
+)
+
 resultados = []
 matches_count = 0
-usadas_tracker = {} # Para intentar no repetir fotos seguidas
 
-for idx, prod in df_inv.iterrows():
+for pos, (idx, prod) in enumerate(df_inv.iterrows()):
     sku = str(prod['SKU'])
-    sistema_prod = prod['Sistema Principal']
-    
-    # Determinar dónde buscar
-    grupo_busqueda = []
-    if sistema_prod in imagenes_por_sistema:
-        grupo_busqueda = imagenes_por_sistema[sistema_prod]
-    else:
-        # Si no encuentra el sistema exacto, busca en todo (fallback)
-        for k in imagenes_por_sistema:
-            grupo_busqueda.extend(imagenes_por_sistema[k])
-            
-    # Buscar mejor match en el grupo
-    mejor_match = None
-    mejor_score = 0
-    
-    for img_candidate in grupo_busqueda:
-        score = get_score(prod, img_candidate)
-        if score > mejor_score:
-            mejor_score = score
-            mejor_match = img_candidate
-    
+    match = matches[pos]
+
     # Decisión
     img_final = ""
     desc_final = prod['Descripcion'] # Por defecto la original
     
-    if mejor_score > 85: # Umbral de aceptación
+    if match: # Umbral de aceptación
+        mejor_match = df_ia.iloc[match[0]]
         matches_count += 1
         img_name_orig = mejor_match['Filename_Original']
         
@@ -149,10 +168,6 @@ for idx, prod in df_inv.iterrows():
     }
     resultados.append(row_shopify)
 
-# Helper para handle
-def cleaning_handle(s):
-    return re.sub(r'[^a-z0-9-]', '', str(s).lower().replace(' ', '-'))
-
 # --- 5. EXPORTAR ---
 df_out = pd.DataFrame(resultados)
 # Corrección de handles (función lambda falló arriba por scope, la aplicamos acá)
@@ -1,33 +1,31 @@
-import csv
 import os
 
+from modules.export_stream import CSVStreamWriter, ExportStream
+
+HEADER = [
+    "sku", "nombre_producto", "descripcion", "precio",
+    "inventario", "categoria", "imagen"
+]
+
 class DropiExporter:
 
     def __init__(self, out_dir):
         self.out_dir = out_dir
 
-    def export(self, productos):
-
+    def row(self, p):
+        return [
+            p.codigo,
+            p.descripcion,
+            p.descripcion_tecnica,
+            p.precio,
+            999,  # inventario estimado
+            p.familia,
+            p.imagen
+        ]
+
+    def open_writer(self, chunk_size=1000):
         path = os.path.join(self.out_dir, "dropi_provider.csv")
+        return CSVStreamWriter(path, HEADER, self.row, label="Dropi provider CSV", chunk_size=chunk_size)
 
-        with open(path, "w", newline="", encoding="utf-8-sig") as f:
-            w = csv.writer(f)
-
-            w.writerow([
-                "sku", "nombre_producto", "descripcion", "precio",
-                "inventario", "categoria", "imagen"
-            ])
-
-            for p in productos:
-
-                w.writerow([
-                    p.codigo,
-                    p.descripcion,
-                    p.descripcion_tecnica,
-                    p.precio,
-                    999,  # inventario estimado
-                    p.familia,
-                    p.imagen
-                ])
-
-        print(f"Dropi provider CSV generado: {path}")
+    def export(self, productos):
+        ExportStream([self.open_writer()]).run(productos)
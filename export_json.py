@@ -1,18 +1,29 @@
-import json
 import os
 
+from modules.export_stream import ExportStream, JSONStreamWriter, NDJSONStreamWriter
+
 class JSONExporter:
+    """
+    lines=False → catalogo_adsi_master.json (arreglo, indent=4)
+    lines=True  → catalogo_adsi_master.ndjson (un producto por línea)
+
+    En ambos casos se escribe producto por producto, sin armar la
+    lista completa de dicts en memoria.
+    """
 
     def __init__(self, out_dir):
         self.out_dir = out_dir
 
-    def export(self, productos):
+    def row(self, p):
+        return p.to_dict()
 
-        path = os.path.join(self.out_dir, "catalogo_adsi_master.json")
+    def open_writer(self, lines=False, chunk_size=1000):
+        if lines:
+            path = os.path.join(self.out_dir, "catalogo_adsi_master.ndjson")
+            return NDJSONStreamWriter(path, self.row, label="NDJSON", chunk_size=chunk_size)
 
-        data = [p.to_dict() for p in productos]
-
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        path = os.path.join(self.out_dir, "catalogo_adsi_master.json")
+        return JSONStreamWriter(path, self.row, indent=4, label="JSON", chunk_size=chunk_size)
 
-        print(f"JSON generado: {path}")
+    def export(self, productos, lines=False):
+        ExportStream([self.open_writer(lines)]).run(productos)
@@ -1,14 +1,22 @@
 import os
+from modules.export_stream import ExportStream
 from modules.export_csv import CSVExporter
 from modules.export_json import JSONExporter
 from modules.export_shopify import ShopifyExporter
 from modules.export_dropi import DropiExporter
 
 class ExportManager:
+    """
+    Exporta todos los formatos en una sola pasada: el iterador de
+    productos se recorre una vez y cada producto va a todos los
+    escritores (CSV maestro, JSON, NDJSON, Shopify, Dropi) con búferes
+    de a lo sumo chunk_size filas.
+    """
 
-    def __init__(self, out_dir="output/csv/"):
+    def __init__(self, out_dir="output/csv/", chunk_size=1000):
         os.makedirs(out_dir, exist_ok=True)
         self.out_dir = out_dir
+        self.chunk_size = chunk_size
 
         self.csv_exp = CSVExporter(out_dir)
         self.json_exp = JSONExporter(out_dir)
@@ -16,14 +24,16 @@ class ExportManager:
         self.dropi_exp = DropiExporter(out_dir)
 
     def export_all(self, productos):
-        print("→ Exportando CSV maestro...")
-        self.csv_exp.export(productos)
+        print("→ Exportando CSV maestro, JSON, NDJSON, Shopify y Dropi...")
 
-        print("→ Exportando JSON estructurado...")
-        self.json_exp.export(productos)
+        stream = ExportStream([
+            self.csv_exp.open_writer(self.chunk_size),
+            self.json_exp.open_writer(lines=False, chunk_size=self.chunk_size),
+            self.json_exp.open_writer(lines=True, chunk_size=self.chunk_size),
+            self.shopify_exp.open_writer(self.chunk_size),
+            self.dropi_exp.open_writer(self.chunk_size),
+        ])
+        total = stream.run(productos)
 
-        print("→ Exportando CSV Shopify...")
-        self.shopify_exp.export(productos)
-
-        print("→ Exportando archivo Dropi...")
-        self.dropi_exp.export(productos)
+        print(f"→ {total} productos exportados")
+        return total
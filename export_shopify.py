@@ -1,37 +1,36 @@
-import csv
 import os
 
+from modules.export_stream import CSVStreamWriter, ExportStream
+
+HEADER = [
+    "Handle", "Title", "Body (HTML)", "Vendor", "Type",
+    "Tags", "Variant Price", "Image Src", "Variant SKU"
+]
+
 class ShopifyExporter:
 
     def __init__(self, out_dir):
         self.out_dir = out_dir
 
-    def export(self, productos):
-
-        path = os.path.join(self.out_dir, "shopify_import.csv")
+    def row(self, p):
 
-        with open(path, "w", newline="", encoding="utf-8-sig") as f:
-            w = csv.writer(f)
+        handle = p.codigo.lower().replace(" ", "-")
 
-            w.writerow([
-                "Handle", "Title", "Body (HTML)", "Vendor", "Type",
-                "Tags", "Variant Price", "Image Src", "Variant SKU"
-            ])
+        return [
+            handle,
+            p.descripcion,
+            p.descripcion_tecnica,
+            "ARMOTOS",
+            p.familia,
+            f"{p.subfamilia},{p.color},{p.modelo_moto}",
+            p.precio,
+            p.imagen,
+            p.codigo
+        ]
 
-            for p in productos:
-
-                handle = p.codigo.lower().replace(" ", "-")
-
-                w.writerow([
-                    handle,
-                    p.descripcion,
-                    p.descripcion_tecnica,
-                    "ARMOTOS",
-                    p.familia,
-                    f"{p.subfamilia},{p.color},{p.modelo_moto}",
-                    p.precio,
-                    p.imagen,
-                    p.codigo
-                ])
+    def open_writer(self, chunk_size=1000):
+        path = os.path.join(self.out_dir, "shopify_import.csv")
+        return CSVStreamWriter(path, HEADER, self.row, label="Shopify CSV", chunk_size=chunk_size)
 
-        print(f"Shopify CSV generado: {path}")
+    def export(self, productos):
+        ExportStream([self.open_writer()]).run(productos)
@@ -0,0 +1,194 @@
+import csv
+import json
+import os
+
+try:
+    import xlsxwriter
+except ImportError:  # Excel opcional: sin xlsxwriter se omite la hoja de cálculo
+    xlsxwriter = None
+
+
+def json_default(o):
+    """
+    Tipos NumPy (int64, float64, bool_) que llegan desde DataFrames.
+    """
+    if hasattr(o, "item"):
+        return o.item()
+    return str(o)
+
+
+class ExportStream:
+    """
+    Exportación en una sola pasada.
+
+    Recorre el iterador de productos UNA vez y entrega cada registro a
+    todos los escritores a la vez (CSV, NDJSON, XLSX, Shopify...). Cada
+    escritor guarda a lo sumo chunk_size filas en su búfer antes de
+    volcarlas al archivo, así la memoria no crece con el catálogo.
+    """
+
+    def __init__(self, writers):
+        self.writers = [w for w in writers if w is not None]
+
+    def run(self, records):
+        total = 0
+        try:
+            for record in records:
+                for w in self.writers:
+                    w.write(record)
+                total += 1
+        finally:
+            for w in self.writers:
+                w.close()
+        return total
+
+
+# ----------------------------------------------------------------------
+# Escritores
+# ----------------------------------------------------------------------
+class StreamWriter:
+    """
+    Base: row_fn convierte el registro en fila, las filas se acumulan en
+    un búfer acotado y write_rows las vuelca por bloques.
+    """
+
+    def __init__(self, path, row_fn, label="Archivo", chunk_size=1000):
+        self.path = path
+        self.row_fn = row_fn
+        self.label = label
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.count = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def write(self, record):
+        self.buffer.append(self.row_fn(record))
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.write_rows(self.buffer)
+            self.count += len(self.buffer)
+            self.buffer = []
+
+    def write_rows(self, rows):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+    def close(self):
+        self.flush()
+        self.finish()
+        print(f"{self.label} generado: {self.path}")
+
+
+class CSVStreamWriter(StreamWriter):
+
+    def __init__(self, path, header, row_fn, encoding="utf-8-sig", **kwargs):
+        super().__init__(path, row_fn, **kwargs)
+        self.f = open(path, "w", newline="", encoding=encoding)
+        self.w = csv.writer(self.f)
+        self.w.writerow(header)
+
+    def write_rows(self, rows):
+        self.w.writerows(rows)
+
+    def finish(self):
+        self.f.close()
+
+
+class NDJSONStreamWriter(StreamWriter):
+    """
+    Un objeto JSON por línea.
+    """
+
+    def __init__(self, path, row_fn, **kwargs):
+        super().__init__(path, row_fn, **kwargs)
+        self.f = open(path, "w", encoding="utf-8")
+
+    def write_rows(self, rows):
+        self.f.write("".join(
+            json.dumps(r, ensure_ascii=False, default=json_default) + "\n" for r in rows
+        ))
+
+    def finish(self):
+        self.f.close()
+
+
+class JSONStreamWriter(StreamWriter):
+    """
+    Arreglo JSON escrito elemento por elemento; con indent el archivo
+    queda igual que json.dump(lista, indent=indent).
+    """
+
+    def __init__(self, path, row_fn, indent=4, **kwargs):
+        super().__init__(path, row_fn, **kwargs)
+        self.indent = indent
+        self.f = open(path, "w", encoding="utf-8")
+        self.f.write("[")
+
+    def write_rows(self, rows):
+        pad = "\n" + " " * self.indent
+        parts = []
+        for r in rows:
+            item = json.dumps(r, indent=self.indent, ensure_ascii=False, default=json_default)
+            parts.append(pad + item.replace("\n", pad))
+
+        sep = "," if self.count else ""
+        self.f.write(sep + ",".join(parts))
+
+    def finish(self):
+        self.f.write("\n]" if self.count else "]")
+        self.f.close()
+
+
+class XLSXStreamWriter(StreamWriter):
+    """
+    Excel con xlsxwriter en modo constant_memory: cada fila se escribe
+    y se libera al pasar a la siguiente (las filas de cada hoja deben ir
+    en orden, que es justo lo que produce el recorrido único).
+
+    sheets: [(nombre, encabezado, row_fn)]
+        row_fn(registro) → fila, o None para no incluirlo en esa hoja.
+        row_fn = None → hoja de resumen: sus filas salen de tables[nombre]()
+        al cerrar (p. ej. conteos acumulados durante la pasada).
+    """
+
+    def __init__(self, path, sheets, tables=None, **kwargs):
+        if xlsxwriter is None:
+            raise RuntimeError("xlsxwriter no está instalado")
+
+        super().__init__(path, lambda record: record, **kwargs)
+        self.tables = tables or {}
+        self.workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+
+        self.sheets = []
+        for name, header, row_fn in sheets:
+            ws = self.workbook.add_worksheet(name)
+            ws.write_row(0, 0, header)
+            self.sheets.append([ws, row_fn, 1])
+
+    def write_rows(self, records):
+        for sheet in self.sheets:
+            ws, row_fn, n = sheet
+            if row_fn is None:
+                continue
+            for record in records:
+                row = row_fn(record)
+                if row is not None:
+                    ws.write_row(n, 0, row)
+                    n += 1
+            sheet[2] = n
+
+    def finish(self):
+        for sheet in self.sheets:
+            ws, row_fn, n = sheet
+            if row_fn is not None or ws.name not in self.tables:
+                continue
+            for row in self.tables[ws.name]():
+                ws.write_row(n, 0, row)
+                n += 1
+        self.workbook.close()
@@ -1,114 +1,228 @@
 import os
-import json
+from collections import Counter
+from itertools import chain
+
 import pandas as pd
 
+from modules.export_stream import (
+    CSVStreamWriter, ExportStream, JSONStreamWriter, NDJSONStreamWriter,
+    XLSXStreamWriter, xlsxwriter
+)
+
 
 class Exporter:
     """
     Exporta el catálogo final en múltiples formatos:
     - CSV maestro
+    - JSON completo (+ NDJSON)
     - Excel con pestañas
-    - JSON completo
     - Shopify CSV
     - SRM CSV
+
+    Acepta un DataFrame o cualquier iterador de dicts (una fila por
+    producto). export_all recorre los registros UNA sola vez y los
+    reparte a todos los escritores a la vez; cada uno guarda a lo sumo
+    chunk_size filas antes de escribirlas. El Excel usa el modo
+    constant_memory de xlsxwriter.
     """
 
-    def __init__(self, output_dir="output/catalog"):
+    def __init__(self, output_dir="output/catalog", chunk_size=1000):
         self.output_dir = output_dir
+        self.chunk_size = chunk_size
         os.makedirs(self.output_dir, exist_ok=True)
 
+    # ----------------------------------------------------------------------
+    # Registros
+    # ----------------------------------------------------------------------
+    def iter_records(self, data):
+        """
+        DataFrame → dicts fila por fila (NaN → None); un iterador de
+        dicts se devuelve tal cual.
+        """
+        if not isinstance(data, pd.DataFrame):
+            return iter(data)
+
+        cols = list(data.columns)
+        return (
+            {c: (None if isinstance(v, float) and v != v else v) for c, v in zip(cols, vals)}
+            for vals in data.itertuples(index=False, name=None)
+        )
+
+    def peek_columns(self, data, records):
+        """
+        Columnas del catálogo (del DataFrame o del primer registro).
+        Devuelve (columnas, registros) sin perder el registro leído.
+        """
+        if isinstance(data, pd.DataFrame):
+            return list(data.columns), records
+
+        first = next(records, None)
+        if first is None:
+            return [], iter(())
+        return list(first), chain([first], records)
+
+    def first_image(self, r):
+        imagenes = r.get("imagenes")
+        return str(imagenes).split(",")[0] if imagenes is not None else ""
+
     # ----------------------------------------------------------------------
     # Guardar CSV normal
     # ----------------------------------------------------------------------
-    def export_csv(self, df):
+    def open_csv(self, columns):
         path = os.path.join(self.output_dir, "catalogo_adsi_master.csv")
-        df.to_csv(path, index=False, encoding="utf-8")
-        print("✔ CSV maestro generado:", path)
+        return CSVStreamWriter(
+            path, columns, lambda r: [r.get(c) for c in columns],
+            encoding="utf-8", label="✔ CSV maestro", chunk_size=self.chunk_size
+        )
 
     # ----------------------------------------------------------------------
-    # Guardar JSON
+    # Guardar JSON / NDJSON
     # ----------------------------------------------------------------------
-    def export_json(self, df):
+    def open_json(self):
         path = os.path.join(self.output_dir, "catalogo_adsi_master.json")
-        df.to_json(path, orient="records", force_ascii=False, indent=2)
-        print("✔ JSON generado:", path)
+        return JSONStreamWriter(path, dict, indent=2, label="✔ JSON", chunk_size=self.chunk_size)
+
+    def open_ndjson(self):
+        path = os.path.join(self.output_dir, "catalogo_adsi_master.ndjson")
+        return NDJSONStreamWriter(path, dict, label="✔ NDJSON", chunk_size=self.chunk_size)
 
     # ----------------------------------------------------------------------
     # Guardar Excel estructurado
     # ----------------------------------------------------------------------
-    def export_excel(self, df):
+    def open_excel(self, columns, familias):
+        """
+        familias: Counter que se llena durante la pasada (hoja Familias).
+        """
+        if xlsxwriter is None:
+            print("[WARN] xlsxwriter no está instalado: se omite el Excel maestro")
+            return None
+
         path = os.path.join(self.output_dir, "catalogo_adsi_master.xlsx")
-        with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name="Productos")
 
-            # Variantes (padre → hijo)
-            variants = df[df["parent_uid"] != ""]
-            variants.to_excel(writer, index=False, sheet_name="Variantes")
+        def producto(r):
+            return [r.get(c) for c in columns]
 
-            # Inventario
-            inv = df[["sku", "descripcion", "precio"]]
-            inv.to_excel(writer, index=False, sheet_name="Inventario")
+        def variante(r):
+            # Variantes (padre → hijo)
+            return producto(r) if r.get("parent_uid", "") != "" else None
 
-            # Índice por familias
-            fam_groups = df.groupby("familia").size().reset_index(name="cantidad")
-            fam_groups.to_excel(writer, index=False, sheet_name="Familias")
+        def inventario(r):
+            return [r.get("sku"), r.get("descripcion"), r.get("precio")]
 
+        def calidad(r):
             # Reporte calidad
-            issues = df[df["descripcion"].str.contains("SIN", na=False)]
-            issues.to_excel(writer, index=False, sheet_name="Calidad")
+            return producto(r) if "SIN" in str(r.get("descripcion") or "") else None
+
+        sheets = [
+            ("Productos", columns, producto),
+            ("Variantes", columns, variante),
+            ("Inventario", ["sku", "descripcion", "precio"], inventario),
+            ("Familias", ["familia", "cantidad"], None),
+            ("Calidad", columns, calidad),
+        ]
 
-        print("✔ Excel maestro generado:", path)
+        # Índice por familias: conteo acumulado, se escribe al cerrar
+        tables = {"Familias": lambda: sorted(familias.items())}
+
+        return XLSXStreamWriter(path, sheets, tables, label="✔ Excel maestro",
+                                chunk_size=self.chunk_size)
 
     # ----------------------------------------------------------------------
     # Exportación específica Shopify
     # ----------------------------------------------------------------------
-    def export_shopify(self, df):
-        shopify = pd.DataFrame()
-
-        shopify["Handle"] = df["sku"].str.lower()
-        shopify["Title"] = df["descripcion"]
-        shopify["Body (HTML)"] = df["marketing"] + "<br>" + df["tecnico"]
-        shopify["Vendor"] = "ARMOTOS"
-        shopify["Product Category"] = df["familia"]
-        shopify["Tags"] = df["subfamilia"]
-        shopify["Variant Price"] = df["precio"]
-        shopify["Image Src"] = df["imagenes"].str.split(",").str[0].fillna("")
-
+    def shopify_row(self, r):
+        marketing, tecnico = r.get("marketing"), r.get("tecnico")
+        body = f"{marketing}<br>{tecnico}" if marketing is not None and tecnico is not None else ""
+
+        return [
+            str(r.get("sku") or "").lower(),
+            r.get("descripcion"),
+            body,
+            "ARMOTOS",
+            r.get("familia"),
+            r.get("subfamilia"),
+            r.get("precio"),
+            self.first_image(r),
+        ]
+
+    def open_shopify(self):
         path = os.path.join(self.output_dir, "shopify_import.csv")
-        shopify.to_csv(path, index=False, encoding="utf-8")
-        print("✔ Shopify CSV generado:", path)
+        header = [
+            "Handle", "Title", "Body (HTML)", "Vendor", "Product Category",
+            "Tags", "Variant Price", "Image Src"
+        ]
+        return CSVStreamWriter(path, header, self.shopify_row, encoding="utf-8",
+                               label="✔ Shopify CSV", chunk_size=self.chunk_size)
 
     # ----------------------------------------------------------------------
     # Exportación compacta SRM
     # ----------------------------------------------------------------------
-    def export_srm(self, df):
+    def srm_row(self, r):
         """
         Formato optimizado para SRM-QK / ADSI Marketplace:
         SKU | CODIGO | NOMBRE | PRECIO | FAMILIA | IMG
         """
-        srm = pd.DataFrame()
+        return [
+            r.get("sku"),
+            r.get("codigo"),
+            r.get("descripcion"),
+            r.get("precio"),
+            r.get("familia"),
+            self.first_image(r),
+        ]
+
+    def open_srm(self):
+        path = os.path.join(self.output_dir, "catalogo_srm.csv")
+        header = ["SKU", "CODIGO", "NOMBRE", "PRECIO", "FAMILIA", "IMG"]
+        return CSVStreamWriter(path, header, self.srm_row, encoding="utf-8",
+                               label="✔ SRM CSV", chunk_size=self.chunk_size)
 
-        srm["SKU"] = df["sku"]
-        srm["CODIGO"] = df["codigo"]
-        srm["NOMBRE"] = df["descripcion"]
-        srm["PRECIO"] = df["precio"]
-        srm["FAMILIA"] = df["familia"]
-        srm["IMG"] = df["imagenes"].str.split(",").str[0].fillna("")
+    # ----------------------------------------------------------------------
+    # Exportaciones individuales (un solo formato)
+    # ----------------------------------------------------------------------
+    def export_csv(self, data):
+        columns, records = self.peek_columns(data, self.iter_records(data))
+        ExportStream([self.open_csv(columns)]).run(records)
 
-        path = os.path.join(self.output_dir, "catalogo_srm.csv")
-        srm.to_csv(path, index=False, encoding="utf-8")
-        print("✔ SRM CSV generado:", path)
+    def export_json(self, data):
+        ExportStream([self.open_json()]).run(self.iter_records(data))
+
+    def export_excel(self, data):
+        columns, records = self.peek_columns(data, self.iter_records(data))
+        familias = Counter()
+        ExportStream([self.open_excel(columns, familias)]).run(
+            self.count_families(records, familias))
+
+    def export_shopify(self, data):
+        ExportStream([self.open_shopify()]).run(self.iter_records(data))
+
+    def export_srm(self, data):
+        ExportStream([self.open_srm()]).run(self.iter_records(data))
+
+    def count_families(self, records, familias):
+        for r in records:
+            if r.get("familia") is not None:
+                familias[r["familia"]] += 1
+            yield r
 
     # ----------------------------------------------------------------------
     # Método maestro
     # ----------------------------------------------------------------------
-    def export_all(self, df):
+    def export_all(self, data):
         print("📦 Exportando catálogo en formatos múltiples...")
 
-        self.export_csv(df)
-        self.export_json(df)
-        self.export_excel(df)
-        self.export_shopify(df)
-        self.export_srm(df)
-
-        print("🎉 EXPORTACIÓN COMPLETA")
+        columns, records = self.peek_columns(data, self.iter_records(data))
+        familias = Counter()
+
+        stream = ExportStream([
+            self.open_csv(columns),
+            self.open_json(),
+            self.open_ndjson(),
+            self.open_excel(columns, familias),
+            self.open_shopify(),
+            self.open_srm(),
+        ])
+        total = stream.run(self.count_families(records, familias))
+
+        print(f"🎉 EXPORTACIÓN COMPLETA ({total} productos)")
+        return total
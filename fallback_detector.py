@@ -1,6 +1,8 @@
 import cv2
 import numpy as np
 
+from modules.image_utils import PageImage
+
 
 class FallbackDetector:
     """
@@ -15,12 +17,14 @@ class FallbackDetector:
     Es especialmente útil para páginas tipo mosaico (muy comunes en ARMOTOS).
     """
 
-    def detect_blocks(self, image_path):
-        img = cv2.imread(image_path)
-        if img is None:
-            return []
+    # Subir al cambiar la lógica (invalida la caché de segmentación)
+    VERSION = "1"
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    def detect_blocks(self, image):
+        page = PageImage.ensure(image)
+        gray = page.gray
+        if gray is None:
+            return []
 
         # Suavizar ruido
         blur = cv2.GaussianBlur(gray, (5, 5), 0)
@@ -59,12 +63,14 @@ class FallbackDetector:
     # ---------------------------------------------------------
     # Método principal
     # ---------------------------------------------------------
-    def detect(self, image_path):
+    def detect(self, image):
         """
+        image: PageImage (o ruta, por compatibilidad)
+
         Devuelve:
             { "blocks": [ {x,y,w,h}, ... ] }
         """
-        blocks = self.detect_blocks(image_path)
+        blocks = self.detect_blocks(image)
 
         return {
             "blocks": blocks
@@ -2,8 +2,8 @@ import pandas as pd
 import os
 import re
 import json
-from thefuzz import fuzz
-from thefuzz import process
+
+from fuzzy_matcher import FuzzyMatcher
 
 # ==============================
 # CONFIGURACIÓN
@@ -23,6 +23,9 @@ OUTPUT_BAT_RENAME = 'renombrar_imagenes.bat'
 # Umbral de Coincidencia (0-100)
 SCORE_CUTOFF = 60
 
+# True → cada imagen IA se asigna a un solo producto del maestro
+ASIGNACION_UNICA = False
+
 # ==============================
 # FUNCIONES DE UTILIDAD
 # ==============================
@@ -91,40 +94,35 @@ def main():
     
     df_ai['Search_Clean'] = df_ai['Search_Text'].apply(clean_text)
     
-    # Lista para búsqueda rápida
+    # Índice para búsqueda rápida (bloqueo por tokens + cdist)
     ai_choices = df_ai['Search_Clean'].tolist()
+    matcher = FuzzyMatcher(ai_choices)
     
     # 3. Fusión (Loop Maestro)
     print("3. Ejecutando emparejamiento (Matching)...")
+
+    # --- MATCHING --- todas las descripciones del maestro de una vez
+    consultas = df_master['Descripcion'].map(str).map(clean_text).tolist()
+    matches = matcher.best(consultas, score_cutoff=SCORE_CUTOFF, one_to_one=ASIGNACION_UNICA)
     
     shopify_rows = []
     rename_commands = [f'mkdir "{IMAGE_OUTPUT_DIR}" 2>nul']
 
     matches_found = 0
 
-    for idx, row in df_master.iterrows():
+    for pos, (idx, row) in enumerate(df_master.iterrows()):
         sku = str(row['SKU'])
         desc_master = str(row['Descripcion'])
-        desc_clean = clean_text(desc_master)
         
-        # --- MATCHING ---
-        best_match = process.extractOne(desc_clean, ai_choices, scorer=fuzz.token_set_ratio, score_cutoff=SCORE_CUTOFF)
+        best_match = matches[pos]
         
         fitment_text = ""
         image_filename = ""
         match_score = 0
         
         if best_match:
-            # --- CORRECCIÓN DE ERROR DE UNPACKING ---
-            if len(best_match) == 3:
-                match_string, match_score, match_idx = best_match
-            else:
-                match_string, match_score = best_match
-                # Buscamos el índice manualmente si la librería no lo devuelve
-                try:
-                    match_idx = ai_choices.index(match_string)
-                except ValueError:
-                    match_idx = -1 # No debería ocurrir
+            match_idx, match_score = best_match
+            match_score = int(match_score)
             
             if match_idx != -1:
                 ai_row = df_ai.iloc[match_idx]
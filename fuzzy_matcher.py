@@ -0,0 +1,197 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+
+class FuzzyMatcher:
+    """
+    Emparejador difuso por bloques: consulta (producto) → mejor opción
+    (imagen / fila IA), sin comparar todo contra todo.
+
+    1. Las opciones se limpian UNA vez (clean_fn) al crear el matcher.
+    2. Bloqueo: índice invertido token → opciones. Cada consulta solo se
+       compara con las opciones que comparten al menos un token; los
+       tokens demasiado comunes (> max_df de las opciones) no bloquean.
+       Si la consulta no comparte ningún token se compara con todas, y
+       si su mejor candidato del bloque no llega a score_cutoff también
+       (el mejor match real puede diferir solo en plurales: "bombillos"
+       vs "bombillo" no comparten token).
+       También se pueden pasar grupos propios (sistema, componente...).
+    3. Cada grupo (consultas que comparten candidatos) se puntúa con
+       rapidfuzz.process.cdist; los grupos se reparten en hilos
+       (rapidfuzz suelta el GIL mientras calcula).
+    4. best() devuelve, por consulta, (índice_opción, score) o None.
+       one_to_one=True → cada opción se asigna a lo sumo una vez
+       (greedy por score, con los top_k candidatos de cada consulta).
+
+    Los puntajes se redondean a entero, igual que thefuzz, para que los
+    umbrales existentes sigan significando lo mismo.
+    """
+
+    def __init__(self, choices, clean_fn=None, scorer=None, max_df=0.25,
+                 min_token_len=2, workers=8):
+        self.clean_fn = clean_fn or (lambda s: s)
+        self.scorer = scorer or fuzz.token_set_ratio
+        self.max_df = max_df
+        self.min_token_len = min_token_len
+        self.workers = workers
+
+        self.choices = [self.clean_fn(c) for c in choices]
+        self.index = None   # se arma al primer uso del bloqueo por tokens
+
+    # --------------------------------------------------------
+    # Bloqueo
+    # --------------------------------------------------------
+    def tokens(self, text):
+        return {t for t in str(text).split() if len(t) >= self.min_token_len}
+
+    def build_index(self):
+        postings = defaultdict(list)
+        for i, text in enumerate(self.choices):
+            for tok in self.tokens(text):
+                postings[tok].append(i)
+
+        limit = max(1, int(self.max_df * len(self.choices)))
+        self.index = {
+            tok: np.array(ids, dtype=np.int64)
+            for tok, ids in postings.items() if len(ids) <= limit
+        }
+
+    def token_groups(self, queries):
+        """
+        Agrupa las consultas por el conjunto de tokens que bloquean:
+        mismas claves → mismos candidatos → un solo cdist.
+        Devuelve [(filas, candidatos)].
+        """
+        if self.index is None:
+            self.build_index()
+
+        by_key = defaultdict(list)
+        for row, text in enumerate(queries):
+            key = tuple(sorted(t for t in self.tokens(text) if t in self.index))
+            by_key[key].append(row)
+
+        everything = np.arange(len(self.choices))
+        groups = []
+        for key, rows in by_key.items():
+            if key:
+                cand = np.unique(np.concatenate([self.index[t] for t in key]))
+            else:
+                cand = everything
+            groups.append((np.array(rows), cand))
+
+        return groups
+
+    # --------------------------------------------------------
+    # Puntuación
+    # --------------------------------------------------------
+    def score_block(self, query_texts, cand):
+        """
+        Matriz (consultas × candidatos) con el scorer, redondeada.
+        """
+        matrix = process.cdist(
+            query_texts, [self.choices[i] for i in cand],
+            scorer=self.scorer, processor=default_process,
+            dtype=np.float32, workers=1
+        )
+        return np.rint(matrix)
+
+    def best(self, queries, groups=None, score_cutoff=0, one_to_one=False,
+             combine=None, top_k=10):
+        """
+        queries: textos de consulta (se limpian con clean_fn).
+        groups:  [(filas, candidatos)] propios; None → bloqueo por tokens,
+                 con nueva pasada contra todas las opciones para las
+                 consultas cuyo bloque no alcanza score_cutoff. Los grupos
+                 propios se respetan tal cual (sin esa pasada).
+                 El orden de los candidatos decide los empates (gana el
+                 primero), como en un recorrido secuencial.
+        combine(filas, candidatos, matriz) → matriz final, para mezclar
+                 el score difuso con otros puntajes.
+        """
+        queries = [self.clean_fn(q) for q in queries]
+        blocked = groups is None
+        if blocked:
+            groups = self.token_groups(queries)
+
+        def run(group):
+            rows, cand = group
+            if len(rows) == 0 or len(cand) == 0:
+                return rows, cand, None
+            matrix = self.score_block([queries[r] for r in rows], cand)
+            if combine is not None:
+                matrix = combine(rows, cand, matrix)
+            return rows, cand, matrix
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            scored = list(pool.map(run, groups))
+            if blocked and score_cutoff > 0:
+                retry = self.below_cutoff(scored, score_cutoff)
+                if len(retry):
+                    scored.append(run((retry, np.arange(len(self.choices)))))
+
+        if one_to_one:
+            return self.assign_unique(len(queries), scored, score_cutoff, top_k)
+
+        results = [None] * len(queries)
+        for rows, cand, matrix in scored:
+            if matrix is None:
+                continue
+            best_col = matrix.argmax(axis=1)
+            best_score = matrix[np.arange(len(rows)), best_col]
+            for r, c, s in zip(rows, best_col, best_score):
+                if s >= score_cutoff:
+                    results[r] = (int(cand[c]), float(s))
+
+        return results
+
+    def below_cutoff(self, scored, score_cutoff):
+        """
+        Filas de bloques parciales cuyo mejor score no llega al umbral:
+        se vuelven a puntuar contra todas las opciones. En esos bloques
+        ninguna fila aporta resultado ni pares, así que basta con sumar
+        el grupo completo a `scored`.
+        """
+        retry = []
+        for rows, cand, matrix in scored:
+            if len(cand) == len(self.choices):
+                continue
+            if matrix is None:
+                retry.extend(rows)
+                continue
+            retry.extend(rows[matrix.max(axis=1) < score_cutoff])
+        return np.array(retry, dtype=np.int64)
+
+    def assign_unique(self, n_queries, scored, score_cutoff, top_k):
+        """
+        Asignación uno a uno: todos los pares (top_k por consulta) sobre
+        el umbral, de mayor a menor score; cada consulta y cada opción
+        se usan una sola vez.
+        """
+        pairs = []
+        for rows, cand, matrix in scored:
+            if matrix is None:
+                continue
+            k = min(top_k, matrix.shape[1])
+            top = np.argsort(-matrix, axis=1, kind="stable")[:, :k]
+            for r, cols in zip(range(len(rows)), top):
+                for c in cols:
+                    s = matrix[r, c]
+                    if s < score_cutoff:
+                        break
+                    pairs.append((-float(s), int(rows[r]), int(cand[c])))
+
+        pairs.sort()
+
+        results = [None] * n_queries
+        used = set()
+        for neg_score, q, c in pairs:
+            if results[q] is not None or c in used:
+                continue
+            results[q] = (c, -neg_score)
+            used.add(c)
+
+        return results
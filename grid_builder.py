@@ -8,8 +8,18 @@ class GridBuilder:
         {x, y, w, h}
 
     Y devuelve una estructura con filas y columnas ordenadas.
+
+    El agrupamiento es un barrido 1-D con NumPy sobre un arreglo (N, 4):
+    se ordena por coordenada y cada valor entra al grupo actual si está
+    a menos del umbral de la MEDIA del grupo. La media sigue a la fila
+    en escaneos inclinados (anclar en la primera celda la partía) y,
+    a diferencia de comparar con la celda anterior, las celdas
+    escalonadas no se encadenan en una sola fila. Coste O(n log n).
     """
 
+    # Subir al cambiar la lógica (invalida la caché de segmentación)
+    VERSION = "4"
+
     def __init__(self, row_threshold=20, col_threshold=20):
         """
         row_threshold: distancia vertical para considerar dos celdas en la misma fila
@@ -19,24 +29,76 @@ class GridBuilder:
         self.col_threshold = col_threshold
 
     # -----------------------------------------------------------
-    # Agrupar celdas en filas por coordenada Y
+    # Celdas → arreglo (N, 4) [x, y, w, h]
     # -----------------------------------------------------------
-    def group_rows(self, cells):
-        rows = []
-        sorted_cells = sorted(cells, key=lambda c: (c["y"], c["x"]))
+    def to_array(self, cells):
+        if not cells:
+            return np.zeros((0, 4), dtype=np.int64)
+        return np.array(
+            [[c["x"], c["y"], c["w"], c["h"]] for c in cells],
+            dtype=np.int64
+        )
 
-        for c in sorted_cells:
-            placed = False
+    # -----------------------------------------------------------
+    # Agrupamiento 1-D por barrido
+    # -----------------------------------------------------------
+    def cluster_1d(self, values, threshold):
+        """
+        Devuelve (labels, starts):
+            labels[i] = índice de grupo de values[i] (ordenados de menor a mayor)
+            starts[k] = valor mínimo del grupo k
 
-            for row in rows:
-                # Comparación vertical
-                if abs(c["y"] - row[0]["y"]) <= self.row_threshold:
-                    row.append(c)
-                    placed = True
+        Un valor entra al grupo actual si v - media(grupo) <= threshold;
+        si no, abre un grupo nuevo.
+        """
+        if len(values) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=values.dtype)
+
+        order = np.argsort(values, kind="stable")
+        sorted_vals = values[order]
+        n = len(sorted_vals)
+
+        # Con los valores ordenados la media del grupo solo sube, así que
+        # todo lo que cabe bajo media + threshold entra de una vez
+        # (searchsorted); la media se recalcula con sumas acumuladas y se
+        # repite hasta que no entra nada más.
+        prefix = np.concatenate(([0], np.cumsum(sorted_vals, dtype=np.float64)))
+        first = []
+        i = 0
+        while i < n:
+            first.append(i)
+            end = i + 1
+            while end < n:
+                mean = (prefix[end] - prefix[i]) / (end - i)
+                nxt = int(np.searchsorted(sorted_vals, mean + threshold, side="right"))
+                if nxt <= end:
                     break
+                end = nxt
+            i = end
+
+        breaks = np.zeros(n, dtype=np.int64)
+        breaks[first] = 1
+        sorted_labels = np.cumsum(breaks) - 1
 
-            if not placed:
-                rows.append([c])
+        labels = np.empty_like(sorted_labels)
+        labels[order] = sorted_labels
+
+        starts = sorted_vals[first]
+        return labels, starts
+
+    # -----------------------------------------------------------
+    # Agrupar celdas en filas por coordenada Y
+    # -----------------------------------------------------------
+    def group_rows(self, cells):
+        if not cells:
+            return []
+
+        boxes = self.to_array(cells)
+        row_ids, _ = self.cluster_1d(boxes[:, 1], self.row_threshold)
+
+        rows = [[] for _ in range(int(row_ids.max()) + 1)]
+        for idx in np.lexsort((boxes[:, 0], boxes[:, 1])):
+            rows[row_ids[idx]].append(cells[idx])
 
         return rows
 
@@ -48,6 +110,42 @@ class GridBuilder:
             row.sort(key=lambda c: c["x"])
         return rows
 
+    # -----------------------------------------------------------
+    # Filas, columnas y spans (celdas combinadas)
+    # -----------------------------------------------------------
+    def compute_layout(self, boxes):
+        """
+        boxes: arreglo (N, 4) [x, y, w, h]
+
+        Devuelve arreglos de longitud N:
+            row      → fila (por Y)
+            col      → posición dentro de su fila (orden por X)
+            grid_col → columna global (por X de todas las celdas)
+            row_span → filas que cubre la celda
+            col_span → columnas que cubre la celda
+        """
+        x, y, w, h = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+        n = len(boxes)
+
+        row, row_starts = self.cluster_1d(y, self.row_threshold)
+        grid_col, col_starts = self.cluster_1d(x, self.col_threshold)
+
+        # Posición dentro de la fila: orden por (fila, x, y), como el
+        # ordenamiento estable por x sobre las celdas ya ordenadas por y
+        order = np.lexsort((y, x, row))
+        sorted_rows = row[order]
+        first_in_row = np.searchsorted(sorted_rows, sorted_rows, side="left")
+        col = np.empty(n, dtype=np.int64)
+        col[order] = np.arange(n) - first_in_row
+
+        # Spans: cuántos inicios de fila/columna caen dentro de la celda
+        row_end = np.searchsorted(row_starts, y + h - self.row_threshold, side="left")
+        col_end = np.searchsorted(col_starts, x + w - self.col_threshold, side="left")
+        row_span = np.maximum(row_end - row, 1)
+        col_span = np.maximum(col_end - grid_col, 1)
+
+        return row, col, grid_col, row_span, col_span, order
+
     # -----------------------------------------------------------
     # Construir grilla final con índices row/col
     # -----------------------------------------------------------
@@ -55,21 +153,23 @@ class GridBuilder:
         if not cells:
             return []
 
-        rows = self.group_rows(cells)
-        rows = self.sort_row_columns(rows)
+        boxes = self.to_array(cells)
+        row, col, grid_col, row_span, col_span, order = self.compute_layout(boxes)
 
-        # Construcción final
+        # Construcción final (fila por fila, de izquierda a derecha)
         grid = []
-        for r_idx, row in enumerate(rows):
-            for c_idx, cell in enumerate(row):
-                grid.append({
-                    "row": r_idx,
-                    "col": c_idx,
-                    "x": cell["x"],
-                    "y": cell["y"],
-                    "w": cell["w"],
-                    "h": cell["h"]
-                })
+        for i in order:
+            grid.append({
+                "row": int(row[i]),
+                "col": int(col[i]),
+                "x": int(boxes[i, 0]),
+                "y": int(boxes[i, 1]),
+                "w": int(boxes[i, 2]),
+                "h": int(boxes[i, 3]),
+                "grid_col": int(grid_col[i]),
+                "row_span": int(row_span[i]),
+                "col_span": int(col_span[i])
+            })
 
         return grid
 
@@ -82,6 +182,6 @@ class GridBuilder:
             cells = [{x,y,w,h}, ...]
 
         Salida:
-            grid = [{row, col, x, y, w, h}, ...]
+            grid = [{row, col, x, y, w, h, grid_col, row_span, col_span}, ...]
         """
         return self.build_grid(cells)
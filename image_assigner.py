@@ -1,30 +1,193 @@
+import math
+
+import numpy as np
+
+from modules.bbox_utils import GridIndex, center, median_size
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
 class ImageAssigner:
+    """
+    Asigna bloques de imágenes a productos por cercanía 2-D.
 
-    def __init__(self):
-        pass
+    Las fotos se indexan en un GridIndex (cubetas del tamaño típico de
+    una foto); cada producto solo evalúa las fotos de su vecindario, que
+    se amplía hasta encontrar k candidatas → ~O(P + I) en lugar de O(P×I).
 
-    def assign(self, productos, image_blocks):
+    Costo producto-foto:
+        - distancia vertical entre centros
+        - separación horizontal entre las dos cajas (0 si se solapan),
+          ponderada por x_weight
+        - descuento por solape de columna (col_weight): la foto que
+          comparte columna con el producto gana frente a la del lado
+
+    one_to_one=True resuelve la asignación global por página, así una
+    foto no se repite en varias filas:
+        - method="greedy":    pares de menor costo primero
+        - method="hungarian": óptimo (scipy); si no está, greedy
+
+    Los productos sin "bbox" (solo "y") se tratan como una franja de
+    todo el ancho y se miden contra el BORDE SUPERIOR de la foto: se
+    vuelve al criterio vertical de siempre.
+    """
+
+    def __init__(self, one_to_one=False, method="greedy", k=8,
+                 x_weight=1.0, col_weight=0.5, max_dist=None):
+        self.one_to_one = one_to_one
+        self.method = method
+        self.k = k
+        self.x_weight = x_weight
+        self.col_weight = col_weight
+        self.max_dist = max_dist
+
+    # --------------------------------------------------------
+    # Cajas en formato dict {x, y, w, h}
+    # --------------------------------------------------------
+    def image_box(self, img):
+        x, y, w, h = img["bbox"]
+        return {"x": x, "y": y, "w": w, "h": h}
+
+    def product_box(self, prod, page_width):
+        if prod.get("bbox"):
+            x, y, w, h = prod["bbox"]
+            return {"x": x, "y": y, "w": w, "h": h}
+        return {"x": 0, "y": prod["y"], "w": page_width, "h": 0, "strip": True}
+
+    # --------------------------------------------------------
+    # Costo de un par producto-foto
+    # --------------------------------------------------------
+    def cost(self, pbox, ibox):
+        if pbox.get("strip"):
+            # Solo "y": distancia al borde superior de la foto, como antes
+            dy = abs(ibox["y"] - pbox["y"])
+        else:
+            _, pcy = center(pbox)
+            _, icy = center(ibox)
+            dy = abs(pcy - icy)
+
+        overlap = min(pbox["x"] + pbox["w"], ibox["x"] + ibox["w"]) - max(pbox["x"], ibox["x"])
+        dx = max(0, -overlap)
+
+        dist = math.hypot(dy, self.x_weight * dx)
+        if self.max_dist is not None and dist > self.max_dist:
+            return None
+
+        narrow = min(pbox["w"], ibox["w"])
+        col_overlap = max(0, overlap) / narrow if narrow > 0 else 0.0
+
+        return dist * (1.0 - self.col_weight * col_overlap)
+
+    # --------------------------------------------------------
+    # Candidatas de cada producto (vecindario creciente)
+    # --------------------------------------------------------
+    def around(self, index, pbox, radius):
+        return list(index.candidates({
+            "x": pbox["x"] - radius,
+            "y": pbox["y"] - radius,
+            "w": pbox["w"] + 2 * radius,
+            "h": pbox["h"] + 2 * radius
+        }))
+
+    def candidates(self, index, pbox, extent):
+        radius = index.cell_size
+        while radius < extent:
+            if len(self.around(index, pbox, radius)) >= self.k:
+                # Margen: una foto algo más lejana pero en la misma
+                # columna puede costar menos que las ya encontradas
+                return self.around(index, pbox, radius * 2 / max(0.25, 1.0 - self.col_weight))
+            radius *= 2
+        return self.around(index, pbox, extent)
+
+    def candidate_pairs(self, productos, image_blocks):
         """
-        Asigna bloques de imágenes a productos basados en cercanía vertical.
+        Devuelve [(costo, i_producto, i_imagen), ...].
         """
-        productos_con_fotos = []
+        iboxes = [self.image_box(img) for img in image_blocks]
+
+        page_w = max(b["x"] + b["w"] for b in iboxes)
+        page_h = max(b["y"] + b["h"] for b in iboxes)
+        pboxes = [self.product_box(p, page_w) for p in productos]
+        page_h = max([page_h] + [b["y"] + b["h"] for b in pboxes])
+        extent = max(page_w, page_h)
+
+        index = GridIndex(cell_size=median_size(iboxes))
+        for j, box in enumerate(iboxes):
+            index.insert(box, j)
+
+        pairs = []
+        for i, pbox in enumerate(pboxes):
+            for j in self.candidates(index, pbox, extent):
+                c = self.cost(pbox, iboxes[j])
+                if c is not None:
+                    pairs.append((c, i, j))
+        return pairs
 
-        for prod in productos:
-            prod_y = prod["y"]
+    # --------------------------------------------------------
+    # Estrategias de asignación
+    # --------------------------------------------------------
+    def nearest(self, pairs, n_products):
+        best = [None] * n_products
+        for c, i, j in pairs:
+            # A igual costo gana la primera foto, como en el recorrido lineal
+            if best[i] is None or (c, j) < best[i]:
+                best[i] = (c, j)
+        return [b[1] if b else None for b in best]
+
+    def greedy(self, pairs, n_products):
+        match = [None] * n_products
+        used = set()
+        for c, i, j in sorted(pairs):
+            if match[i] is None and j not in used:
+                match[i] = j
+                used.add(j)
+        return match
+
+    def hungarian(self, pairs, n_products, n_images):
+        big = 1e12
+        cost = np.full((n_products, n_images), big)
+        for c, i, j in pairs:
+            cost[i, j] = min(cost[i, j], c)
+
+        match = [None] * n_products
+        for i, j in zip(*linear_sum_assignment(cost)):
+            if cost[i, j] < big:
+                match[i] = int(j)
+        return match
+
+    # --------------------------------------------------------
+    # Método principal
+    # --------------------------------------------------------
+    def assign(self, productos, image_blocks):
+        """
+        Asigna a cada producto la foto más cercana (prod["imagen"]).
+        """
+        if not productos:
+            return productos
 
-            # Buscar imagen más cercana en Y
-            closest = None
-            min_dist = 99999
+        if not image_blocks:
+            for prod in productos:
+                prod["imagen"] = None
+            return productos
 
-            for img in image_blocks:
-                (x, y, w, h) = img["bbox"]
-                dist = abs(y - prod_y)
+        pairs = self.candidate_pairs(productos, image_blocks)
 
-                if dist < min_dist:
-                    min_dist = dist
-                    closest = img["file"]
+        if not self.one_to_one:
+            match = self.nearest(pairs, len(productos))
+        elif self.method == "hungarian" and linear_sum_assignment is not None:
+            match = self.hungarian(pairs, len(productos), len(image_blocks))
+        else:
+            match = self.greedy(pairs, len(productos))
 
-            prod["imagen"] = closest
-            productos_con_fotos.append(prod)
+        for prod, j in zip(productos, match):
+            if j is None:
+                prod["imagen"] = None
+            else:
+                # Recortes solo en memoria ("file" = None): no hay archivo
+                # que referenciar, la imagen queda vacía
+                prod["imagen"] = image_blocks[j].get("file")
 
-        return productos_con_fotos
+        return productos
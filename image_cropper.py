@@ -2,28 +2,49 @@ import cv2
 import os
 
 class ImageCropper:
+    """
+    Recorta cada foto detectada como vista NumPy de la página (sin copia).
 
-    def __init__(self):
-        self.out_dir = "output/images/crops/"
-        os.makedirs(self.out_dir, exist_ok=True)
+    Cada recorte se devuelve en memoria:
+        {"name", "file", "bbox", "image"}
+
+    Persistencia:
+        - writer=CropWriter → se encola y se escribe en segundo plano
+        - writer=None       → cv2.imwrite síncrono (comportamiento anterior)
+        - persist=False     → solo en memoria ("file" = None)
+    """
+
+    def __init__(self, out_dir="output/images/crops/", writer=None, persist=True):
+        self.out_dir = out_dir
+        self.writer = writer
+        self.persist = persist
+        if persist:
+            os.makedirs(self.out_dir, exist_ok=True)
 
     def crop_blocks(self, img, image_blocks, page_name):
         """
-        Corta y exporta cada foto detectada.
+        Corta cada foto detectada y, si corresponde, la guarda.
         """
-        saved = []
+        crops = []
 
         for i, (x, y, w, h) in enumerate(image_blocks):
 
             crop = img[y:y+h, x:x+w]
 
             filename = f"{page_name.replace('.png','')}_img_{i}.png"
-            cv_path = os.path.join(self.out_dir, filename)
-            cv2.imwrite(cv_path, crop)
+            cv_path = None
+
+            if self.persist and self.writer is not None:
+                cv_path = self.writer.submit(crop, filename, self.out_dir)
+            elif self.persist:
+                cv_path = os.path.join(self.out_dir, filename)
+                cv2.imwrite(cv_path, crop)
 
-            saved.append({
+            crops.append({
+                "name": filename,
                 "file": cv_path,
-                "bbox": (x, y, w, h)
+                "bbox": (x, y, w, h),
+                "image": crop
             })
 
-        return saved
+        return crops
@@ -0,0 +1,171 @@
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class ImagePrep:
+    """
+    Preparación de imágenes para llamadas Vision.
+
+    En lugar de mandar el archivo tal cual (PNG de varios MB), cada
+    imagen se:
+
+        1. reduce a la resolución útil del modelo: lado mayor <= 2048
+           y lado menor <= 768 (el tile de "detail: high"); nunca se amplía
+        2. re-codifica a JPEG o WebP con la calidad indicada
+           (la transparencia se aplana sobre blanco)
+        3. guarda en una caché LRU por hash del archivo: la misma foto
+           repetida en varias filas se codifica una sola vez
+
+    stats / report() dan los bytes ahorrados en la ejecución.
+    """
+
+    MIME = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+    def __init__(self, max_side=2048, short_side=768, fmt="jpeg", quality=85,
+                 cache_size=512):
+        if fmt not in self.MIME:
+            raise ValueError(f"Formato no soportado: {fmt}")
+
+        self.max_side = max_side
+        self.short_side = short_side
+        self.fmt = fmt
+        self.quality = quality
+        self.cache_size = cache_size
+
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()   # LLMExecutor llama desde varios hilos
+        self.stats = {"images": 0, "cached": 0, "resized": 0, "bytes_in": 0, "bytes_out": 0}
+
+    @property
+    def mime(self):
+        return self.MIME[self.fmt]
+
+    @property
+    def bytes_saved(self):
+        return self.stats["bytes_in"] - self.stats["bytes_out"]
+
+    # --------------------------------------------------------
+    # Redimensionar / re-codificar
+    # --------------------------------------------------------
+    def resize(self, img):
+        h, w = img.shape[:2]
+        scale = min(1.0,
+                    self.max_side / max(h, w),
+                    self.short_side / min(h, w))
+        if scale >= 1.0:
+            return img
+
+        with self.lock:
+            self.stats["resized"] += 1
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+    def flatten_alpha(self, img):
+        if img.ndim == 3 and img.shape[2] == 4:
+            alpha = img[:, :, 3:4].astype(np.float32) / 255.0
+            rgb = img[:, :, :3].astype(np.float32)
+            img = (rgb * alpha + 255.0 * (1.0 - alpha)).astype(np.uint8)
+        return img
+
+    def encode_array(self, img):
+        """
+        Arreglo BGR (o BGRA / gris) → bytes JPEG/WebP.
+        """
+        if img.dtype != np.uint8:   # PNG de 16 bits
+            img = cv2.convertScaleAbs(img, alpha=255.0 / 65535.0)
+        img = self.resize(self.flatten_alpha(img))
+
+        if self.fmt == "webp":
+            params = [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        else:
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+
+        ok, buf = cv2.imencode("." + self.fmt.replace("jpeg", "jpg"), img, params)
+        if not ok:
+            raise ValueError("No se pudo codificar la imagen")
+        return buf.tobytes()
+
+    # --------------------------------------------------------
+    # Archivo → base64 (con caché por hash)
+    # --------------------------------------------------------
+    def encode(self, path):
+        """
+        Devuelve el base64 listo para el data URL (ver data_url / mime).
+        """
+        with open(path, "rb") as f:
+            raw = f.read()
+
+        key = hashlib.sha1(raw).hexdigest()
+        with self.lock:
+            self.stats["images"] += 1
+            self.stats["bytes_in"] += len(raw)
+
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.stats["cached"] += 1
+                b64, size = self.cache[key]
+                self.stats["bytes_out"] += size
+                return b64
+
+        img = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_UNCHANGED)
+        if img is None:
+            raise ValueError(f"No se pudo leer la imagen: {path}")
+
+        data = self.encode_array(img)
+        b64 = base64.b64encode(data).decode("utf-8")
+
+        with self.lock:
+            self.stats["bytes_out"] += len(data)
+            self.cache[key] = (b64, len(data))
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return b64
+
+    def encode_image(self, img):
+        """
+        Recorte en memoria (arreglo NumPy) → base64, con la misma caché.
+        bytes_in cuenta el tamaño sin comprimir del arreglo.
+        """
+        raw = memoryview(np.ascontiguousarray(img)).cast("B")
+
+        key = hashlib.sha1(raw).hexdigest() + f":{img.shape}"
+        with self.lock:
+            self.stats["images"] += 1
+            self.stats["bytes_in"] += raw.nbytes
+
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.stats["cached"] += 1
+                b64, size = self.cache[key]
+                self.stats["bytes_out"] += size
+                return b64
+
+        data = self.encode_array(img)
+        b64 = base64.b64encode(data).decode("utf-8")
+
+        with self.lock:
+            self.stats["bytes_out"] += len(data)
+            self.cache[key] = (b64, len(data))
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return b64
+
+    def data_url(self, path):
+        return f"data:{self.mime};base64,{self.encode(path)}"
+
+    # --------------------------------------------------------
+    # Resumen de la ejecución
+    # --------------------------------------------------------
+    def report(self):
+        s = self.stats
+        pct = 100.0 * self.bytes_saved / s["bytes_in"] if s["bytes_in"] else 0.0
+        return (f"{s['images']} imágenes ({s['cached']} desde caché, {s['resized']} reducidas): "
+                f"{s['bytes_in'] / 1e6:.1f} MB → {s['bytes_out'] / 1e6:.1f} MB "
+                f"({pct:.0f}% ahorrado)")
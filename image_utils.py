@@ -0,0 +1,83 @@
+import os
+import cv2
+import numpy as np
+
+
+class PageImage:
+    """
+    Contexto de una página decodificada UNA sola vez.
+
+    Todos los detectores de PageSegmenter (OpenCV, LayoutParser, Fallback)
+    y CellExtractor reciben este objeto en lugar de la ruta, así la página
+    no se vuelve a leer ni a convertir en cada módulo.
+
+    Las vistas se crean de forma perezosa:
+        - bgr  → imagen original (cv2.imread)
+        - gray → escala de grises
+        - rgb  → orden RGB (LayoutParser)
+    """
+
+    def __init__(self, path=None, bgr=None, name=None):
+        self.path = path
+        self.name = name or (os.path.basename(path) if path else "page")
+
+        self._bgr = bgr
+        self._gray = None
+        self._rgb = None
+        self._loaded = bgr is not None
+
+    # --------------------------------------------------------
+    # Acepta ruta, arreglo BGR o PageImage (compatibilidad)
+    # --------------------------------------------------------
+    @classmethod
+    def ensure(cls, source):
+        if isinstance(source, cls):
+            return source
+        if isinstance(source, np.ndarray):
+            return cls(bgr=source)
+        return cls(path=source)
+
+    # --------------------------------------------------------
+    # Vistas perezosas
+    # --------------------------------------------------------
+    @property
+    def bgr(self):
+        if not self._loaded:
+            self._bgr = cv2.imread(self.path)
+            self._loaded = True
+            if self._bgr is None:
+                print("[ERROR] No se pudo cargar la imagen:", self.path)
+        return self._bgr
+
+    @property
+    def gray(self):
+        if self._gray is None and self.bgr is not None:
+            self._gray = cv2.cvtColor(self._bgr, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def rgb(self):
+        if self._rgb is None and self.bgr is not None:
+            self._rgb = cv2.cvtColor(self._bgr, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    @property
+    def stem(self):
+        return os.path.splitext(self.name)[0]
+
+    @property
+    def shape(self):
+        return None if self.bgr is None else self._bgr.shape
+
+    def is_valid(self):
+        return self.bgr is not None
+
+    # --------------------------------------------------------
+    # Liberar buffers al terminar la página
+    # --------------------------------------------------------
+    def release(self):
+        self._gray = None
+        self._rgb = None
+        if self.path:
+            self._bgr = None
+            self._loaded = False
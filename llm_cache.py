@@ -0,0 +1,194 @@
+import os
+import time
+import base64
+import hashlib
+import sqlite3
+import threading
+
+
+class CacheMiss(Exception):
+    """
+    Modo replay: la respuesta no está en caché y no se permite llamar al modelo.
+    """
+    pass
+
+
+class LLMResponseCache:
+    """
+    Caché persistente (SQLite) de respuestas LLM/Vision.
+
+    Clave = sha256( sha256(imagen) | sha256(prompt) | modelo | temperatura )
+
+    Se guarda la respuesta CRUDA del modelo: al corregir el normalizador
+    o el parseo del JSON se puede re-ejecutar el catálogo sin volver a
+    pagar las llamadas.
+
+    Modos:
+        - "readwrite": consulta y guarda (por defecto)
+        - "replay":    solo lectura; un fallo de caché lanza CacheMiss
+                       (re-ejecución offline / pruebas de regresión)
+        - "off":       sin caché
+
+    Desalojo: entradas más viejas que ttl_seconds y, si se supera
+    max_entries, las usadas hace más tiempo.
+    """
+
+    def __init__(self, path="output/cache/llm_responses.sqlite", mode="readwrite",
+                 ttl_seconds=None, max_entries=None):
+        self.path = path
+        self.mode = mode
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+        self.lock = threading.Lock()
+
+        self.conn = None
+        if mode != "off":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key        TEXT PRIMARY KEY,
+                    model      TEXT,
+                    response   TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used  REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON responses(last_used)")
+            self.conn.commit()
+
+    @property
+    def replay(self):
+        return self.mode == "replay"
+
+    # --------------------------------------------------------
+    # Clave
+    # --------------------------------------------------------
+    def make_key(self, image_b64, prompt, model, temperature):
+        """
+        image_b64: una imagen o una lista (lote multi-recorte, en orden).
+        """
+        if isinstance(image_b64, str):
+            img_hash = hashlib.sha256(base64.b64decode(image_b64)).hexdigest()
+        else:
+            img_hash = ",".join(
+                hashlib.sha256(base64.b64decode(b64)).hexdigest() for b64 in image_b64
+            )
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        raw = f"{img_hash}|{prompt_hash}|{model}|{float(temperature)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # --------------------------------------------------------
+    # Lectura / escritura
+    # --------------------------------------------------------
+    def lookup(self, key):
+        """
+        Respuesta guardada o None, sin contar el fallo ni lanzar CacheMiss
+        (consulta previa del LLMExecutor antes de gastar presupuesto).
+        """
+        if self.conn is None:
+            return None
+
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                return None
+
+            self.stats["hits"] += 1
+            if not self.replay:
+                self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self.conn.commit()
+
+        return row[0]
+
+    def get(self, key):
+        """
+        Respuesta guardada o None. En modo replay un fallo lanza CacheMiss.
+        """
+        if self.conn is None:
+            return None
+
+        response = self.lookup(key)
+        if response is None:
+            with self.lock:
+                self.stats["misses"] += 1
+            if self.replay:
+                raise CacheMiss(key)
+
+        return response
+
+    def put(self, key, response, model=None):
+        if self.conn is None or self.replay or response is None:
+            return
+
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            self.conn.commit()
+            self.stats["writes"] += 1
+
+    # --------------------------------------------------------
+    # Llamada con caché
+    # --------------------------------------------------------
+    def cached_call(self, image_b64, prompt, model, temperature, call):
+        """
+        Devuelve la respuesta cacheada o ejecuta call() y la guarda.
+        """
+        if self.conn is None:
+            return call()
+
+        key = self.make_key(image_b64, prompt, model, temperature)
+        response = self.get(key)
+        if response is not None:
+            return response
+
+        response = call()
+        self.put(key, response, model)
+        return response
+
+    # --------------------------------------------------------
+    # Desalojo por TTL y tamaño
+    # --------------------------------------------------------
+    def evict(self):
+        if self.conn is None or self.replay:
+            return
+
+        with self.lock:
+            removed = 0
+
+            if self.ttl_seconds:
+                cur = self.conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?",
+                    (time.time() - self.ttl_seconds,)
+                )
+                removed += cur.rowcount
+
+            if self.max_entries:
+                total = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                extra = total - self.max_entries
+                if extra > 0:
+                    cur = self.conn.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                        (extra,)
+                    )
+                    removed += cur.rowcount
+
+            self.conn.commit()
+            self.stats["evicted"] += removed
+
+    def close(self):
+        if self.conn is not None:
+            self.evict()
+            self.conn.close()
+            self.conn = None
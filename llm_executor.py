@@ -0,0 +1,236 @@
+import json
+import time
+import random
+import asyncio
+
+from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+# ------------------------------------------------------------
+# Token bucket (asyncio)
+# ------------------------------------------------------------
+class TokenBucket:
+    """
+    Cubeta de tokens que se rellena a rate_per_minute / 60 por segundo.
+    acquire(n) espera hasta que haya n unidades disponibles.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity or rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def penalize(self, seconds):
+        """
+        Tras un 429 vacía la cubeta para que nadie salga antes de 'seconds'.
+        """
+        self.tokens = min(self.tokens, -seconds * self.rate)
+        self.updated = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Presupuesto combinado: requests por minuto + tokens por minuto.
+    """
+
+    def __init__(self, rpm=500, tpm=200000):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    async def acquire(self, tokens):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def penalize(self, seconds):
+        self.requests.penalize(seconds)
+
+
+# ------------------------------------------------------------
+# Escritura ordenada del JSON de salida
+# ------------------------------------------------------------
+class OrderedJSONWriter:
+    """
+    Escribe un arreglo JSON en orden de entrada aunque los resultados
+    lleguen desordenados: guarda los adelantados y vuelca el prefijo
+    contiguo en cuanto está completo. None = elemento omitido.
+
+    flatten=True: cada resultado es una lista (lote) y se escriben
+    sus elementos uno a uno.
+    """
+
+    def __init__(self, outfile, flatten=False):
+        self.flatten = flatten
+        self.f = open(outfile, "w", encoding="utf-8")
+        self.f.write("[\n")
+        self.next_idx = 0
+        self.pending = {}
+        self.written = 0
+
+    def add(self, idx, item):
+        self.pending[idx] = item
+        while self.next_idx in self.pending:
+            value = self.pending.pop(self.next_idx)
+            values = (value or []) if self.flatten else [value]
+            for v in values:
+                if v is None:
+                    continue
+                if self.written:
+                    self.f.write(",\n")
+                self.f.write(json.dumps(v, indent=4, ensure_ascii=False))
+                self.written += 1
+            self.next_idx += 1
+        self.f.flush()
+
+    def close(self):
+        self.f.write("\n]\n")
+        self.f.close()
+
+
+# ------------------------------------------------------------
+# Ejecutor concurrente
+# ------------------------------------------------------------
+class LLMExecutor:
+    """
+    Ejecuta llamadas LLM/Vision con:
+
+        - tope de concurrencia (semaforo)
+        - limitador RPM + TPM (token bucket)
+        - backoff exponencial con jitter que respeta retry-after
+        - resultados en orden (lista y, opcional, JSON en streaming)
+
+    'call' es una función síncrona (LLMParser.parse_row,
+    VisionExtractor.analyze_once, ...) que se ejecuta en hilos.
+    """
+
+    def __init__(self, concurrency=8, rpm=500, tpm=200000,
+                 tokens_per_request=1500, max_retries=6,
+                 base_delay=1.0, max_delay=60.0, retry_on=RETRYABLE_ERRORS):
+        self.concurrency = concurrency
+        self.rpm = rpm
+        self.tpm = tpm
+        self.tokens_per_request = tokens_per_request
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+
+        self.stats = {"ok": 0, "failed": 0, "retries": 0, "cached": 0}
+
+    # --------------------------------------------------------
+    # Espera tras un error: retry-after del servidor o backoff
+    # --------------------------------------------------------
+    def retry_delay(self, error, attempt):
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+
+        for name, factor in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+            value = headers.get(name)
+            if value:
+                try:
+                    return min(self.max_delay, float(value) * factor)
+                except ValueError:
+                    pass
+
+        # Full jitter: uniforme en [0, base * 2^attempt]
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _run_one(self, idx, item, call, limiter, semaphore, label, precheck):
+        # Resultado ya disponible (p.ej. caché): no consume presupuesto
+        if precheck is not None:
+            cached = await asyncio.to_thread(precheck, item)
+            if cached is not None:
+                self.stats["cached"] += 1
+                return idx, cached, None
+
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await limiter.acquire(self.tokens_per_request)
+                try:
+                    result = await asyncio.to_thread(call, item)
+                    self.stats["ok"] += 1
+                    return idx, result, None
+
+                except self.retry_on as e:
+                    if attempt == self.max_retries:
+                        self.stats["failed"] += 1
+                        return idx, None, e
+
+                    wait = self.retry_delay(e, attempt)
+                    self.stats["retries"] += 1
+                    if isinstance(e, RateLimitError):
+                        limiter.penalize(wait)
+                    print(f"[WAIT] {label(item)}: {type(e).__name__}, reintento en {wait:.1f}s")
+                    await asyncio.sleep(wait)
+
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    return idx, None, e
+
+    async def _run(self, items, call, writer, on_error, label, precheck):
+        limiter = RateLimiter(self.rpm, self.tpm)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        results = [None] * len(items)
+        tasks = [
+            asyncio.create_task(self._run_one(i, item, call, limiter, semaphore, label, precheck))
+            for i, item in enumerate(items)
+        ]
+
+        for done in asyncio.as_completed(tasks):
+            idx, result, error = await done
+
+            if error is not None:
+                print(f"[ERROR] Falló {label(items[idx])}: {error}")
+                result = on_error(items[idx], error) if on_error else None
+
+            results[idx] = result
+            if writer is not None:
+                writer.add(idx, result)
+
+        return results
+
+    def map(self, items, call, out_json=None, on_error=None, label=str, precheck=None,
+            flatten=False):
+        """
+        Procesa items con call(item) y devuelve los resultados en orden.
+
+        out_json: si se indica, el arreglo JSON se escribe en orden a
+                  medida que se completan los resultados.
+        on_error: on_error(item, error) → resultado de reemplazo
+                  (None = se omite el elemento).
+        precheck: precheck(item) → resultado sin llamar al modelo, o None
+                  (consulta de caché; no pasa por el limitador).
+        flatten:  cada item es un lote y call devuelve una lista; el
+                  resultado (y el JSON) se aplanan a un elemento por celda.
+        """
+        items = list(items)
+        writer = OrderedJSONWriter(out_json, flatten=flatten) if out_json else None
+
+        try:
+            results = asyncio.run(self._run(items, call, writer, on_error, label, precheck))
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if flatten:
+            return [r for batch in results for r in (batch or [])]
+        return results
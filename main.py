@@ -1,11 +1,19 @@
 import os
+import argparse
+import traceback
+from multiprocessing import util as mp_util
+from concurrent.futures import ProcessPoolExecutor
 
 # Módulos internos del extractor
+from modules.image_utils import PageImage
+from modules.pdf_rasterizer import PDFRasterizer
+from modules.pdf_text_layer import PDFTextLayer
 from modules.preprocessing import Preprocessor
 from modules.layout_detector import LayoutDetector
 from modules.table_detector import TableDetector
 from modules.image_detector import ImageDetector
 from modules.image_cropper import ImageCropper
+from modules.crop_writer import CropWriter
 from modules.ocr_reader import OCRReader
 from modules.product_segmenter import ProductSegmenter
 from modules.postprocessor import PostProcessor
@@ -28,123 +36,362 @@ from utils.logger import get_logger
 logger = get_logger()
 
 
-def run_extractor():
+# ============================================================
+# MÓDULOS POR PROCESO
+# ============================================================
+# Cada proceso (el principal o un worker del pool) construye sus
+# módulos una sola vez y los reutiliza para todas sus páginas.
+_components = None
+_options = {}
+
+
+def init_worker(options):
+    """
+    Inicializador de cada proceso: guarda las opciones del run.
+    """
+    global _options, _components
+    _options = dict(options)
+    _components = None
+    # Al salir el proceso del pool se cierran sus módulos (pool OCR,
+    # escritor de recortes, PDF abierto de la capa de texto)
+    mp_util.Finalize(None, close_components, exitpriority=10)
+
+
+def build_crop_writer():
+    """
+    Escritura en segundo plano de las fotos recortadas.
+    crop_format="none" → recortes solo en memoria.
+    """
+    fmt = _options.get("crop_format", "png")
+    if fmt == "none":
+        return None
+    return CropWriter(fmt=fmt, level=_options.get("crop_level", 1))
+
+
+def build_components():
+    crop_writer = build_crop_writer()
+    return {
+        "pre": Preprocessor(),
+        "layout": LayoutDetector(),
+        "table_det": TableDetector(),
+        "imgdet": ImageDetector(),
+        "crop_writer": crop_writer,
+        "cropper": ImageCropper(writer=crop_writer, persist=crop_writer is not None),
+        "ocr": OCRReader(
+            mode=_options.get("ocr_mode", "region"),
+            backend=_options.get("ocr_backend", "pytesseract"),
+            workers=_options.get("ocr_workers", 4)
+        ),
+        "segmenter": ProductSegmenter(),
+        "post": PostProcessor(),
+        "assigner": ImageAssigner(one_to_one=_options.get("one_to_one", False)),
+        "normalizer": Normalizer(),
+        "rasterizer": PDFRasterizer(dpi=_options.get("dpi", 300)),
+        "text_layer": PDFTextLayer(dpi=_options.get("dpi", 300))
+        if _options.get("text_layer") else None,
+    }
+
+
+def get_components():
+    global _components
+    if _components is None:
+        _components = build_components()
+    return _components
+
+
+def close_components(log_metrics=False):
+    """
+    Cierra los módulos con recursos propios de este proceso.
+    log_metrics: registra las métricas del pool OCR y de los recortes.
+    """
+    global _components
+    if _components is None:
+        return
+    c, _components = _components, None
+
+    if log_metrics:
+        ocr_metrics = c["ocr"].metrics()
+        if ocr_metrics:
+            logger.info(f"OCR pool: {ocr_metrics}")
+    c["ocr"].close()
+    if c["text_layer"] is not None:
+        c["text_layer"].close()
+    if c["crop_writer"] is not None:
+        c["crop_writer"].close()
+        if log_metrics:
+            logger.info(f"Recortes: {c['crop_writer'].metrics()}")
+
+
+# ============================================================
+# FUENTES DE PÁGINA
+# ============================================================
+# Una página puede llegar como:
+#   - ruta PNG                     (input/pages/)
+#   - PageImage ya decodificada    (PDFRasterizer en streaming)
+#   - (pdf_path, page_no)          (el worker renderiza su propia página)
+def source_name(source):
+    if isinstance(source, PageImage):
+        return source.name
+    if isinstance(source, tuple):
+        # Mismo nombre que da el rasterizador, sin construir los módulos
+        return PDFRasterizer().page_name(source[1])
+    return os.path.basename(source)
+
+
+def load_page(source):
+    if isinstance(source, tuple):
+        pdf_path, page_no = source
+        return get_components()["rasterizer"].render_page(pdf_path, page_no)
+    return PageImage.ensure(source)
+
+
+# ============================================================
+# PROCESAMIENTO DE UNA PÁGINA
+# ============================================================
+def process_page(source):
+    """
+    Ejecuta las fases 1–6 sobre una página y devuelve sus productos.
+    Es la unidad de trabajo tanto del modo serial como del pool.
+    """
+    c = get_components()
+    pre = c["pre"]
+    layout = c["layout"]
+    imgdet = c["imgdet"]
+    cropper = c["cropper"]
+    ocr = c["ocr"]
+    segmenter = c["segmenter"]
+    post = c["post"]
+    assigner = c["assigner"]
+    normalizer = c["normalizer"]
+
+    # --------------------------------------------------------
+    # 0 — CAPA DE TEXTO NATIVA (PDF digital → sin OCR)
+    # --------------------------------------------------------
+    text_layer = None
+    if isinstance(source, tuple) and c["text_layer"] is not None:
+        text_layer = c["text_layer"].extract_page(*source)
+
+    page_img = load_page(source)
+    page = page_img.name
+
+    # --------------------------------------------------------
+    # 1 — PREPROCESAMIENTO
+    # --------------------------------------------------------
+    img, gray, norm = pre.process(page_img)
+
+    # --------------------------------------------------------
+    # 2 — DETECCIÓN DE LAYOUT (o bloques de la capa de texto)
+    # --------------------------------------------------------
+    if text_layer is not None:
+        blocks, textos = text_layer
+    else:
+        blocks = layout.detect(norm)
+
+    # --------------------------------------------------------
+    # 3 — DETECCIÓN DE IMÁGENES + CROP
+    # --------------------------------------------------------
+    image_blocks = imgdet.detect_images(norm)
+    images = cropper.crop_blocks(img, image_blocks, page)
+
+    # --------------------------------------------------------
+    # 4 — SEGMENTACIÓN DE PRODUCTOS
+    # --------------------------------------------------------
+    rows = segmenter.segment_products(blocks)
+    productos_detectados = []
+
+    # OCR de todos los bloques (una llamada por página en modo "page"),
+    # solo si la página no trae capa de texto utilizable
+    if text_layer is None:
+        textos = ocr.read_blocks(norm, [b for fila in rows for b in fila])
+
+    # Texto de cada fila
+    textos_filas = [
+        "".join(" " + ocr.clean_text(textos[b]) for b in fila)
+        for fila in rows
+    ]
+
+    # Código / precio / empaque de todas las filas en una pasada
+    campos = post.extract_fields(textos_filas)
+
+    for fila, texto_fila, cods, precio, emp in zip(
+            rows, textos_filas, campos["codigos"], campos["precio"], campos["empaque"]):
+
+        y_pos = sum([b[1] for b in fila]) // len(fila)
+        x0 = min(b[0] for b in fila)
+        y0 = min(b[1] for b in fila)
+        x1 = max(b[0] + b[2] for b in fila)
+        y1 = max(b[1] + b[3] for b in fila)
+
+        productos_detectados.append({
+            "y": y_pos,
+            "bbox": (x0, y0, x1 - x0, y1 - y0),
+            "codigos": cods,
+            "descripcion": texto_fila.strip(),
+            "precio": precio,
+            "empaque": emp
+        })
+
+    # --------------------------------------------------------
+    # 5 — ASIGNAR IMÁGENES POR CERCANÍA
+    # --------------------------------------------------------
+    productos_detectados = assigner.assign(productos_detectados, images)
+
+    # --------------------------------------------------------
+    # 6 — NORMALIZACIÓN ADSI COMPLETA
+    # --------------------------------------------------------
+    productos_finales = []
+
+    for prod in productos_detectados:
+        for code in prod["codigos"]:
+
+            p = Product(
+                codigo=code,
+                descripcion=prod["descripcion"],
+                precio=prod["precio"],
+                empaque=prod["empaque"],
+                imagen=prod["imagen"]
+            )
+
+            # 🔵 Normalización ADSI
+            p.color = normalizer.detect_color(p.descripcion)
+            p.modelo_moto = normalizer.detect_moto(p.descripcion)
+            p.familia = normalizer.detect_familia(p.descripcion)
+            p.subfamilia = normalizer.detect_subfamilia(p.descripcion)
+            p.descripcion_tecnica, p.descripcion_marketing = \
+                normalizer.split_description(p.descripcion)
+
+            productos_finales.append(p)
+
+    # (7 — variantes padre-hijo: se agrupan sobre todo el catálogo
+    #  en run_extractor, no por página)
+
+    # Las fotos de esta página quedan en disco antes de entregar el
+    # resultado (el proceso del pool puede terminar después)
+    if c["crop_writer"] is not None:
+        c["crop_writer"].flush()
+
+    return productos_finales
+
+
+def safe_process_page(source):
+    """
+    Envoltura que nunca lanza: un fallo en una página no detiene el lote.
+    Devuelve (nombre_página, productos, error).
+    """
+    name = source_name(source)
+    try:
+        return name, process_page(source), None
+    except Exception:
+        return name, [], traceback.format_exc()
+
+
+# ============================================================
+# EJECUTOR DE PÁGINAS (serial o pool de procesos)
+# ============================================================
+def iter_page_results(page_paths, workers=1, options=None):
+    """
+    Genera (página, productos, error) en el MISMO orden de page_paths
+    (rutas, PageImage o referencias (pdf_path, page_no)).
+
+    workers <= 1 → ejecución serial en este proceso.
+    workers > 1  → ProcessPoolExecutor; los resultados se entregan
+                   en orden de página a medida que van llegando.
+    options: opciones del run (p.ej. ocr_mode) para cada proceso.
+    """
+    options = options or {}
+
+    if workers <= 1:
+        init_worker(options)
+        for img_path in page_paths:
+            yield safe_process_page(img_path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(options,)) as pool:
+        for result in pool.map(safe_process_page, page_paths):
+            yield result
+
+
+def collect_sources(pages_dir, pdf_path, workers, dpi, render_workers, text_layer=False):
+    """
+    PNG: rutas ordenadas de pages_dir.
+    PDF serial: PageImage en streaming (sin PNG intermedio).
+    PDF con pool o con capa de texto: referencias (pdf_path, page_no);
+    cada página se lee/renderiza en el proceso que la procesa.
+    """
+    if not pdf_path:
+        pages = sorted(p for p in os.listdir(pages_dir) if p.lower().endswith(".png"))
+        return [os.path.join(pages_dir, p) for p in pages], len(pages)
+
+    rasterizer = PDFRasterizer(dpi=dpi, workers=render_workers)
+    total = rasterizer.page_count(pdf_path)
+
+    if workers <= 1 and not text_layer:
+        return rasterizer.iter_pages(pdf_path), total
+
+    return [(pdf_path, n) for n in range(1, total + 1)], total
+
+
+def run_extractor(pages_dir="input/pages/", workers=1, ocr_mode="region",
+                  ocr_backend="pytesseract", ocr_workers=4,
+                  pdf_path=None, dpi=300, render_workers=1, text_layer=False,
+                  crop_format="png", crop_level=1, one_to_one=False):
     logger.info("=== EXTRACTOR_V4 — Pipeline Completo Fase 1–6 ===")
 
     # ------------------------------------------------------------
-    # Inicialización de módulos
+    # Inicialización de módulos (fase 6 corre en el proceso principal)
     # ------------------------------------------------------------
-    pre = Preprocessor()
-    layout = LayoutDetector()
-    table_det = TableDetector()
-    imgdet = ImageDetector()
-    cropper = ImageCropper()
-    ocr = OCRReader()
-    segmenter = ProductSegmenter()
-    post = PostProcessor()
-    assigner = ImageAssigner()
-
-    normalizer = Normalizer()
-    variant_builder = VariantBuilder()
-
     validator = Validator()
     cleaner = Cleaner()
 
-    pages_dir = "input/pages/"
-    pages = [p for p in os.listdir(pages_dir) if p.lower().endswith(".png")]
+    page_sources, total_pages = collect_sources(pages_dir, pdf_path, workers, dpi,
+                                                render_workers, text_layer)
 
     all_products = []  # 🔥 Donde acumulamos todos los productos del catálogo
+    failed_pages = []
 
     # ============================================================
     # PROCESAMIENTO POR PÁGINA
     # ============================================================
-    for page in pages:
-        logger.info(f"Procesando página: {page}")
+    logger.info(f"Páginas: {total_pages} — workers: {workers} — OCR: {ocr_mode}")
+
+    options = {
+        "ocr_mode": ocr_mode,
+        "ocr_backend": ocr_backend,
+        "ocr_workers": ocr_workers,
+        "dpi": dpi,
+        "text_layer": text_layer,
+        "crop_format": crop_format,
+        "crop_level": crop_level,
+        "one_to_one": one_to_one
+    }
+
+    for page, productos_finales, error in iter_page_results(page_sources, workers, options):
+
+        if error:
+            logger.error(f"Falló la página {page}:\n{error}")
+            failed_pages.append(page)
+            continue
 
-        img_path = os.path.join(pages_dir, page)
+        logger.info(f"Productos procesados en {page}: {len(productos_finales)}")
 
-        # --------------------------------------------------------
-        # 1 — PREPROCESAMIENTO
-        # --------------------------------------------------------
-        img, gray, norm = pre.process(img_path)
+        all_products.extend(productos_finales)
 
-        # --------------------------------------------------------
-        # 2 — DETECCIÓN DE LAYOUT
-        # --------------------------------------------------------
-        blocks = layout.detect(norm)
+    if failed_pages:
+        logger.warning(f"Páginas con error ({len(failed_pages)}): {', '.join(failed_pages)}")
 
-        # --------------------------------------------------------
-        # 3 — DETECCIÓN DE IMÁGENES + CROP
-        # --------------------------------------------------------
-        image_blocks = imgdet.detect_images(norm)
-        images = cropper.crop_blocks(img, image_blocks, page)
-
-        # --------------------------------------------------------
-        # 4 — SEGMENTACIÓN DE PRODUCTOS
-        # --------------------------------------------------------
-        rows = segmenter.segment_products(blocks)
-        productos_detectados = []
-
-        for fila in rows:
-
-            y_pos = sum([b[1] for b in fila]) // len(fila)
-            texto_fila = ""
-
-            # OCR por cada bloque
-            for b in fila:
-                texto_fila += " " + ocr.clean_text(ocr.read_region(norm, b))
-
-            cods = post.extract_codigos(texto_fila)
-            precio = post.extract_precio(texto_fila)
-            emp = post.extract_empaque(texto_fila)
-
-            productos_detectados.append({
-                "y": y_pos,
-                "codigos": cods,
-                "descripcion": texto_fila.strip(),
-                "precio": precio,
-                "empaque": emp
-            })
-
-        # --------------------------------------------------------
-        # 5 — ASIGNAR IMÁGENES POR CERCANÍA
-        # --------------------------------------------------------
-        productos_detectados = assigner.assign(productos_detectados, images)
-
-        # --------------------------------------------------------
-        # 6 — NORMALIZACIÓN ADSI COMPLETA
-        # --------------------------------------------------------
-        productos_finales = []
-
-        for prod in productos_detectados:
-            for code in prod["codigos"]:
-
-                p = Product(
-                    codigo=code,
-                    descripcion=prod["descripcion"],
-                    precio=prod["precio"],
-                    empaque=prod["empaque"],
-                    imagen=prod["imagen"]
-                )
-
-                # 🔵 Normalización ADSI
-                p.color = normalizer.detect_color(p.descripcion)
-                p.modelo_moto = normalizer.detect_moto(p.descripcion)
-                p.familia = normalizer.detect_familia(p.descripcion)
-                p.subfamilia = normalizer.detect_subfamilia(p.descripcion)
-                p.descripcion_tecnica, p.descripcion_marketing = \
-                    normalizer.split_description(p.descripcion)
-
-                productos_finales.append(p)
-
-        # --------------------------------------------------------
-        # 7 — VARIANTES PADRE-HIJO
-        # --------------------------------------------------------
-        productos_finales = variant_builder.assign_variants(productos_finales)
+    # Métricas del pool OCR (solo visibles en modo serial, mismo proceso);
+    # con --workers cada proceso cierra sus módulos al terminar el pool
+    if workers <= 1:
+        close_components(log_metrics=True)
 
-        logger.info(f"Productos procesados en {page}: {len(productos_finales)}")
+    # ============================================================
+    # 7 — VARIANTES PADRE-HIJO (catálogo completo, MinHash/LSH)
+    # ============================================================
+    logger.info("Agrupando variantes…")
 
-        all_products.extend(productos_finales)
+    all_products = VariantBuilder().assign_variants(all_products)
+    logger.info(f"Variantes: {sum(1 for p in all_products if p.variante)}")
 
     # ============================================================
     # 8 — VALIDACIÓN + LIMPIEZA (FASE 6)
@@ -168,5 +415,42 @@ def run_extractor():
     logger.info(f"Total productos exportados: {len(productos_limpios)}")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="EXTRACTOR_V4 — Pipeline Completo")
+    parser.add_argument("--pages", default="input/pages/",
+                        help="Carpeta con las páginas PNG")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos en paralelo (1 = serial)")
+    parser.add_argument("--ocr-mode", choices=["region", "page"], default="region",
+                        help="region = Tesseract por bloque; page = una llamada por página")
+    parser.add_argument("--ocr-backend", choices=["pytesseract", "pool"], default="pytesseract",
+                        help="pool = workers OCR persistentes (tesserocr si está instalado)")
+    parser.add_argument("--ocr-workers", type=int, default=4,
+                        help="Workers OCR por proceso con --ocr-backend pool")
+    parser.add_argument("--pdf", default=None,
+                        help="PDF de catálogo: se rasteriza en streaming, sin PNG intermedios")
+    parser.add_argument("--dpi", type=int, default=300,
+                        help="Resolución de rasterizado del PDF")
+    parser.add_argument("--render-workers", type=int, default=1,
+                        help="Procesos de rasterizado (modo serial con --pdf)")
+    parser.add_argument("--text-layer", action="store_true",
+                        help="Con --pdf: usa la capa de texto nativa y solo hace OCR "
+                             "en páginas sin texto utilizable")
+    parser.add_argument("--crop-format", choices=["png", "jpg", "webp", "none"], default="png",
+                        help="Formato de las fotos recortadas (se escriben en segundo plano); "
+                             "none = solo en memoria (los productos quedan sin imagen)")
+    parser.add_argument("--crop-level", type=int, default=1,
+                        help="Compresión PNG 0–9 de los recortes (0 = más rápido)")
+    parser.add_argument("--one-to-one", action="store_true",
+                        help="Cada foto se asigna a un solo producto por página "
+                             "(sin esto, cada producto toma la foto más cercana)")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    run_extractor()
+    args = parse_args()
+    run_extractor(pages_dir=args.pages, workers=args.workers, ocr_mode=args.ocr_mode,
+                  ocr_backend=args.ocr_backend, ocr_workers=args.ocr_workers,
+                  pdf_path=args.pdf, dpi=args.dpi, render_workers=args.render_workers,
+                  text_layer=args.text_layer, crop_format=args.crop_format,
+                  crop_level=args.crop_level, one_to_one=args.one_to_one)
@@ -2,27 +2,58 @@ import os
 import base64
 from openai import OpenAI
 
+from modules.llm_executor import LLMExecutor
+
 
 class LLMClient:
-    def __init__(self):
+    def __init__(self, cache=None, mime="image/png"):
+        """
+        cache: LLMResponseCache opcional (en modo replay no hace falta API key).
+        mime:  tipo de las imágenes enviadas (ver ImagePrep.mime).
+        """
+        self.model = "gpt-4o-mini"
+        self.temperature = 0
+        self.cache = cache
+        self.mime = mime
+
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
+            if cache is not None and cache.replay:
+                self.client = None
+                return
             raise ValueError("ERROR: Falta la variable de entorno OPENAI_API_KEY")
 
         self.client = OpenAI(api_key=api_key)
 
     def ask_vision(self, prompt, image_b64):
+        if self.cache is not None:
+            return self.cache.cached_call(
+                image_b64, prompt, self.model, self.temperature,
+                lambda: self.request_vision(prompt, image_b64)
+            )
+        return self.request_vision(prompt, image_b64)
+
+    def cached_answer(self, prompt, image_b64):
+        """
+        Respuesta de la caché sin llamar al modelo (o None).
+        """
+        if self.cache is None:
+            return None
+        key = self.cache.make_key(image_b64, prompt, self.model, self.temperature)
+        return self.cache.lookup(key)
+
+    def request_vision(self, prompt, image_b64):
 
         # Formato correcto para OpenAI Vision (enero 2025)
         image_payload = {
             "type": "image_url",
             "image_url": {
-                "url": f"data:image/png;base64,{image_b64}"
+                "url": f"data:{self.mime};base64,{image_b64}"
             }
         }
 
         response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=self.model,
             messages=[
                 {
                     "role": "system",
@@ -36,8 +67,20 @@ class LLMClient:
                     ]
                 }
             ],
-            temperature=0
+            temperature=self.temperature
         )
 
         # ESTA ES LA FORMA CORRECTA (2025):
         return response.choices[0].message.content
+
+    def ask_vision_many(self, prompt, images_b64, executor=None):
+        """
+        Misma pregunta sobre varias imágenes, en paralelo con LLMExecutor.
+        Devuelve las respuestas en orden (None si una falla).
+        """
+        executor = executor or LLMExecutor()
+        return executor.map(
+            images_b64,
+            lambda img_b64: self.ask_vision(prompt, img_b64),
+            label=lambda img_b64: f"imagen ({len(img_b64)} b64)"
+        )
@@ -2,6 +2,13 @@ import re
 import json
 import os
 
+import pandas as pd
+
+# Patrones compilados una sola vez
+NO_ALNUM_RE = re.compile(r"[^0-9A-Za-z]")
+ESPACIOS_RE = re.compile(r"\s+")
+PRECIO_SIMBOLOS_RE = re.compile(r"[$.,]")
+
 
 class ADSINormalizer:
     def __init__(self):
@@ -15,19 +22,17 @@ class ADSINormalizer:
     def normalize_price(self, value):
         if not value:
             return ""
-        value = value.replace("$", "").replace(".", "").replace(",", "")
-        return value.strip()
+        return PRECIO_SIMBOLOS_RE.sub("", value).strip()
 
     def normalize_code(self, value):
         if not value:
             return ""
-        return re.sub(r"[^0-9A-Za-z]", "", value).strip()
+        return NO_ALNUM_RE.sub("", value).strip()
 
     def normalize_text(self, text):
         if not text:
             return ""
-        text = re.sub(r"\s+", " ", text)
-        return text.strip()
+        return ESPACIOS_RE.sub(" ", text).strip()
 
     def normalize(self, data):
         if "error" in data:
@@ -44,3 +49,27 @@ class ADSINormalizer:
                 v["color"] = self.normalize_text(v.get("color", ""))
 
         return data
+
+    # --------------------------------------------------------
+    # Columnar: normaliza una tabla completa en una pasada
+    # --------------------------------------------------------
+    def normalize_frame(self, df):
+        """
+        Aplica normalize_code / normalize_text / normalize_price sobre las
+        columnas codigo, descripcion, precio y empaque de un DataFrame
+        (p.ej. una lista de precios de proveedor). Devuelve una copia.
+        """
+        df = df.copy()
+
+        def col(name):
+            return df[name].astype("string").fillna("")
+
+        if "codigo" in df:
+            df["codigo"] = col("codigo").str.replace(NO_ALNUM_RE, "", regex=True).str.strip()
+        for name in ("descripcion", "empaque"):
+            if name in df:
+                df[name] = col(name).str.replace(ESPACIOS_RE, " ", regex=True).str.strip()
+        if "precio" in df:
+            df["precio"] = col("precio").str.replace(PRECIO_SIMBOLOS_RE, "", regex=True).str.strip()
+
+        return df
@@ -0,0 +1,186 @@
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+try:
+    import tesserocr
+    from PIL import Image
+except ImportError:
+    tesserocr = None
+
+import pytesseract
+
+
+class OCRWorkerPool:
+    """
+    Pool de workers OCR de larga vida con cola acotada.
+
+    Cada worker es un hilo que mantiene su propio motor Tesseract
+    cargado (tesserocr.PyTessBaseAPI con el traineddata ya en memoria),
+    así no hay arranque de proceso ni recarga de "spa" por región.
+    tesserocr libera el GIL durante el reconocimiento → los hilos
+    trabajan en paralelo de verdad.
+
+    Si tesserocr no está instalado, o su motor no arranca (traineddata
+    faltante, idioma inválido), se usa pytesseract en los mismos hilos
+    (hay concurrencia, pero sin ahorrar el arranque por llamada).
+    metrics()["engines"] indica qué motor usa realmente cada worker.
+
+    La cola es acotada (max_queue): submit() bloquea cuando está llena,
+    evitando acumular miles de recortes en memoria.
+    """
+
+    def __init__(self, workers=4, lang="spa", psm=6, oem=3, max_queue=256,
+                 latency_window=1000):
+        self.workers = workers
+        self.lang = lang
+        self.psm = psm
+        self.oem = oem
+        self.backend = "tesserocr" if tesserocr is not None else "pytesseract"
+
+        self.tasks = queue.Queue(maxsize=max_queue)
+
+        # Métricas
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._waits = deque(maxlen=latency_window)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.engines = {}   # motor → workers que lo usan
+
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker_loop, name=f"ocr-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    # --------------------------------------------------------
+    # Motor por worker
+    # --------------------------------------------------------
+    def _pytesseract_engine(self):
+        config = f"--psm {self.psm} --oem {self.oem}"
+
+        def recognize(img):
+            return pytesseract.image_to_string(img, lang=self.lang, config=config)
+
+        return recognize, None, "pytesseract"
+
+    def _make_engine(self):
+        if tesserocr is None:
+            return self._pytesseract_engine()
+
+        try:
+            # PSM / OEM de tesserocr son constantes enteras, no clases
+            api = tesserocr.PyTessBaseAPI(lang=self.lang, psm=self.psm, oem=self.oem)
+        except Exception as e:
+            print(f"[ERROR] {threading.current_thread().name}: tesserocr no pudo iniciar "
+                  f"({type(e).__name__}: {e}); este worker usa pytesseract")
+            return self._pytesseract_engine()
+
+        def recognize(img):
+            api.SetImage(Image.fromarray(img))
+            return api.GetUTF8Text()
+
+        return recognize, api, "tesserocr"
+
+    def _worker_loop(self):
+        try:
+            recognize, api, engine = self._make_engine()
+        except Exception as e:
+            # Sin motor el worker igual consume la cola: cada trabajo
+            # falla con el error en lugar de quedar pendiente para siempre
+            print("[ERROR] No se pudo crear el motor OCR:", e)
+            error = e
+
+            def recognize(img):
+                raise error
+
+            api, engine = None, "sin_motor"
+
+        with self._lock:
+            self.engines[engine] = self.engines.get(engine, 0) + 1
+
+        try:
+            while True:
+                item = self.tasks.get()
+                if item is None:
+                    self.tasks.task_done()
+                    break
+
+                img, future, enqueued = item
+                started = time.perf_counter()
+
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(recognize(img))
+                        ok = True
+                    except Exception as e:
+                        future.set_exception(e)
+                        ok = False
+
+                    finished = time.perf_counter()
+                    with self._lock:
+                        self._waits.append(started - enqueued)
+                        self._latencies.append(finished - started)
+                        if ok:
+                            self.completed += 1
+                        else:
+                            self.failed += 1
+
+                self.tasks.task_done()
+        finally:
+            if api is not None:
+                api.End()
+
+    # --------------------------------------------------------
+    # API pública
+    # --------------------------------------------------------
+    def submit(self, img):
+        """
+        Encola una imagen (ya preprocesada) y devuelve un Future con el texto.
+        """
+        future = Future()
+        self.tasks.put((img, future, time.perf_counter()))
+        with self._lock:
+            self.submitted += 1
+        return future
+
+    def recognize(self, img):
+        return self.submit(img).result()
+
+    def map(self, images):
+        futures = [self.submit(img) for img in images]
+        return [f.result() for f in futures]
+
+    def metrics(self):
+        with self._lock:
+            lat = sorted(self._latencies)
+            waits = list(self._waits)
+            completed, failed, submitted = self.completed, self.failed, self.submitted
+            engines = dict(self.engines)
+
+        def ms(v):
+            return round(v * 1000, 1)
+
+        return {
+            "backend": self.backend,
+            "engines": engines,     # p. ej. {"tesserocr": 3, "pytesseract": 1}
+            "workers": self.workers,
+            "queue_depth": self.tasks.qsize(),
+            "in_flight": submitted - completed - failed,
+            "completed": completed,
+            "failed": failed,
+            "latency_avg_ms": ms(sum(lat) / len(lat)) if lat else 0.0,
+            "latency_p95_ms": ms(lat[min(len(lat) - 1, int(len(lat) * 0.95))]) if lat else 0.0,
+            "queue_wait_avg_ms": ms(sum(waits) / len(waits)) if waits else 0.0
+        }
+
+    def close(self):
+        for _ in self._threads:
+            self.tasks.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
@@ -2,16 +2,38 @@ import pytesseract
 import cv2
 import numpy as np
 
+from modules.bbox_utils import GridIndex, area, median_size
+from modules.ocr_pool import OCRWorkerPool
+
+
 class OCRReader:
+    """
+    Lectura OCR con Tesseract.
+
+    Modos:
+        - "region": una llamada a Tesseract por bloque (read_region)
+        - "page":   una sola llamada por página con cajas por palabra
+                    (image_to_data) y asignación de palabras a bloques
+                    por índice espacial (read_page)
 
-    def __init__(self, lang="spa"):
+    Backends para el modo "region":
+        - "pytesseract": un proceso tesseract por llamada
+        - "pool":        OCRWorkerPool con workers persistentes
+    """
+
+    def __init__(self, lang="spa", mode="region", page_psm=3,
+                 backend="pytesseract", workers=4, max_queue=256):
         self.lang = lang
+        self.mode = mode
+        self.page_psm = page_psm
+        self.backend = backend
 
-    def read_region(self, img, bbox):
-        """
-        Extrae texto de una región determinada.
-        bbox = (x, y, w, h)
-        """
+        self.pool = None
+        if backend == "pool":
+            self.pool = OCRWorkerPool(workers=workers, lang=lang, psm=6, oem=3,
+                                      max_queue=max_queue)
+
+    def prepare_region(self, img, bbox):
         x, y, w, h = bbox
         crop = img[y:y+h, x:x+w]
 
@@ -19,6 +41,17 @@ class OCRReader:
         crop = cv2.GaussianBlur(crop, (3, 3), 0)
         crop = cv2.threshold(crop, 0, 255,
                              cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        return crop
+
+    def read_region(self, img, bbox):
+        """
+        Extrae texto de una región determinada.
+        bbox = (x, y, w, h)
+        """
+        crop = self.prepare_region(img, bbox)
+
+        if self.pool is not None:
+            return self.pool.recognize(crop).strip()
 
         text = pytesseract.image_to_string(
             crop,
@@ -28,6 +61,94 @@ class OCRReader:
 
         return text.strip()
 
+    def read_page(self, img, blocks):
+        """
+        OCR de la página completa en una sola llamada y reparto de las
+        palabras entre los bloques del layout.
+
+        blocks = [(x, y, w, h), ...]
+        Devuelve una lista de textos alineada con blocks.
+        """
+        if not blocks:
+            return []
+
+        # Misma limpieza que read_region, aplicada una vez a la página
+        prep = cv2.GaussianBlur(img, (3, 3), 0)
+        prep = cv2.threshold(prep, 0, 255,
+                             cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+        data = pytesseract.image_to_data(
+            prep,
+            lang=self.lang,
+            config=f"--psm {self.page_psm} --oem 3",
+            output_type=pytesseract.Output.DICT
+        )
+
+        # Índice espacial de bloques
+        boxes = [{"x": x, "y": y, "w": w, "h": h} for (x, y, w, h) in blocks]
+        index = GridIndex(cell_size=median_size(boxes))
+        for i, box in enumerate(boxes):
+            index.insert(box, i)
+
+        words = [[] for _ in blocks]
+
+        for i, word in enumerate(data["text"]):
+            word = (word or "").strip()
+            if not word or str(data["conf"][i]) == "-1":
+                continue
+
+            cx = data["left"][i] + data["width"][i] // 2
+            cy = data["top"][i] + data["height"][i] // 2
+            point = {"x": cx, "y": cy, "w": 1, "h": 1}
+
+            # Bloque que contiene el centro de la palabra (el más pequeño
+            # si hay bloques anidados)
+            hits = index.query(point)
+            if not hits:
+                continue
+            target = min(hits, key=lambda idx: area(index.items[idx][0]))
+            block_idx = index.items[target][1]
+
+            order = (data["block_num"][i], data["par_num"][i],
+                     data["line_num"][i], data["word_num"][i])
+            words[block_idx].append((order, word))
+
+        texts = []
+        for block_words in words:
+            block_words.sort(key=lambda t: t[0])
+            texts.append(" ".join(w for _, w in block_words))
+
+        return texts
+
+    def read_blocks(self, img, blocks):
+        """
+        Texto de cada bloque según el modo configurado.
+        Devuelve {bbox: texto}.
+        """
+        if self.mode == "page":
+            try:
+                return dict(zip(blocks, self.read_page(img, blocks)))
+            except pytesseract.TesseractError as e:
+                print("[WARN] OCR por página falló, se usa OCR por región:", e)
+
+        # Pool: todas las regiones se encolan y se reconocen en paralelo
+        if self.pool is not None:
+            futures = {b: self.pool.submit(self.prepare_region(img, b)) for b in blocks}
+            return {b: f.result().strip() for b, f in futures.items()}
+
+        return {b: self.read_region(img, b) for b in blocks}
+
+    def metrics(self):
+        """
+        Profundidad de cola y latencias del pool (None sin pool).
+        """
+        return self.pool.metrics() if self.pool is not None else None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
     def clean_text(self, text):
         """
         Normaliza texto: rompe saltos, remove basura.
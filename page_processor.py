@@ -1,6 +1,8 @@
 import os
 import json
 
+from modules.image_utils import PageImage
+
 
 class PageProcessor:
     """
@@ -21,31 +23,54 @@ class PageProcessor:
     # ---------------------------------------------------------
     # Procesar una sola página
     # ---------------------------------------------------------
-    def process_page(self, image_path, page_index):
-        page_name = os.path.basename(image_path)
+    def process_page(self, image_path, page_index, keep_images=False):
+        """
+        keep_images=True conserva cada recorte en c["image"] (copiado,
+        para VisionExtractor); por defecto se descartan al terminar la
+        página, porque son vistas del buffer de la página y lo
+        mantendrían vivo después de page.release().
+        """
+        # Una sola decodificación para segmentación y recortes
+        page = PageImage.ensure(image_path)
+        page_name = page.name
         json_name = page_name.replace(".png", "").replace(".jpg", "") + ".json"
         json_path = os.path.join(self.output_dir, json_name)
 
         print(f"[PAGE] Segmentando → {page_name}")
 
-        # 1) Segmentación: detectores + selector + grid
-        seg = self.segmenter.process_page(image_path)
+        try:
+            # 1) Segmentación: detectores + selector + grid
+            seg = self.segmenter.process_page(page)
 
-        # 2) Recorte de celdas en output/cells
-        cells_dir = os.path.join(self.output_dir, "..", "cells")
-        extracted_files = self.cell_extractor.extract_cells(
-            image_path,
-            seg["cells"],
-            cells_dir
-        )
+            # 2) Recorte de celdas en output/cells
+            cells_dir = os.path.join(self.output_dir, "..", "cells")
+            extracted_files = self.cell_extractor.extract_cells(
+                page,
+                seg["cells"],
+                cells_dir
+            )
+        finally:
+            page.release()
 
         # 3) Guardar JSON de salida por página
         for i, c in enumerate(seg["cells"]):
             if i < len(extracted_files):
                 c["file"] = extracted_files[i]
 
+        # Los recortes en memoria (c["image"]) no van al JSON ni se
+        # quedan colgados del buffer de la página
+        for c in seg["cells"]:
+            crop = c.pop("image", None)
+            if keep_images and crop is not None:
+                c["image"] = crop.copy()
+
+        serializable = dict(seg)
+        serializable["cells"] = [
+            {k: v for k, v in c.items() if k != "image"} for c in seg["cells"]
+        ]
+
         with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(seg, f, indent=4)
+            json.dump(serializable, f, indent=4)
 
         return seg
 
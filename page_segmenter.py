@@ -2,6 +2,9 @@ import os
 import cv2
 import json
 
+from modules.image_utils import PageImage
+from modules.segment_cache import SegmentCache, component_fingerprint
+
 
 class PageSegmenter:
     """
@@ -9,29 +12,153 @@ class PageSegmenter:
 
     Aporta:
         - Detección híbrida (CV + LP + Fallback)
+        - Modo cascada: LayoutParser solo cuando el selector lo necesita
         - Selección inteligente del modo
         - Reconstrucción de la cuadrícula con GridBuilder
+        - Caché por contenido (SegmentCache): solo re-segmenta páginas
+          cuya imagen o configuración cambió
         - Salida ordenada lista para recortes y LLM
     """
 
     def __init__(self, cv_detector, lp_detector, fallback_detector,
-                 grid_builder, selector):
+                 grid_builder, selector, cascade=False, cache=None):
+        """
+        cascade: ejecuta primero OpenCV + Fallback y llama a LayoutParser
+                 solo si selector.needs_lp() indica que puede cambiar el modo.
+        cache:   SegmentCache opcional (None = sin caché).
+        """
         self.cv_detector = cv_detector
         self.lp_detector = lp_detector
         self.fallback_detector = fallback_detector
         self.grid_builder = grid_builder
         self.selector = selector
+        self.cascade = cascade
+        self.cache = cache
+
+        self._fingerprint = None
+        self.reset_stats()
+
+    # --------------------------------------------------------
+    # Huella de configuración (clave de caché)
+    # --------------------------------------------------------
+    def config_fingerprint(self):
+        if self._fingerprint is None:
+            parts = [
+                component_fingerprint(c) for c in (
+                    self.cv_detector,
+                    self.lp_detector,
+                    self.fallback_detector,
+                    self.selector,
+                    self.grid_builder
+                )
+            ]
+            self._fingerprint = json.dumps(parts, sort_keys=True)
+        return self._fingerprint
+
+    def cache_key(self, page):
+        if self.cache is None:
+            return None
+        return self.cache.make_key(page, self.config_fingerprint())
+
+    def from_cache(self, page, key, output_json=None):
+        """
+        Devuelve el resultado guardado para la página o None.
+        """
+        if key is None:
+            return None
+
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+
+        self.stats["cached"] += 1
+
+        result = {
+            "page": page.name,
+            "mode": entry["mode"],
+            "cells": entry["cells"],
+            "raw_cells": entry["raw_cells"],
+            "detectors": [],
+            "cached": True
+        }
+
+        if output_json:
+            with open(output_json, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=4)
+
+        return result
+
+    # --------------------------------------------------------
+    # Contadores de detectores ejecutados
+    # --------------------------------------------------------
+    def reset_stats(self):
+        self.stats = {
+            "pages": 0,
+            "cv": 0,
+            "lp": 0,
+            "fallback": 0,
+            "lp_skipped": 0,
+            "cached": 0
+        }
+
+    def _count(self, detectors_run):
+        self.stats["pages"] += 1
+        for name in detectors_run:
+            self.stats[name] += 1
+        if "lp" not in detectors_run:
+            self.stats["lp_skipped"] += 1
 
     # --------------------------------------------------------
     # Procesar una sola página
     # --------------------------------------------------------
     def process_page(self, image_path, output_json=None):
-        page_name = os.path.basename(image_path)
+        """
+        image_path: ruta de la página o PageImage ya decodificada.
+        La página se decodifica una sola vez y se comparte entre detectores.
+        """
+        page = PageImage.ensure(image_path)
+
+        # 0 — Caché por contenido
+        key = self.cache_key(page)
+        cached = self.from_cache(page, key, output_json)
+        if cached is not None:
+            return cached
 
-        # 1 — Ejecutar detectores
-        cv_res = self.cv_detector.detect_tables(image_path)
-        lp_res = self.lp_detector.detect_tables(image_path)
-        fb_res = self.fallback_detector.detect(image_path)
+        # 1 — Ejecutar detectores (misma decodificación para los tres)
+        cv_res, fb_res, need_lp = self.run_cheap_detectors(page)
+
+        lp_res = self.lp_detector.detect_tables(page) if need_lp else None
+
+        return self.finish_page(page, cv_res, lp_res, fb_res, output_json, key)
+
+    # --------------------------------------------------------
+    # Detectores baratos + decisión de LayoutParser
+    # --------------------------------------------------------
+    def run_cheap_detectors(self, page):
+        cv_res = self.cv_detector.detect_tables(page)
+        fb_res = self.fallback_detector.detect(page)
+
+        need_lp = not self.cascade or self.selector.needs_lp(cv_res, fb_res)
+
+        return cv_res, fb_res, need_lp
+
+    # --------------------------------------------------------
+    # Selección + cuadrícula + JSON
+    # --------------------------------------------------------
+    def finish_page(self, page, cv_res, lp_res, fb_res, output_json=None, cache_key=None):
+        """
+        lp_res = None indica que LayoutParser no se ejecutó (cascada).
+        cache_key: si se indica, el resultado se guarda en la caché.
+        """
+        page_name = page.name
+        detectors_run = ["cv", "fallback"]
+
+        if lp_res is None:
+            lp_res = {"tables": [], "cells": []}
+        else:
+            detectors_run.append("lp")
+
+        self._count(detectors_run)
 
         # 2 — Seleccionar modo
         selection = self.selector.select(cv_res, lp_res, fb_res)
@@ -45,7 +172,8 @@ class PageSegmenter:
             "page": page_name,
             "mode": mode,
             "cells": grid,
-            "raw_cells": raw_cells
+            "raw_cells": raw_cells,
+            "detectors": detectors_run
         }
 
         # 4 — Guardar resultado JSON
@@ -53,27 +181,160 @@ class PageSegmenter:
             with open(output_json, "w", encoding="utf-8") as f:
                 json.dump(result, f, indent=4)
 
+        if cache_key is not None:
+            self.cache.put(cache_key, result)
+
         return result
 
+    # --------------------------------------------------------
+    # Procesar un PDF en streaming (sin PNG intermedios)
+    # --------------------------------------------------------
+    def process_pdf(self, pdf_path, rasterizer, output_dir="output/segments"):
+        """
+        rasterizer: PDFRasterizer; cada página llega como PageImage
+        y se libera en cuanto termina su segmentación.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        results = []
+
+        for page in rasterizer.iter_pages(pdf_path):
+            json_path = os.path.join(output_dir, f"{page.stem}.json")
+            print(f"[PAGE] Segmentando {page.name} ...")
+            results.append(self.process_page(page, json_path))
+            page.release()
+
+        print(f"[PAGE] Detectores ejecutados: {self.stats}")
+
+        if self.cache is not None:
+            self.cache.evict()
+            print(f"[PAGE] Caché: {self.cache.stats}")
+
+        return results
+
     # --------------------------------------------------------
     # Procesar todas las páginas de un directorio
     # --------------------------------------------------------
-    def process_all(self, pages_dir, output_dir="output/segments"):
+    def process_all(self, pages_dir, output_dir="output/segments", lp_batch_size=1):
+        """
+        lp_batch_size > 1: LayoutParser procesa las páginas por lotes
+        (una invocación del modelo por lote) vía detect_tables_batch().
+        """
         os.makedirs(output_dir, exist_ok=True)
 
-        pages = sorted(os.listdir(pages_dir))
+        pages = [
+            p for p in sorted(os.listdir(pages_dir))
+            if p.lower().endswith((".png", ".jpg", ".jpeg"))
+        ]
+
+        if lp_batch_size <= 1 or not hasattr(self.lp_detector, "detect_tables_batch"):
+            lp_batch_size = 1
+
         results = []
 
-        for p in pages:
-            if not p.lower().endswith((".png", ".jpg", ".jpeg")):
-                continue
+        for start in range(0, len(pages), lp_batch_size):
+            chunk = pages[start:start + lp_batch_size]
+            staged = []
+
+            # 1 — Caché + detectores baratos por página
+            for p in chunk:
+                page = PageImage(os.path.join(pages_dir, p))
+                json_path = os.path.join(output_dir, f"{os.path.splitext(p)[0]}.json")
+
+                key = self.cache_key(page)
+                cached = self.from_cache(page, key, json_path)
+                if cached is not None:
+                    print(f"[PAGE] {p} sin cambios (caché)")
+                    results.append(cached)
+                    continue
+
+                print(f"[PAGE] Segmentando {p} ...")
+                cv_res, fb_res, need_lp = self.run_cheap_detectors(page)
+                staged.append([p, page, cv_res, None, fb_res, need_lp, key])
 
-            image_path = os.path.join(pages_dir, p)
-            json_path = os.path.join(output_dir, f"{os.path.splitext(p)[0]}.json")
+            # 2 — LayoutParser: por lote o página a página
+            pending = [s for s in staged if s[5]]
+            if lp_batch_size > 1 and pending:
+                lp_results = self.lp_detector.detect_tables_batch([s[1] for s in pending])
+                for s, lp_res in zip(pending, lp_results):
+                    s[3] = lp_res
+            else:
+                for s in pending:
+                    s[3] = self.lp_detector.detect_tables(s[1])
 
-            print(f"[PAGE] Segmentando {p} ...")
+            # 3 — Selección + cuadrícula
+            for p, page, cv_res, lp_res, fb_res, _, key in staged:
+                json_path = os.path.join(output_dir, f"{os.path.splitext(p)[0]}.json")
+                res = self.finish_page(page, cv_res, lp_res, fb_res, json_path, key)
+                results.append(res)
+                page.release()
 
-            res = self.process_page(image_path, json_path)
-            results.append(res)
+        # Los resultados de caché se mezclan con los nuevos: orden de página
+        order = {p: i for i, p in enumerate(pages)}
+        results.sort(key=lambda r: order[r["page"]])
+
+        print(f"[PAGE] Detectores ejecutados: {self.stats}")
+
+        if self.cache is not None:
+            self.cache.evict()
+            print(f"[PAGE] Caché: {self.cache.stats}")
 
         return results
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def main():
+    import argparse
+
+    from modules.table_detector_cv import OpenCVTableDetector
+    from modules.table_detector_lp import LayoutParserTableDetector
+    from modules.fallback_detector import FallbackDetector
+    from modules.grid_builder import GridBuilder
+    from modules.selector import TableOrBlockSelector
+
+    parser = argparse.ArgumentParser(description="Segmentación de páginas de catálogo")
+    parser.add_argument("pages_dir", help="Carpeta con las páginas (PNG/JPG) o archivo PDF")
+    parser.add_argument("--dpi", type=int, default=300, help="Resolución de rasterizado (PDF)")
+    parser.add_argument("--render-workers", type=int, default=1,
+                        help="Procesos de rasterizado (PDF)")
+    parser.add_argument("--out", default="output/segments", help="Carpeta de JSON por página")
+    parser.add_argument("--cascade", action="store_true",
+                        help="LayoutParser solo cuando el selector lo necesita")
+    parser.add_argument("--lp-batch", type=int, default=1,
+                        help="Tamaño de lote para LayoutParser")
+    parser.add_argument("--cache-dir", default="output/cache/segments")
+    parser.add_argument("--cache-max-mb", type=int, default=512)
+    parser.add_argument("--no-cache", action="store_true", help="Desactiva la caché")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Re-segmenta todo y reescribe la caché")
+    args = parser.parse_args()
+
+    cache = None
+    if not args.no_cache:
+        cache = SegmentCache(
+            cache_dir=args.cache_dir,
+            max_bytes=args.cache_max_mb * 1024 * 1024,
+            rebuild=args.rebuild
+        )
+
+    segmenter = PageSegmenter(
+        OpenCVTableDetector(),
+        LayoutParserTableDetector(batch_size=max(1, args.lp_batch)),
+        FallbackDetector(),
+        GridBuilder(),
+        TableOrBlockSelector(),
+        cascade=args.cascade,
+        cache=cache
+    )
+
+    if args.pages_dir.lower().endswith(".pdf"):
+        from modules.pdf_rasterizer import PDFRasterizer
+        rasterizer = PDFRasterizer(dpi=args.dpi, workers=args.render_workers)
+        segmenter.process_pdf(args.pages_dir, rasterizer, args.out)
+    else:
+        segmenter.process_all(args.pages_dir, args.out, lp_batch_size=args.lp_batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,10 @@
-import base64
 import json
 from modules.modelo_llm import LLMClient
+from modules.image_prep import ImagePrep
 from modules.normalizer import ADSINormalizer
 
 
-class LLMParser:
-    def __init__(self):
-        self.llm = LLMClient()
-        self.norm = ADSINormalizer()
-
-    def _encode_image(self, img_path):
-        with open(img_path, "rb") as f:
-            return base64.b64encode(f.read()).decode()
-
-    def parse_row(self, img_path):
-        """
-        Envía una fila recortada a OpenAI Vision y obtiene JSON estructurado.
-        """
-        img_b64 = self._encode_image(img_path)
-
-        prompt = """
+PROMPT = """
 Extrae de esta imagen un JSON limpio con la siguiente estructura:
 
 {
@@ -41,8 +26,42 @@ Reglas:
 - "fotos": lista que incluya SOLO el nombre de la imagen recortada.
 """
 
-        raw = self.llm.ask_vision(prompt, img_b64)
 
+class LLMParser:
+    def __init__(self, cache=None, prep=None):
+        """
+        cache: LLMResponseCache opcional, compartido con LLMClient.
+        prep:  ImagePrep (reducción + JPEG antes de enviar).
+        """
+        self.prep = prep or ImagePrep()
+        self.llm = LLMClient(cache=cache, mime=self.prep.mime)
+        self.norm = ADSINormalizer()
+
+    def _encode_image(self, img_path):
+        return self.prep.encode(img_path)
+
+    def parse_row(self, img_path):
+        """
+        Envía una fila recortada a OpenAI Vision y obtiene JSON estructurado.
+        """
+        img_b64 = self._encode_image(img_path)
+        raw = self.llm.ask_vision(PROMPT, img_b64)
+        return self.parse_response(raw)
+
+    def cached_row(self, img_path):
+        """
+        Fila ya respondida en la caché (sin llamar al modelo), o None.
+        """
+        if self.llm.cache is None:
+            return None
+
+        raw = self.llm.cached_answer(PROMPT, self._encode_image(img_path))
+        if raw is None:
+            return None
+
+        return self.parse_response(raw)
+
+    def parse_response(self, raw):
         # Validar JSON
         try:
             data = json.loads(raw)
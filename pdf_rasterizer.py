@@ -0,0 +1,103 @@
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from modules.image_utils import PageImage
+
+
+# ------------------------------------------------------------
+# Render de un rango de páginas (función de módulo → picklable)
+# ------------------------------------------------------------
+def render_range(pdf_path, first, last, dpi=300):
+    """
+    Renderiza las páginas [first, last] (base 1) y devuelve
+    [(page_no, bgr), ...]. Solo ese rango queda en memoria.
+    """
+    pil_pages = convert_from_path(pdf_path, dpi=dpi, first_page=first,
+                                  last_page=last, thread_count=1)
+
+    rendered = []
+    for offset, pil in enumerate(pil_pages):
+        rgb = np.asarray(pil.convert("RGB"))
+        rendered.append((first + offset, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)))
+        pil.close()
+
+    return rendered
+
+
+class PDFRasterizer:
+    """
+    Etapa de rasterizado en streaming: PDF → PageImage, página a página.
+
+    En lugar de convertir todo el PDF a una lista de imágenes en memoria
+    y volcar PNGs a input/pages/, entrega las páginas ya decodificadas
+    directamente a Preprocessor.process / PageSegmenter.process_page.
+
+    Memoria acotada: como máximo (max_in_flight × chunk_size) páginas
+    renderizadas a la vez. Con workers > 1 los rangos de páginas se
+    renderizan en paralelo en un pool de procesos, y se entregan en orden.
+    """
+
+    def __init__(self, dpi=300, workers=1, chunk_size=4, max_in_flight=None):
+        self.dpi = dpi
+        self.workers = workers
+        self.chunk_size = max(1, chunk_size)
+        self.max_in_flight = max_in_flight or max(1, workers) * 2
+
+    def page_count(self, pdf_path):
+        return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+    def page_name(self, page_no):
+        return f"page_{page_no:04d}.png"
+
+    def to_page_image(self, page_no, bgr):
+        return PageImage(bgr=bgr, name=self.page_name(page_no))
+
+    # --------------------------------------------------------
+    # Una página suelta (útil dentro de un worker)
+    # --------------------------------------------------------
+    def render_page(self, pdf_path, page_no):
+        (_, bgr), = render_range(pdf_path, page_no, page_no, self.dpi)
+        return self.to_page_image(page_no, bgr)
+
+    # --------------------------------------------------------
+    # Streaming de páginas
+    # --------------------------------------------------------
+    def _ranges(self, first, last):
+        for start in range(first, last + 1, self.chunk_size):
+            yield start, min(start + self.chunk_size - 1, last)
+
+    def iter_pages(self, pdf_path, first=1, last=None):
+        """
+        Genera PageImage en orden de página.
+        """
+        if last is None:
+            last = self.page_count(pdf_path)
+
+        if self.workers <= 1:
+            for a, b in self._ranges(first, last):
+                for page_no, bgr in render_range(pdf_path, a, b, self.dpi):
+                    yield self.to_page_image(page_no, bgr)
+            return
+
+        ranges = self._ranges(first, last)
+        pending = deque()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+
+            def fill():
+                while len(pending) < self.max_in_flight:
+                    rng = next(ranges, None)
+                    if rng is None:
+                        return
+                    pending.append(pool.submit(render_range, pdf_path, rng[0], rng[1], self.dpi))
+
+            fill()
+            while pending:
+                chunk = pending.popleft().result()
+                fill()
+                for page_no, bgr in chunk:
+                    yield self.to_page_image(page_no, bgr)
@@ -0,0 +1,140 @@
+import re
+
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LAParams, LTTextContainer
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+
+
+class PDFTextLayer:
+    """
+    Lector de la capa de texto nativa de un PDF digital.
+
+    Devuelve bloques posicionados con la MISMA estructura que produce
+    el camino OCR:
+
+        blocks = [(x, y, w, h), ...]      → ProductSegmenter
+        texts  = {(x, y, w, h): texto}    → PostProcessor
+
+    Las coordenadas se pasan de puntos PDF (origen abajo-izquierda) a
+    píxeles de la página rasterizada al mismo dpi, así las imágenes
+    detectadas en el render y los bloques de texto comparten sistema.
+    El intérprete aplica /Rotate y el origen del MediaBox (misma caja
+    que usa pdftoppm al rasterizar); aquí se mide desde la esquina
+    superior izquierda de esa página ya girada.
+
+    El PDF se abre y se parsea UNA vez por documento: las páginas se
+    van tomando del mismo árbol de páginas y las fuentes quedan en la
+    caché del PDFResourceManager, en lugar de reabrir el archivo en
+    cada llamada (O(N²) en catálogos grandes).
+
+    Si la página no tiene texto utilizable (PDF escaneado) extract_page()
+    devuelve None y el pipeline cae a rasterizado + OCR.
+    """
+
+    def __init__(self, dpi=300, min_chars=20, min_block_chars=2):
+        self.dpi = dpi
+        self.scale = dpi / 72.0
+        self.min_chars = min_chars
+        self.min_block_chars = min_block_chars
+        self.laparams = LAParams()
+
+        self._path = None
+        self._file = None
+        self._page_iter = None
+        self._pages = []
+        self._device = None
+        self._interpreter = None
+
+    # --------------------------------------------------------
+    # Documento abierto (uno a la vez)
+    # --------------------------------------------------------
+    def open(self, pdf_path):
+        if self._path == pdf_path:
+            return
+
+        self.close()
+        self._file = open(pdf_path, "rb")
+        document = PDFDocument(PDFParser(self._file))
+        self._page_iter = PDFPage.create_pages(document)
+        self._pages = []
+
+        rsrcmgr = PDFResourceManager(caching=True)
+        self._device = PDFPageAggregator(rsrcmgr, laparams=self.laparams)
+        self._interpreter = PDFPageInterpreter(rsrcmgr, self._device)
+        self._path = pdf_path
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self._path = None
+        self._file = None
+        self._page_iter = None
+        self._pages = []
+        self._device = None
+        self._interpreter = None
+
+    def get_page(self, page_no):
+        """
+        PDFPage en base 1; el árbol se recorre solo hasta esa página.
+        """
+        while len(self._pages) < page_no:
+            page = next(self._page_iter, None)
+            if page is None:
+                return None
+            self._pages.append(page)
+        return self._pages[page_no - 1]
+
+    # --------------------------------------------------------
+    # Una página (page_no en base 1)
+    # --------------------------------------------------------
+    def extract_page(self, pdf_path, page_no):
+        self.open(pdf_path)
+        page = self.get_page(page_no)
+        if page is None:
+            return None
+
+        self._interpreter.process_page(page)
+        return self.layout_to_blocks(self._device.get_result())
+
+    def layout_to_blocks(self, page_layout):
+        left, top = page_layout.x0, page_layout.y1
+        blocks = []
+        texts = {}
+
+        for element in page_layout:
+            if not isinstance(element, LTTextContainer):
+                continue
+
+            text = " ".join(element.get_text().split())
+            if len(text) < self.min_block_chars:
+                continue
+
+            x0, y0, x1, y1 = element.bbox
+            bbox = (
+                int((x0 - left) * self.scale),
+                int((top - y1) * self.scale),
+                max(1, int((x1 - x0) * self.scale)),
+                max(1, int((y1 - y0) * self.scale))
+            )
+
+            if bbox in texts:
+                texts[bbox] += " " + text
+                continue
+
+            blocks.append(bbox)
+            texts[bbox] = text
+
+        if not self.is_usable(texts):
+            return None
+
+        return blocks, texts
+
+    # --------------------------------------------------------
+    # ¿La capa de texto sirve o es un escaneo?
+    # --------------------------------------------------------
+    def is_usable(self, texts):
+        chars = sum(len(re.sub(r"\W", "", t)) for t in texts.values())
+        return chars >= self.min_chars
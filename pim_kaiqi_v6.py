@@ -7,6 +7,13 @@ import os, json, csv, hashlib, time, base64
 import pandas as pd
 from openai import OpenAI
 
+# Reducción + JPEG antes de enviar (opcional: sin image_prep/cv2 se manda el archivo tal cual)
+try:
+    from image_prep import ImagePrep
+    PREP=ImagePrep()
+except ImportError:
+    PREP=None
+
 # ------------------------------------------------------------
 CONFIG_PATH="config_pim_kaiqi_v6.json"
 with open(CONFIG_PATH,"r",encoding="utf-8") as f:
@@ -59,6 +66,8 @@ CACHE=load_cache()
 # ------------------------------------------------------------
 def read_img_base64(path):
     try:
+        if PREP is not None:
+            return PREP.encode(path)
         with open(path,"rb") as f:
             return base64.b64encode(f.read()).decode()
     except:
@@ -167,6 +176,8 @@ def main():
         json.dump(pim_json,f,ensure_ascii=False,indent=2)
 
     print("OK PIM v6 ENTERPRISE")
+    if PREP is not None:
+        print("Imagenes:", PREP.report())
 
 if __name__=="__main__":
     main()
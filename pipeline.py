@@ -1,45 +1,50 @@
 import os
 import json
-import time
 from modules.parser_llm import LLMParser
-from openai import RateLimitError
+from modules.llm_executor import LLMExecutor
 
 
 class ExtractionPipeline:
-    def __init__(self):
-        self.parser = LLMParser()
-
-    def process_folder(self, folder_path):
-        productos = []
-        files = sorted(os.listdir(folder_path))
-
-        for fname in files:
-            if not fname.lower().endswith((".png", ".jpg", ".jpeg")):
-                continue
-
-            img_path = os.path.join(folder_path, fname)
-            print(f"[LLM] Procesando {fname}...")
-
-            intentos = 0
-
-            while intentos < 4:
-                try:
-                    result = self.parser.parse_row(img_path)
-                    productos.append(result)
-                    time.sleep(0.35)  # throttle preventivo
-                    break
-
-                except RateLimitError:
-                    intentos += 1
-                    wait = 0.7 * intentos
-                    print(f"[WAIT] Rate limit alcanzado. Reintentando en {wait} segundos...")
-                    time.sleep(wait)
-
-                except Exception as e:
-                    print(f"[ERROR] Falló {fname}: {e}")
-                    break
-
-        return productos
+    """
+    Envía los recortes de una carpeta a LLMParser.parse_row.
+
+    Las llamadas pasan por LLMExecutor: concurrencia acotada,
+    presupuesto RPM/TPM y backoff exponencial con jitter.
+    Con concurrency=1 el comportamiento es el del bucle serial.
+
+    Con cache (LLMResponseCache) los recortes ya respondidos se
+    resuelven sin llamar al modelo ni consumir presupuesto RPM/TPM.
+    """
+
+    def __init__(self, concurrency=8, rpm=500, tpm=200000, cache=None):
+        self.parser = LLMParser(cache=cache)
+        self.executor = LLMExecutor(concurrency=concurrency, rpm=rpm, tpm=tpm)
+
+    def process_folder(self, folder_path, out_json=None):
+        """
+        out_json: si se indica, los productos se escriben en orden
+        a medida que se completan (no hace falta save_as_json).
+        """
+        files = sorted(
+            f for f in os.listdir(folder_path)
+            if f.lower().endswith((".png", ".jpg", ".jpeg"))
+        )
+        paths = [os.path.join(folder_path, f) for f in files]
+
+        print(f"[LLM] {len(paths)} recortes — concurrencia {self.executor.concurrency}")
+
+        productos = self.executor.map(
+            paths,
+            self.parser.parse_row,
+            out_json=out_json,
+            label=os.path.basename,
+            precheck=self.parser.cached_row
+        )
+
+        print(f"[LLM] Resultado: {self.executor.stats}")
+        print(f"[LLM] Imágenes: {self.parser.prep.report()}")
+
+        return [p for p in productos if p is not None]
 
     def save_as_json(self, productos, outfile):
         with open(outfile, "w", encoding="utf-8") as f:
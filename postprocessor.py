@@ -1,22 +1,67 @@
 import re
 
+import pandas as pd
+
+# Texto en columnas Arrow si pyarrow está instalado (sin él, pandas
+# usa su almacenamiento por defecto: Arrow solo desde pandas 3)
+try:
+    import pyarrow
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    STRING_DTYPE = "string"
+
+# Patrones compilados una sola vez (antes: re.findall por fila)
+CODIGO_RE = re.compile(r"\b\d{3,6}\b")
+PRECIO_RE = re.compile(r"\$?\s?(\d{3,7})")
+EMPAQUE_RE = re.compile(r"(X\s?\d+)")
+SEPARADORES_RE = re.compile(r"[.,]")
+
+
 class PostProcessor:
+    """
+    Extrae código, precio y empaque del texto de cada fila.
+
+    Los métodos extract_* trabajan con un texto; extract_fields aplica
+    los mismos patrones sobre la columna completa de una página (o de
+    una lista de precios) en una sola pasada con pandas.
+    """
 
     def __init__(self):
         pass
 
     def extract_codigos(self, text):
-        codes = re.findall(r"\b\d{3,6}\b", text)
-        return list(set(codes))
+        codes = CODIGO_RE.findall(text)
+        return list(dict.fromkeys(codes))
 
     def extract_precio(self, text):
-        text = text.replace(".", "").replace(",", "")
-        matches = re.findall(r"\$?\s?(\d{3,7})", text)
-        return matches[0] if matches else None
+        text = SEPARADORES_RE.sub("", text)
+        match = PRECIO_RE.search(text)
+        return match.group(1) if match else None
 
     def extract_empaque(self, text):
-        match = re.search(r"(X\s?\d+)", text.upper())
+        match = EMPAQUE_RE.search(text.upper())
         return match.group(1) if match else None
 
     def clean_description(self, text):
         return text.strip().title()
+
+    # --------------------------------------------------------
+    # Columnar: todas las filas de una vez
+    # --------------------------------------------------------
+    def extract_fields(self, texts):
+        """
+        texts: lista o Series de textos de fila.
+        Devuelve un DataFrame con columnas codigos, precio, empaque
+        (mismos valores que extract_codigos / extract_precio / extract_empaque).
+        """
+        s = pd.Series(texts, dtype=STRING_DTYPE).fillna("")
+
+        codigos = s.str.findall(CODIGO_RE).map(lambda codes: list(dict.fromkeys(codes)))
+        precio = s.str.replace(SEPARADORES_RE, "", regex=True).str.extract(PRECIO_RE)[0]
+        empaque = s.str.upper().str.extract(EMPAQUE_RE)[0]
+
+        return pd.DataFrame({
+            "codigos": codigos,
+            "precio": precio.astype(object).where(precio.notna(), None),
+            "empaque": empaque.astype(object).where(empaque.notna(), None),
+        })
@@ -1,11 +1,19 @@
 import cv2
 import numpy as np
 
+from modules.image_utils import PageImage
+
+
 class Preprocessor:
 
-    def process(self, img_path):
-        img = cv2.imread(img_path)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    def process(self, source):
+        """
+        source: ruta, arreglo BGR o PageImage (p.ej. del PDFRasterizer,
+        sin PNG intermedio).
+        """
+        page = PageImage.ensure(source)
+        img = page.bgr
+        gray = page.gray
         norm = cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX)
 
         return img, gray, norm
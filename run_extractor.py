@@ -1,11 +1,13 @@
 import os
 from modules.pipeline import ExtractionPipeline
+from modules.llm_cache import LLMResponseCache
 
 
 def main():
     BASE = os.path.dirname(os.path.abspath(__file__))
     CROP_DIR = os.path.join(BASE, "output", "images", "crops")
     OUT_JSON = os.path.join(BASE, "output", "productos_llm.json")
+    CACHE_DB = os.path.join(BASE, "output", "cache", "llm_responses.sqlite")
 
     print("=== EXTRACTOR ADSI V5 – FASE 8 ===")
     print(f"Usando carpeta: {CROP_DIR}")
@@ -14,15 +16,20 @@ def main():
         print("[ERROR] No existe la carpeta de recortes.")
         return
 
-    pipeline = ExtractionPipeline()
+    # readwrite (por defecto) | replay (sin API, solo caché) | off
+    cache_mode = os.getenv("LLM_CACHE_MODE", "readwrite")
+    cache = LLMResponseCache(CACHE_DB, mode=cache_mode)
+    print(f"Caché LLM: {cache_mode} ({CACHE_DB})")
+
+    pipeline = ExtractionPipeline(cache=cache)
 
     print("[1] Procesando imágenes...")
-    productos = pipeline.process_folder(CROP_DIR)
+    print(f"    JSON en streaming: {OUT_JSON}")
+    productos = pipeline.process_folder(CROP_DIR, out_json=OUT_JSON)
 
     print(f"[2] Total procesados: {len(productos)}")
-
-    print(f"[3] Guardando JSON en: {OUT_JSON}")
-    pipeline.save_as_json(productos, OUT_JSON)
+    print(f"    Caché: {cache.stats}")
+    cache.close()
 
     print("=== FASE 8 COMPLETADA ===")
 
@@ -0,0 +1,158 @@
+import os
+import json
+import hashlib
+
+
+class SegmentCache:
+    """
+    Caché persistente de segmentación por contenido.
+
+    Clave = sha256( hash de la imagen + huella de configuración )
+
+    La huella de configuración incluye versión y umbrales de cada
+    detector, del selector y del GridBuilder: si cambia cualquiera
+    de ellos la página se vuelve a segmentar.
+
+    Cada entrada es un JSON con {mode, cells, raw_cells}.
+    El almacén está limitado por tamaño (max_bytes); al superarlo
+    se eliminan las entradas usadas hace más tiempo (mtime).
+    """
+
+    def __init__(self, cache_dir="output/cache/segments",
+                 max_bytes=512 * 1024 * 1024, rebuild=False):
+        """
+        rebuild: ignora las entradas existentes y las reescribe.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.rebuild = rebuild
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+
+    # --------------------------------------------------------
+    # Hash de la página (bytes del archivo o del buffer)
+    # --------------------------------------------------------
+    def page_hash(self, page):
+        h = hashlib.sha256()
+
+        if page.path and os.path.exists(page.path):
+            with open(page.path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(chunk)
+        elif page.bgr is not None:
+            h.update(str(page.bgr.shape).encode("utf-8"))
+            h.update(page.bgr.tobytes())
+        else:
+            return None
+
+        return h.hexdigest()
+
+    def make_key(self, page, fingerprint):
+        img_hash = self.page_hash(page)
+        if img_hash is None:
+            return None
+        return hashlib.sha256((img_hash + fingerprint).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    # --------------------------------------------------------
+    # Lectura / escritura
+    # --------------------------------------------------------
+    def get(self, key):
+        if key is None or self.rebuild:
+            self.stats["misses"] += 1
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+
+        # Marcar como usada recientemente (para el desalojo LRU)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        self.stats["hits"] += 1
+        return data
+
+    def put(self, key, result):
+        if key is None:
+            return
+
+        entry = {
+            "mode": result["mode"],
+            "cells": result["cells"],
+            "raw_cells": result["raw_cells"]
+        }
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+        self.stats["writes"] += 1
+
+    # --------------------------------------------------------
+    # Desalojo por tamaño (las menos usadas primero)
+    # --------------------------------------------------------
+    def evict(self):
+        files = []
+        total = 0
+
+        for root, _, names in os.walk(self.cache_dir):
+            for n in names:
+                if not n.endswith(".json"):
+                    continue
+                p = os.path.join(root, n)
+                st = os.stat(p)
+                files.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        files.sort()
+        for _, size, p in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+                total -= size
+                self.stats["evicted"] += 1
+            except OSError:
+                pass
+
+
+# ------------------------------------------------------------
+# Huella de configuración de un componente
+# ------------------------------------------------------------
+def component_fingerprint(obj):
+    """
+    Nombre de clase + VERSION + atributos públicos escalares
+    (umbrales, nombre de modelo, etc.).
+
+    Los atributos listados en CACHE_IGNORE de la clase son solo de
+    ejecución (tamaño de lote, calentamiento...) y no cambian el
+    resultado: no forman parte de la huella.
+    """
+    ignore = set(getattr(obj, "CACHE_IGNORE", ()))
+    params = {
+        k: v for k, v in sorted(vars(obj).items())
+        if not k.startswith("_") and k not in ignore
+        and isinstance(v, (int, float, str, bool))
+    }
+    return {
+        "class": type(obj).__name__,
+        "version": getattr(obj, "VERSION", "0"),
+        "params": params
+    }
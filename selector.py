@@ -1,3 +1,6 @@
+from modules.bbox_utils import GridIndex, iou, weighted_merge, median_size
+
+
 class TableOrBlockSelector:
     """
     Selector inteligente que decide cuál detector usar:
@@ -10,13 +13,25 @@ class TableOrBlockSelector:
     También armoniza y fusiona resultados.
     """
 
+    # Subir al cambiar la lógica (invalida la caché de segmentación)
+    VERSION = "2"
+
     def __init__(self,
                  min_cells_table=4,
                  lp_confidence_threshold=3,
-                 fallback_threshold=5):
+                 fallback_threshold=5,
+                 fusion_iou=0.5,
+                 weighted_fusion=False):
+        """
+        fusion_iou:      IoU mínimo para considerar duplicadas dos celdas
+        weighted_fusion: promedia las celdas duplicadas en lugar de
+                         quedarse con la primera (OpenCV)
+        """
         self.min_cells_table = min_cells_table
         self.lp_confidence_threshold = lp_confidence_threshold
         self.fallback_threshold = fallback_threshold
+        self.fusion_iou = fusion_iou
+        self.weighted_fusion = weighted_fusion
 
     # --------------------------------------------------------
     # Decide si usar OpenCV
@@ -49,6 +64,23 @@ class TableOrBlockSelector:
 
         return False
 
+    # --------------------------------------------------------
+    # ¿Hace falta LayoutParser para decidir? (modo cascada)
+    # --------------------------------------------------------
+    def needs_lp(self, cv_result, fb_result):
+        """
+        Con solo OpenCV + Fallback ya se sabe si LayoutParser cambia
+        la decisión de select_mode:
+
+            - tabla CV clara sin mosaico → "cv_table"
+            - mosaico                    → "blocks"
+
+        En ambos casos el resultado de LayoutParser se ignora.
+        """
+        cv_table = self.is_probably_table_cv(cv_result.get("cells", []))
+        mosaic = self.is_mosaic(fb_result.get("blocks", []))
+        return not cv_table and not mosaic
+
     # --------------------------------------------------------
     # Selección del modo
     # --------------------------------------------------------
@@ -89,21 +121,35 @@ class TableOrBlockSelector:
     def fuse_results(self, cv_cells, lp_cells):
         """
         Combina celdas detectadas por OpenCV y LayoutParser.
-        Las fusiona eliminando duplicados por superposición.
+        Las fusiona eliminando duplicados por superposición (IoU).
+
+        Las celdas ya aceptadas se registran en un GridIndex, así cada
+        celda nueva solo se compara con sus vecinas → fusión casi lineal.
         """
         all_cells = cv_cells + lp_cells
-        unique = []
+        index = GridIndex(cell_size=median_size(all_cells))
+        groups = []
 
         for c in all_cells:
-            duplicate = False
-            for u in unique:
-                if abs(c["x"] - u["x"]) < 15 and abs(c["y"] - u["y"]) < 15:
-                    duplicate = True
-                    break
-            if not duplicate:
-                unique.append(c)
-
-        return unique
+            best, best_iou = None, self.fusion_iou
+
+            for idx in index.query(c):
+                score = iou(c, index.items[idx][0])
+                if score >= best_iou:
+                    best, best_iou = idx, score
+
+            if best is None:
+                index.insert(c)
+                groups.append([c])
+                continue
+
+            groups[best].append(c)
+
+            # Fusión ponderada: la celda representativa se recalcula
+            if self.weighted_fusion:
+                index.update(best, weighted_merge(groups[best]))
+
+        return [box for box, _ in index.items]
 
     # --------------------------------------------------------
     # Método principal
@@ -37,11 +37,27 @@ def norm(text):
     return t
 
 
+def norm_series(s):
+    """
+    norm() sobre una columna completa (operaciones vectorizadas de pandas).
+    """
+    return (
+        s.fillna("").astype(str).str.upper()
+        .str.replace(r"[^A-Z0-9 ]", " ", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+
 # ==========================================================
 # Carga de catálogos
 # ==========================================================
 def load_all_sources():
-    registros = []
+    """
+    Un solo DataFrame (fuente, descripcion) con todas las fuentes,
+    armado por columnas (sin iterrows).
+    """
+    frames = []
     for file in os.listdir(SOURCE_DIR):
         if file.lower().endswith((".csv", ".xlsx")):
             path = os.path.join(SOURCE_DIR, file)
@@ -63,13 +79,14 @@ def load_all_sources():
                     break
 
             if campo_desc:
-                for _, row in df.iterrows():
-                    registros.append({
-                        "fuente": file,
-                        "descripcion": str(row[campo_desc]),
-                    })
+                frames.append(pd.DataFrame({
+                    "fuente": file,
+                    "descripcion": df[campo_desc].map(str),
+                }))
 
-    return pd.DataFrame(registros)
+    if not frames:
+        return pd.DataFrame(columns=["fuente", "descripcion"])
+    return pd.concat(frames, ignore_index=True)
 
 
 # ==========================================================
@@ -112,7 +129,7 @@ def merge_all():
 
     print("→ Cargando catálogos originales...")
     cat = load_all_sources()
-    cat["desc_norm"] = cat["descripcion"].apply(norm)
+    cat["desc_norm"] = norm_series(cat["descripcion"])
 
     # Integrar Fitment
     print("→ Integrando Fitment SRM...")
@@ -148,13 +165,11 @@ def merge_all():
     catalogo["rango_cilindraje"] = catalogo.get("rango_detectado", "")
 
     # Descripción SRM
-    catalogo["descripcion_srm"] = catalogo["descripcion"].apply(
-        lambda x: norm(x).capitalize()
-    )
+    desc_norm = norm_series(catalogo["descripcion"])
+    catalogo["descripcion_srm"] = desc_norm.str.capitalize()
 
-    # Categoría SRM basada en reglas
-    def detect_category(desc):
-        d = norm(desc)
+    # Categoría SRM basada en reglas: una vez por descripción distinta
+    def detect_category(d):
         for key in rules["reglas_no_universales"]:
             if key in d:
                 return "ESPECIFICO MOTOR"
@@ -163,7 +178,8 @@ def merge_all():
                 return "UNIVERSAL"
         return "GENERAL"
 
-    catalogo["categoria_srm"] = catalogo["descripcion"].apply(detect_category)
+    categorias = {d: detect_category(d) for d in desc_norm.unique()}
+    catalogo["categoria_srm"] = desc_norm.map(categorias)
 
     return catalogo
 
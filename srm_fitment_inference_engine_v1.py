@@ -4,6 +4,8 @@ import pandas as pd
 import re
 from pathlib import Path
 
+from aho_corasick import AhoCorasick
+
 # ==========================================================
 #        SRM — FITMENT INFERENCE ENGINE v1
 #        El cerebro del Fitment Universal SRM
@@ -38,6 +40,18 @@ def norm(text):
     return t
 
 
+def norm_series(s):
+    """
+    norm() sobre una columna completa (operaciones vectorizadas de pandas).
+    """
+    return (
+        s.fillna("").astype(str).str.upper()
+        .str.replace(r"[^A-Z0-9 ]", " ", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+
 # ==========================================================
 # Cargar modelos SRM
 # ==========================================================
@@ -84,65 +98,175 @@ def detect_oem(text, rules):
     return None
 
 
+def detect_oem_many(texts, rules):
+    """
+    detect_oem() sobre una columna: cada texto distinto se evalúa una
+    sola vez, patrón por patrón (gana el primero que encuentre algo),
+    y el resultado se reparte a todas las filas.
+    """
+    uniq = pd.Series(texts.dropna().unique(), dtype=object).astype(str)
+    found = pd.Series(None, index=uniq.index, dtype=object)
+
+    for pat in rules["reglas_oem"]["patrones_oem"]:
+        pending = found.isna()
+        if not pending.any():
+            break
+        # Sin ningún acierto .str[0] devuelve una serie float toda NaN,
+        # donde .str ya no aplica: se convierte valor por valor.
+        first = uniq[pending].str.findall(pat, flags=re.IGNORECASE).str[0]
+        found[pending] = first.astype(object).map(str.upper, na_action="ignore")
+
+    return texts.map(dict(zip(uniq, found)))
+
+
+# ==========================================================
+# Matcher multi-patrón (Aho-Corasick)
+# ==========================================================
+class FitmentMatcher:
+    """
+    Autómata Aho-Corasick (aho_corasick.AhoCorasick) con TODOS los
+    patrones del fitment (modelos SRM + reglas). Se construye una vez y
+    cada descripción se recorre una sola vez, sin importar cuántos
+    modelos o reglas haya.
+
+    Cada patrón se registra con (categoria, clave): la clave es su
+    posición dentro de la categoría, así el que gana es el mismo que
+    ganaba en la cascada de `in` (el primero de la lista).
+
+    whole_word=True → solo cuenta si el patrón no está pegado a otra
+    letra o número (para que un modelo "GS" no aparezca dentro de "GSX").
+    """
+
+    def __init__(self):
+        self.ac = AhoCorasick()
+
+    def add(self, pattern, category, key, whole_word=False):
+        self.ac.add(pattern, (category, key, len(pattern), whole_word))
+
+    def build(self):
+        self.ac.build()
+        return self
+
+    def scan(self, text):
+        """
+        Devuelve {categoria: set(claves)} con todos los patrones
+        encontrados en el texto.
+        """
+        hits = {}
+        for category, key, _, _ in self.ac.always:
+            hits.setdefault(category, set()).add(key)
+
+        n = len(text)
+        for i, (category, key, length, whole_word) in self.ac.matches(text):
+            if whole_word:
+                start, end = i - length + 1, i + 1
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if end < n and text[end].isalnum():
+                    continue
+            hits.setdefault(category, set()).add(key)
+
+        return hits
+
+
+def build_matcher(rules, modelos_srm):
+    """
+    Compila modelos_srm.csv + srm_fitment_rules_v1.json en un solo
+    autómata. Las reglas conservan la coincidencia por subcadena de la
+    cascada original; los modelos exigen palabra completa.
+    """
+    m = FitmentMatcher()
+
+    for i, u in enumerate(rules["reglas_universales"]):
+        m.add(u, "universal", i)
+
+    for i, nu in enumerate(rules["reglas_no_universales"]):
+        m.add(nu, "no_universal", i)
+
+    for i, modelo in enumerate(modelos_srm):
+        m.add(str(modelo), "modelo", i, whole_word=True)
+
+    # Cilindraje: la clave es el índice del rango (gana el primer rango)
+    for i, piezas in enumerate(rules["reglas_cilindraje"].values()):
+        for p in piezas:
+            m.add(p, "cilindraje", i)
+
+    for i, wrong in enumerate(rules["reglas_empiricas"]["correcciones"]):
+        m.add(wrong, "empirico", i)
+
+    for i, bad in enumerate(rules["reglas_anti_ruido"]["evitar_si_contiene"]):
+        m.add(bad, "ruido", i)
+
+    return m.build()
+
+
 # ==========================================================
 # Extraer modelos desde descripciones
 # ==========================================================
-def detect_models(desc, modelos_srm):
-    found = []
-    for m in modelos_srm:
-        if m in desc:
-            found.append(m)
-    return found
+def detect_models(desc, modelos_srm, matcher=None):
+    if matcher is None:
+        matcher = FitmentMatcher()
+        for i, modelo in enumerate(modelos_srm):
+            matcher.add(str(modelo), "modelo", i, whole_word=True)
+        matcher.build()
+
+    return [modelos_srm[i] for i in sorted(matcher.scan(desc).get("modelo", ()))]
 
 
 # ==========================================================
 # Clasificar por reglas
 # ==========================================================
-def analyze_fitment(desc, rules, modelos_srm):
+def analyze_fitment(desc, rules, modelos_srm, matcher=None):
+    """
+    Misma cascada de prioridades de siempre (universal → no universal →
+    modelos → cilindraje → empírico → anti-ruido), pero con todos los
+    aciertos calculados en una sola pasada del matcher. Pasar el matcher
+    de build_matcher() para no recompilarlo en cada descripción.
+    """
+    if matcher is None:
+        matcher = build_matcher(rules, modelos_srm)
+
     desc_norm = norm(desc)
+    hits = matcher.scan(desc_norm)
 
     # ---------------------------
     # 1. Universal verdadero
     # ---------------------------
-    for u in rules["reglas_universales"]:
-        if u in desc_norm:
-            return {"tipo": "universal", "modelos": [], "score": 0.95}
+    if "universal" in hits:
+        return {"tipo": "universal", "modelos": [], "score": 0.95}
 
     # ---------------------------
     # 2. Universal falso
     # ---------------------------
-    for nu in rules["reglas_no_universales"]:
-        if nu in desc_norm:
-            return {"tipo": "modelo_especifico", "modelos": [], "score": 0.30}
+    if "no_universal" in hits:
+        return {"tipo": "modelo_especifico", "modelos": [], "score": 0.30}
 
     # ---------------------------
     # 3. Detectar modelos explícitos
     # ---------------------------
-    mods = detect_models(desc_norm, modelos_srm)
-    if mods:
+    if "modelo" in hits:
+        mods = [modelos_srm[i] for i in sorted(hits["modelo"])]
         return {"tipo": "modelo_detectado", "modelos": mods, "score": 0.85}
 
     # ---------------------------
     # 4. Analizar por cilindrada (aunque no tengamos rango explícito)
     # ---------------------------
-    for rango, piezas in rules["reglas_cilindraje"].items():
-        for p in piezas:
-            if p in desc_norm:
-                return {"tipo": "rango_cilindraje", "rango": rango, "modelos": [], "score": 0.70}
+    if "cilindraje" in hits:
+        rango = list(rules["reglas_cilindraje"])[min(hits["cilindraje"])]
+        return {"tipo": "rango_cilindraje", "rango": rango, "modelos": [], "score": 0.70}
 
     # ---------------------------
     # 5. Empírico corregido
     # ---------------------------
-    for wrong, correct in rules["reglas_empiricas"]["correcciones"].items():
-        if wrong in desc_norm:
-            return {"tipo": "empirico_corregido", "modelos": [correct], "score": 0.60}
+    if "empirico" in hits:
+        correct = list(rules["reglas_empiricas"]["correcciones"].values())[min(hits["empirico"])]
+        return {"tipo": "empirico_corregido", "modelos": [correct], "score": 0.60}
 
     # ---------------------------
     # 6. Anti-ruido
     # ---------------------------
-    for bad in rules["reglas_anti_ruido"]["evitar_si_contiene"]:
-        if bad in desc_norm:
-            return {"tipo": "ambiguo", "modelos": [], "score": 0.10}
+    if "ruido" in hits:
+        return {"tipo": "ambiguo", "modelos": [], "score": 0.10}
 
     # ---------------------------
     # Default
@@ -154,7 +278,11 @@ def analyze_fitment(desc, rules, modelos_srm):
 # Cargar todos los catálogos de clientes
 # ==========================================================
 def load_all_catalogs():
-    registros = []
+    """
+    Un solo DataFrame (fuente, descripcion) con todas las fuentes,
+    armado por columnas (sin iterrows).
+    """
+    frames = []
     for file in os.listdir(SOURCE_DIR):
         if file.lower().endswith((".csv", ".xlsx")):
             try:
@@ -177,14 +305,16 @@ def load_all_catalogs():
                         break
 
                 if campo_desc:
-                    for _, row in df.iterrows():
-                        registros.append({
-                            "fuente": file,
-                            "descripcion": str(row[campo_desc]),
-                        })
+                    frames.append(pd.DataFrame({
+                        "fuente": file,
+                        "descripcion": df[campo_desc].map(str),
+                    }))
             except:
                 print(f"[ADVERTENCIA] No se pudo procesar {file}")
-    return pd.DataFrame(registros)
+
+    if not frames:
+        return pd.DataFrame(columns=["fuente", "descripcion"])
+    return pd.concat(frames, ignore_index=True)
 
 
 # ==========================================================
@@ -199,25 +329,35 @@ def run():
     oem_df = load_oem()
     rules = load_rules()
     catalog = load_all_catalogs()
-
-    rows = []
-
-    for _, row in catalog.iterrows():
-        desc = row["descripcion"]
-        oem = detect_oem(desc, rules)
-        fit = analyze_fitment(desc, rules, modelos_srm)
-
-        rows.append({
-            "fuente": row["fuente"],
-            "descripcion": desc,
-            "oem_detectado": oem,
-            "tipo_compatibilidad": fit["tipo"],
-            "modelos_detectados": ";".join(fit.get("modelos", [])),
-            "rango_detectado": fit.get("rango", ""),
-            "score_confianza": fit["score"],
-        })
-
-    df_final = pd.DataFrame(rows)
+    matcher = build_matcher(rules, modelos_srm)
+
+    # Normalización y OEM por columnas
+    catalog["desc_norm"] = norm_series(catalog["descripcion"])
+    catalog["oem_detectado"] = detect_oem_many(catalog["descripcion"], rules)
+
+    # Inferencia una vez por descripción normalizada distinta;
+    # el resultado se reparte a todas las filas que la comparten
+    uniq = catalog["desc_norm"].drop_duplicates()
+    fits = pd.DataFrame(
+        [analyze_fitment(d, rules, modelos_srm, matcher) for d in uniq],
+        columns=["tipo", "modelos", "rango", "score"],
+        index=uniq.values
+    )
+    fits["modelos"] = fits["modelos"].map(lambda m: ";".join(m) if isinstance(m, list) else "")
+    fits["rango"] = fits["rango"].fillna("")
+
+    fit = fits.reindex(catalog["desc_norm"].values)
+
+    df_final = pd.DataFrame({
+        "fuente": catalog["fuente"].values,
+        "descripcion": catalog["descripcion"].values,
+        "oem_detectado": catalog["oem_detectado"].values,
+        "tipo_compatibilidad": fit["tipo"].values,
+        "modelos_detectados": fit["modelos"].values,
+        "rango_detectado": fit["rango"].values,
+        "score_confianza": fit["score"].values,
+    })
+    print(f"→ Descripciones distintas analizadas: {len(uniq)} de {len(catalog)}")
     df_final.to_csv(OUTPUT_FILE, index=False, encoding="utf-8")
 
     print(f"✔ Fitment Universal generado: {OUTPUT_FILE}")
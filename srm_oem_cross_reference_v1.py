@@ -40,12 +40,31 @@ def detect_oem_code(text):
     return None
 
 
+def detect_oem_codes(values):
+    """
+    detect_oem_code() sobre una columna: cada valor distinto se evalúa
+    una sola vez, patrón por patrón (gana el primero que encuentre
+    algo), y el resultado se reparte a todas las filas.
+    """
+    uniq = pd.Series(values.unique(), dtype=object)
+    text = uniq.astype(str).str.upper().str.strip()
+    found = pd.Series(None, index=uniq.index, dtype=object)
+
+    for pat in OEM_PATTERNS:
+        pending = found.isna()
+        if not pending.any():
+            break
+        found[pending] = text[pending].str.findall(pat).str[0]
+
+    return values.map(dict(zip(uniq, found)))
+
+
 # ==========================================================
 # Cargar todas las fuentes de datos desde 02_cleaned_normalized
 # ==========================================================
 
 def load_all_sources():
-    records = []
+    frames = []
 
     for file in os.listdir(SOURCE_DIR):
         if not file.lower().endswith((".csv", ".xlsx")):
@@ -66,12 +85,18 @@ def load_all_sources():
 
             # Detectar columnas típicas de OEM
             if any(k in col_low for k in ["oem", "codigo", "ref", "reference", "equiv"]):
-                for val in df[col].dropna().astype(str):
-                    oem = detect_oem_code(val)
-                    if oem:
-                        records.append({"fuente": file, "oem_detectado": oem, "valor_original": val})
+                vals = df[col].dropna().astype(str)
+                oem = detect_oem_codes(vals)
+                found = oem.notna() & (oem != "")
+                frames.append(pd.DataFrame({
+                    "fuente": file,
+                    "oem_detectado": oem[found],
+                    "valor_original": vals[found],
+                }))
 
-    return pd.DataFrame(records)
+    if not frames:
+        return pd.DataFrame(columns=["fuente", "oem_detectado", "valor_original"])
+    return pd.concat(frames, ignore_index=True)
 
 
 # ==========================================================
@@ -82,21 +107,20 @@ def build_equivalences(df):
     if df.empty:
         return pd.DataFrame(columns=["oem_codigo", "equivalentes", "fuentes"])
 
-    # Agrupar por OEM detectado
-    grupo = df.groupby("oem_detectado")
-
-    rows = []
-    for oem, group in grupo:
-        equivalentes = list(group["valor_original"].unique())
-        fuentes = list(group["fuente"].unique())
-
-        rows.append({
-            "oem_codigo": oem,
-            "equivalentes": "; ".join(equivalentes),
-            "fuentes": "; ".join(fuentes)
-        })
-
-    result = pd.DataFrame(rows).sort_values("oem_codigo")
+    # Agrupar por OEM detectado (valores únicos en orden de aparición)
+    def join_unique(col):
+        return (
+            df.drop_duplicates(["oem_detectado", col])
+            .groupby("oem_detectado")[col]
+            .agg("; ".join)
+        )
+
+    result = pd.DataFrame({
+        "equivalentes": join_unique("valor_original"),
+        "fuentes": join_unique("fuente"),
+    })
+    result.index.name = "oem_codigo"
+    result = result.reset_index().sort_values("oem_codigo")
     return result
 
 
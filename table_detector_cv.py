@@ -1,18 +1,25 @@
 import cv2
 import numpy as np
 
+from modules.image_utils import PageImage
+
 class OpenCVTableDetector:
     """
     Detector de tablas usando OpenCV – funciona para tablas marcadas,
     bordes fuertes, líneas continuas y cuadrículas típicas de catálogos.
     """
 
-    def detect_tables(self, image_path):
-        img = cv2.imread(image_path)
-        if img is None:
-            return {"tables": [], "cells": []}
+    # Subir al cambiar la lógica (invalida la caché de segmentación)
+    VERSION = "1"
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    def detect_tables(self, image):
+        """
+        image: PageImage (o ruta, por compatibilidad)
+        """
+        page = PageImage.ensure(image)
+        gray = page.gray
+        if gray is None:
+            return {"tables": [], "cells": []}
 
         # Umbral adaptativo para resaltar bordes
         thresh = cv2.adaptiveThreshold(
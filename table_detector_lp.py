@@ -2,6 +2,25 @@ import layoutparser as lp
 import cv2
 import numpy as np
 
+from modules.image_utils import PageImage
+
+
+# ------------------------------------------------------------
+# Modelos cargados UNA vez por proceso (worker) y reutilizados
+# ------------------------------------------------------------
+_MODEL_CACHE = {}
+_WARMED_UP = set()
+
+
+def load_model(model_name):
+    """
+    Devuelve el modelo LayoutParser de este proceso.
+    La primera llamada lo construye; las siguientes lo reutilizan.
+    """
+    if model_name not in _MODEL_CACHE:
+        _MODEL_CACHE[model_name] = lp.AutoLayoutModel(model_name)
+    return _MODEL_CACHE[model_name]
+
 
 class LayoutParserTableDetector:
     """
@@ -15,32 +34,132 @@ class LayoutParserTableDetector:
 
     Este módulo es más flexible que el detector OpenCV
     y detecta tablas incluso sin bordes visibles.
+
+    detect_tables_batch() agrupa páginas en lotes de batch_size y hace
+    una sola invocación del modelo por lote.
     """
 
-    def __init__(self, model_name="lp://PrimaLayout/mask_rcnn_R_50_FPN_3x/config"):
+    # Subir al cambiar la lógica (invalida la caché de segmentación)
+    VERSION = "1"
+
+    # Solo de ejecución: no invalidan la caché de segmentación
+    CACHE_IGNORE = ("batch_size", "warmup")
+
+    def __init__(self, model_name="lp://PrimaLayout/mask_rcnn_R_50_FPN_3x/config",
+                 batch_size=4, warmup=False):
+        self.model_name = model_name
+        self.batch_size = batch_size
+
         try:
-            self.model = lp.AutoLayoutModel(model_name)
+            self.model = load_model(model_name)
             self.enabled = True
         except Exception as e:
             print("[WARN] LayoutParser no disponible:", e)
             self.enabled = False
 
-    def detect_tables(self, image_path):
+        if self.enabled and warmup:
+            self.warmup()
+
+    # --------------------------------------------------------
+    # Calentamiento del modelo (una vez por proceso)
+    # --------------------------------------------------------
+    def warmup(self):
+        if not self.enabled or self.model_name in _WARMED_UP:
+            return
+        blank = np.full((256, 256, 3), 255, dtype=np.uint8)
+        self.model.detect(blank)
+        _WARMED_UP.add(self.model_name)
+
+    # --------------------------------------------------------
+    # Una página
+    # --------------------------------------------------------
+    def detect_tables(self, image):
+        """
+        image: PageImage (o ruta, por compatibilidad)
+        """
         if not self.enabled:
             return {
                 "tables": [],
                 "cells": []
             }
 
-        image = cv2.imread(image_path)
-        if image is None:
+        page = PageImage.ensure(image)
+        image_rgb = page.rgb
+        if image_rgb is None:
             return {"tables": [], "cells": []}
 
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
         # Detect layout components
         layout = self.model.detect(image_rgb)
 
+        return self.layout_to_result(layout)
+
+    # --------------------------------------------------------
+    # Varias páginas: una invocación del modelo por lote
+    # --------------------------------------------------------
+    def detect_tables_batch(self, images):
+        """
+        images: lista de PageImage (o rutas)
+
+        Devuelve una lista de resultados en el mismo orden,
+        con el mismo formato que detect_tables().
+        """
+        empty = {"tables": [], "cells": []}
+        if not self.enabled:
+            return [dict(empty) for _ in images]
+
+        pages = [PageImage.ensure(img) for img in images]
+        results = [dict(empty) for _ in pages]
+
+        valid = [i for i, p in enumerate(pages) if p.rgb is not None]
+
+        for start in range(0, len(valid), self.batch_size):
+            idxs = valid[start:start + self.batch_size]
+            layouts = self.predict_batch([pages[i].rgb for i in idxs])
+
+            for i, layout in zip(idxs, layouts):
+                results[i] = self.layout_to_result(layout)
+
+        return results
+
+    def predict_batch(self, images_rgb):
+        """
+        Ejecuta Detectron2 sobre un lote completo replicando lo que hace
+        DefaultPredictor por imagen. Si el backend no expone el predictor
+        (otro tipo de modelo LayoutParser) se procesa imagen por imagen.
+        """
+        predictor = getattr(self.model, "model", None)
+        network = getattr(predictor, "model", None)
+        aug = getattr(predictor, "aug", None)
+
+        if network is None or aug is None:
+            return [self.model.detect(img) for img in images_rgb]
+
+        try:
+            import torch
+
+            inputs = []
+            for img in images_rgb:
+                img = self.model.image_preprocess(img)
+                if getattr(predictor, "input_format", "BGR") == "RGB":
+                    img = img[:, :, ::-1]
+                h, w = img.shape[:2]
+                tensor = aug.get_transform(img).apply_image(img)
+                tensor = torch.as_tensor(tensor.astype("float32").transpose(2, 0, 1))
+                inputs.append({"image": tensor, "height": h, "width": w})
+
+            with torch.no_grad():
+                outputs = network(inputs)
+
+            return [self.model.gather_output(out) for out in outputs]
+
+        except Exception as e:
+            print("[WARN] Inferencia por lotes no disponible, se usa página por página:", e)
+            return [self.model.detect(img) for img in images_rgb]
+
+    # --------------------------------------------------------
+    # Layout → {tables, cells}
+    # --------------------------------------------------------
+    def layout_to_result(self, layout):
         tables = []
         cells = []
 
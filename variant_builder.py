@@ -1,28 +1,242 @@
+import re
+import zlib
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+
+# Atributos que distinguen variantes de un mismo producto base
+COLORES = {
+    "NEGRO", "BLANCO", "ROJO", "AZUL", "VERDE", "AMARILLO", "GRIS", "PLATA",
+    "PLATEADO", "DORADO", "NARANJA", "CROMADO", "FUCSIA", "MORADO", "ROSADO",
+    "CAFE", "BEIGE", "TRANSPARENTE", "HUMO",
+}
+COLORES_FEMENINO = {c[:-1] + "A": c for c in COLORES if c.endswith("O")}
+MEDIDA_RE = re.compile(r"^\d+(?:[.,]\d+)?(?:MM|CM|MTS?|M|PULG|CC|ML|LT|L|\")?$")
+EMPAQUE_RE = re.compile(r"^X\d+$")
+MODELO_RE = re.compile(r"^(?=.*[A-Z])(?=.*\d)[A-Z0-9\-/]+$")
+TOKEN_RE = re.compile(r"[A-Z0-9\"/\-.,]+")
+STOPWORDS = {"DE", "LA", "EL", "LOS", "LAS", "PARA", "CON", "Y", "EN", "DEL", "POR", "A", "X"}
+
+MERSENNE = (1 << 31) - 1
+
+
 class VariantBuilder:
+    """
+    Agrupa variantes (padre → hijos) a nivel de catálogo completo.
 
-    def __init__(self):
-        pass
+    1. Cada descripción se normaliza a una firma de tokens: sin acentos,
+       sin palabras vacías y SIN atributos de variante (color, medida,
+       empaque, modelo de moto). Lo que queda es el producto base.
+    2. MinHash (num_perm permutaciones, NumPy) + LSH por bandas: solo
+       los productos que caen en la misma cubeta son candidatos
+       → casi lineal, sin comparar todos contra todos.
+    3. Cada candidato se confirma contra el representante de la cubeta:
+       Jaccard real de la firma >= threshold, misma familia (si se
+       conoce) y diferencia en atributos. Los grupos confirmados se
+       unen (union-find).
 
-    def assign_variants(self, products):
+    El primer producto del grupo (orden de entrada) queda como padre;
+    el resto recibe p.padre = código del padre y p.variante = True.
+    """
+
+    def __init__(self, num_perm=96, bands=16, threshold=0.7, seed=7):
+        """
+        bands × rows = num_perm. Con 16 × 6 la curva de LSH corta cerca
+        de Jaccard 0.63: ~87% de los pares con 0.7 son candidatos y
+        ~6% de los pares con 0.4.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE, size=(num_perm, 1), dtype=np.int64)
+        self.b = rng.integers(0, MERSENNE, size=(num_perm, 1), dtype=np.int64)
+        self.mix = rng.integers(1, MERSENNE, size=self.rows, dtype=np.int64) | 1
+
+    # --------------------------------------------------------
+    # Descripción → (firma base, atributos)
+    # --------------------------------------------------------
+    def normalize(self, text):
+        text = str(text or "").upper()
+        if text.isascii():
+            return text
+        text = unicodedata.normalize("NFD", text)
+        return "".join(c for c in text if unicodedata.category(c) != "Mn")
+
+    def split_tokens(self, p):
+        """
+        Devuelve (tokens_base, atributos) de un producto.
+        """
+        base = set()
+        attrs = {"color": set(), "medida": set(), "modelo": set(), "empaque": set()}
+
+        for tok in TOKEN_RE.findall(self.normalize(p.descripcion)):
+            tok = tok.strip(".,-/")
+            if not tok or tok in STOPWORDS:
+                continue
+            tok = COLORES_FEMENINO.get(tok, tok)
+            if tok in COLORES:
+                attrs["color"].add(tok)
+            elif tok.isalpha():
+                if len(tok) > 1:
+                    base.add(tok)
+            elif EMPAQUE_RE.match(tok):
+                attrs["empaque"].add(tok)
+            elif MEDIDA_RE.match(tok):
+                attrs["medida"].add(tok)
+            elif MODELO_RE.match(tok):
+                attrs["modelo"].add(tok)
+            elif len(tok) > 1:
+                base.add(tok)
+
+        # Campos ya resueltos por el normalizador tienen prioridad
+        if getattr(p, "color", None):
+            attrs["color"] = {self.normalize(p.color)}
+        if getattr(p, "modelo_moto", None):
+            attrs["modelo"] = {self.normalize(p.modelo_moto)}
+
+        return base, attrs
+
+    # --------------------------------------------------------
+    # MinHash + LSH
+    # --------------------------------------------------------
+    def minhash_many(self, token_sets, chunk=4096):
+        """
+        Firmas MinHash (len(token_sets), num_perm) calculadas por bloques:
+        todas las permutaciones de todos los tokens del bloque en una
+        operación NumPy y mínimo por producto con reduceat.
+        """
+        out = np.empty((len(token_sets), self.num_perm), dtype=np.int64)
+
+        for start in range(0, len(token_sets), chunk):
+            block = token_sets[start:start + chunk]
+            sizes = np.fromiter((len(t) for t in block), dtype=np.int64, count=len(block))
+            hashes = np.fromiter(
+                (zlib.crc32(t.encode("utf-8")) & MERSENNE for toks in block for t in toks),
+                dtype=np.int64, count=int(sizes.sum())
+            )
+            perm = (self.a * hashes + self.b) % MERSENNE
+            offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+            out[start:start + len(block)] = np.minimum.reduceat(perm, offsets, axis=1).T
+
+        return out
+
+    def candidate_buckets(self, signatures):
+        """
+        LSH: para cada banda, agrupa las filas con la misma porción de
+        firma (hash de la banda + ordenamiento, todo en NumPy). Devuelve
+        solo las cubetas con 2+ miembros, como arreglos de posiciones.
+        """
+        n = len(signatures)
+        bands = signatures.reshape(n, self.bands, self.rows)
+        band_hash = (bands * self.mix).sum(axis=2)   # desborde int64 = hash
+
+        for band in range(self.bands):
+            h = band_hash[:, band]
+            order = np.argsort(h, kind="stable")
+            hs = h[order]
+
+            starts = np.flatnonzero(np.concatenate(([True], hs[1:] != hs[:-1])))
+            ends = np.append(starts[1:], n)
+            for s, e in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+                yield order[s:e]
+
+    def jaccard(self, a, b):
+        return len(a & b) / float(len(a | b)) if a or b else 0.0
+
+    def confirm(self, p, q, sig_p, sig_q):
+        """
+        Variantes = mismo producto base que se distingue por atributos.
+        Si los atributos coinciden, la base debe ser idéntica (mismo
+        artículo con otro código); si no, son productos distintos.
+        """
+        (base_p, attrs_p), (base_q, attrs_q) = sig_p, sig_q
+
+        if self.jaccard(base_p, base_q) < self.threshold:
+            return False
+
+        fam_p, fam_q = getattr(p, "familia", None), getattr(q, "familia", None)
+        if fam_p and fam_q and fam_p != fam_q:
+            return False
+
+        return attrs_p != attrs_q or base_p == base_q
+
+    # --------------------------------------------------------
+    # Agrupamiento
+    # --------------------------------------------------------
+    def find_groups(self, products):
         """
-        Cada código puede ser variante si comparte descripción + foto con otros.
+        Devuelve listas de índices (en orden de entrada), una por grupo
+        de 2+ productos.
         """
+        parent = list(range(len(products)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
 
-        groups = {}
+        def union(i, j):
+            ri, rj = find(i), find(j)
+            parent[max(ri, rj)] = min(ri, rj)
 
-        for p in products:
-            key = p.descripcion[:25].upper()  # clave por similitud
-            if key not in groups:
-                groups[key] = []
-            groups[key].append(p)
+        # Misma base exacta (y familia) → mismo grupo sin pasar por LSH;
+        # solo el primero de cada base entra al índice
+        sigs = []
+        exact = {}
+        reps = []
 
-        # Construir relaciones padre-hijo
-        for g in groups.values():
-            if len(g) == 1:
+        for i, p in enumerate(products):
+            base, attrs = self.split_tokens(p)
+            sigs.append((base, attrs))
+            if not base:
                 continue
 
-            padre = g[0].codigo
-            for p in g[1:]:
+            key = (frozenset(base), getattr(p, "familia", None))
+            if key in exact:
+                union(i, exact[key])
+            else:
+                exact[key] = i
+                reps.append(i)
+
+        if not reps:
+            return []
+
+        signatures = self.minhash_many([sorted(sigs[i][0]) for i in reps])
+
+        for bucket in self.candidate_buckets(signatures):
+            members = [reps[k] for k in sorted(bucket.tolist())]
+            rep = members[0]
+            for i in members[1:]:
+                if find(i) == find(rep):
+                    continue
+                if self.confirm(products[rep], products[i], sigs[rep], sigs[i]):
+                    union(i, rep)
+
+        groups = defaultdict(list)
+        for i in range(len(products)):
+            groups[find(i)].append(i)
+
+        return [g for g in groups.values() if len(g) > 1]
+
+    def assign_variants(self, products):
+        """
+        Marca padre/hijo sobre todo el catálogo (o una página).
+        """
+        for group in self.find_groups(products):
+            padre = products[group[0]].codigo
+            for i in group[1:]:
+                p = products[i]
+                if p.codigo == padre:
+                    continue
                 p.padre = padre
                 p.variante = True
 
@@ -1,10 +1,20 @@
 import os
-import base64
+import re
 import json
 import time
 
 from openai import OpenAI
 
+from modules.llm_executor import LLMExecutor, RETRYABLE_ERRORS
+from modules.image_prep import ImagePrep
+
+
+class BatchMismatch(ValueError):
+    """
+    La respuesta de un lote no trae exactamente un objeto por imagen.
+    """
+    pass
+
 
 class VisionExtractor:
     """
@@ -12,23 +22,47 @@ class VisionExtractor:
     Devuelve un diccionario estructurado con campos estandarizados.
     """
 
-    def __init__(self, model="gpt-4o-mini", retries=2):
+    def __init__(self, model="gpt-4o-mini", retries=2, cache=None, prep=None):
+        """
+        cache: LLMResponseCache opcional. En modo replay no se necesita
+               OPENAI_API_KEY: todo sale de la caché.
+        prep:  ImagePrep (reducción + JPEG antes de enviar).
+        """
         self.model = model
         self.retries = retries
+        self.temperature = 0
+        self.cache = cache
+        self.prep = prep or ImagePrep()
 
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
+            if cache is not None and cache.replay:
+                self.client = None
+                return
             raise ValueError("Falta variable de entorno OPENAI_API_KEY")
 
         self.client = OpenAI(api_key=api_key)
 
 
     # ---------------------------------------------------------
-    # Convertir imagen a base64
+    # Convertir imagen a base64 (reducida y re-codificada)
+    #
+    # Un recorte puede ser una ruta o la celda de CellExtractor /
+    # ImageCropper con el arreglo en memoria (cell["image"]).
     # ---------------------------------------------------------
-    def load_image_b64(self, path):
-        with open(path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
+    def load_image_b64(self, source):
+        if isinstance(source, dict):
+            if source.get("image") is not None:
+                return self.prep.encode_image(source["image"])
+            source = source["file"]
+        return self.prep.encode(source)
+
+    def name_of(self, source):
+        if isinstance(source, dict):
+            if source.get("file"):
+                return os.path.basename(source["file"])
+            return source["name"]
+        return os.path.basename(source)
 
 
     # ---------------------------------------------------------
@@ -58,15 +92,35 @@ Reglas:
 - Si la imagen contiene sólo texto, igualmente estructura los campos.
 """
 
+    # ---------------------------------------------------------
+    # Prompt por lotes: K recortes indexados → arreglo JSON
+    # ---------------------------------------------------------
+    def build_batch_prompt(self, n):
+        return self.build_prompt() + f"""
+MODO LOTE:
+- Recibes {n} imágenes, cada una precedida por "Imagen <idx>" (idx de 0 a {n - 1}).
+- Cada imagen es un recorte independiente: no mezcles datos entre ellas.
+- Devuelve SOLO un arreglo JSON con exactamente {n} objetos, en orden,
+  cada uno con los campos anteriores más "idx" (entero).
+"""
+
 
     # ---------------------------------------------------------
     # Llamada al modelo Vision
     # ---------------------------------------------------------
     def query_model(self, prompt, img_b64):
+        if self.cache is not None:
+            return self.cache.cached_call(
+                img_b64, prompt, self.model, self.temperature,
+                lambda: self.request_model(prompt, img_b64)
+            )
+        return self.request_model(prompt, img_b64)
+
+    def request_model(self, prompt, img_b64):
         payload = {
             "type": "image_url",
             "image_url": {
-                "url": f"data:image/png;base64,{img_b64}"
+                "url": f"data:{self.prep.mime};base64,{img_b64}"
             }
         }
 
@@ -82,7 +136,27 @@ Reglas:
                     ]
                 }
             ],
-            temperature=0
+            temperature=self.temperature
+        )
+
+        return response.choices[0].message.content
+
+    def request_batch(self, prompt, images_b64):
+        content = [{"type": "text", "text": prompt}]
+        for idx, img_b64 in enumerate(images_b64):
+            content.append({"type": "text", "text": f"Imagen {idx}"})
+            content.append({
+                "type": "image_url",
+                "image_url": {"url": f"data:{self.prep.mime};base64,{img_b64}"}
+            })
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "Extractor ADSI Vision V5"},
+                {"role": "user", "content": content}
+            ],
+            temperature=self.temperature
         )
 
         return response.choices[0].message.content
@@ -101,6 +175,16 @@ Reglas:
             return {}
 
 
+    def clean_json_array(self, raw):
+        try:
+            start = raw.index("[")
+            end = raw.rindex("]") + 1
+            data = json.loads(raw[start:end])
+        except (ValueError, TypeError):
+            return None
+        return data if isinstance(data, list) else None
+
+
     # ---------------------------------------------------------
     # Normalizar precio
     # ---------------------------------------------------------
@@ -115,28 +199,213 @@ Reglas:
 
 
     # ---------------------------------------------------------
-    # Método principal: analiza una celda (un recorte)
+    # Un intento, sin capturar errores (lo usa LLMExecutor)
     # ---------------------------------------------------------
-    def analyze(self, image_path):
+    def analyze_once(self, image_path):
         img_b64 = self.load_image_b64(image_path)
         prompt = self.build_prompt()
 
-        for attempt in range(self.retries + 1):
+        raw = self.query_model(prompt, img_b64)
+        return self.parse_response(raw, image_path)
+
+    # ---------------------------------------------------------
+    # Resultado desde la caché, sin llamar al modelo (o None)
+    # ---------------------------------------------------------
+    def cached_result(self, image_path):
+        if self.cache is None:
+            return None
+
+        img_b64 = self.load_image_b64(image_path)
+        key = self.cache.make_key(img_b64, self.build_prompt(), self.model, self.temperature)
+        raw = self.cache.lookup(key)
+        if raw is None:
+            return None
+
+        return self.parse_response(raw, image_path)
+
+    def parse_response(self, raw, image_path):
+        data = self.clean_json(raw)
+
+        # Normalizar precio
+        if "precio" in data:
+            data["precio"] = self.normalize_price(data.get("precio"))
+
+        data["file"] = self.name_of(image_path)
+        return data
+
+    # ---------------------------------------------------------
+    # Lotes: un request para K celdas vecinas
+    # ---------------------------------------------------------
+    def parse_batch(self, raw, image_paths):
+        """
+        Arreglo JSON del modelo → un resultado por recorte, en orden.
+        Lanza BatchMismatch si falta o sobra algún idx.
+        """
+        items = self.clean_json_array(raw)
+        if items is None:
+            raise BatchMismatch("respuesta sin arreglo JSON")
+
+        by_idx = {}
+        for pos, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            idx = item.pop("idx", pos)
             try:
-                raw = self.query_model(prompt, img_b64)
-                data = self.clean_json(raw)
+                by_idx[int(idx)] = item
+            except (TypeError, ValueError):
+                continue
+
+        if sorted(by_idx) != list(range(len(image_paths))):
+            raise BatchMismatch(f"{len(by_idx)} objetos para {len(image_paths)} imágenes")
+
+        return [
+            self.parse_response(json.dumps(by_idx[i]), path)
+            for i, path in enumerate(image_paths)
+        ]
+
+    def analyze_batch_once(self, image_paths):
+        if len(image_paths) == 1:
+            return [self.analyze_once(image_paths[0])]
 
-                # Normalizar precio
-                if "precio" in data:
-                    data["precio"] = self.normalize_price(data.get("precio"))
+        images_b64 = [self.load_image_b64(p) for p in image_paths]
+        prompt = self.build_batch_prompt(len(image_paths))
+
+        def call():
+            raw = self.request_batch(prompt, images_b64)
+            self.parse_batch(raw, image_paths)   # no cachear respuestas inválidas
+            return raw
+
+        if self.cache is not None:
+            raw = self.cache.cached_call(images_b64, prompt, self.model, self.temperature, call)
+        else:
+            raw = call()
+
+        return self.parse_batch(raw, image_paths)
+
+    def analyze_batch(self, image_paths):
+        """
+        Analiza un lote; si falla (JSON incompleto, imagen rechazada...)
+        lo parte en dos y reintenta cada mitad hasta aislar la celda mala,
+        que queda como empty_result. Los errores de cuota/red se propagan
+        para que LLMExecutor haga el backoff.
+        """
+        try:
+            return self.analyze_batch_once(image_paths)
 
-                data["file"] = os.path.basename(image_path)
-                return data
+        except RETRYABLE_ERRORS:
+            raise
+
+        except Exception as e:
+            if len(image_paths) == 1:
+                print(f"[VISION ERROR] {self.name_of(image_paths[0])} → {e}")
+                return [self.empty_result(image_paths[0])]
+
+            print(f"[VISION] Lote de {len(image_paths)} falló ({e}), dividiendo...")
+            mid = len(image_paths) // 2
+            return self.analyze_batch(image_paths[:mid]) + self.analyze_batch(image_paths[mid:])
+
+    def cached_batch(self, image_paths):
+        if self.cache is None:
+            return None
+        if len(image_paths) == 1:
+            result = self.cached_result(image_paths[0])
+            return [result] if result is not None else None
+
+        images_b64 = [self.load_image_b64(p) for p in image_paths]
+        prompt = self.build_batch_prompt(len(image_paths))
+        raw = self.cache.lookup(self.cache.make_key(images_b64, prompt, self.model, self.temperature))
+        if raw is None:
+            return None
+
+        try:
+            return self.parse_batch(raw, image_paths)
+        except BatchMismatch:
+            return None
+
+    # ---------------------------------------------------------
+    # Agrupar celdas vecinas (misma fila o misma página)
+    # ---------------------------------------------------------
+    def group_key(self, image_path, group_by="row"):
+        """
+        CellExtractor nombra los recortes <pagina>_row<r>_col<c>.png:
+            group_by="row"  → <pagina>_row<r>
+            group_by="page" → <pagina>
+        """
+        stem = os.path.splitext(self.name_of(image_path))[0]
+        pattern = r"_col\d+$" if group_by == "row" else r"_row\d+_col\d+$"
+        return re.sub(pattern, "", stem)
+
+    def make_batches(self, image_paths, batch_size, group_by="row"):
+        batches = []
+        current, current_key = [], None
+
+        for path in image_paths:
+            key = self.group_key(path, group_by)
+            if current and (key != current_key or len(current) >= batch_size):
+                batches.append(current)
+                current = []
+            current.append(path)
+            current_key = key
+
+        if current:
+            batches.append(current)
+        return batches
+
+    # ---------------------------------------------------------
+    # Método principal: analiza una celda (un recorte)
+    # ---------------------------------------------------------
+    def analyze(self, image_path):
+        for attempt in range(self.retries + 1):
+            try:
+                return self.analyze_once(image_path)
 
             except Exception as e:
                 print(f"[VISION ERROR] intento {attempt} → {e}")
                 time.sleep(0.5)
 
+        return self.empty_result(image_path)
+
+    # ---------------------------------------------------------
+    # Muchas celdas en paralelo con límite RPM/TPM
+    # ---------------------------------------------------------
+    def analyze_many(self, image_paths, executor=None, out_json=None,
+                     batch_size=1, group_by="row"):
+        """
+        Analiza varios recortes con LLMExecutor y devuelve los
+        resultados en el mismo orden de image_paths (rutas o celdas
+        de CellExtractor con el recorte en memoria).
+
+        batch_size > 1: empaqueta hasta K celdas vecinas (misma fila
+        o misma página, group_by) en un solo request. El esquema de
+        salida por celda es el mismo.
+        """
+        image_paths = list(image_paths)
+
+        if batch_size > 1:
+            executor = executor or LLMExecutor(tokens_per_request=1500 * batch_size)
+            batches = self.make_batches(image_paths, batch_size, group_by)
+            print(f"[VISION] {len(image_paths)} recortes en {len(batches)} lotes")
+            return executor.map(
+                batches,
+                self.analyze_batch,
+                out_json=out_json,
+                on_error=lambda batch, e: [self.empty_result(p) for p in batch],
+                label=lambda batch: f"lote {self.name_of(batch[0])} (+{len(batch) - 1})",
+                precheck=self.cached_batch,
+                flatten=True
+            )
+
+        executor = executor or LLMExecutor()
+        return executor.map(
+            image_paths,
+            self.analyze_once,
+            out_json=out_json,
+            on_error=lambda path, e: self.empty_result(path),
+            label=self.name_of,
+            precheck=self.cached_result
+        )
+
+    def empty_result(self, image_path):
         return {
             "codigo": "SIN_CODIGO",
             "descripcion": "",
@@ -147,5 +416,5 @@ Reglas:
             "familia": "",
             "subfamilia": "",
             "observaciones": "",
-            "file": os.path.basename(image_path)
+            "file": self.name_of(image_path)
         }